@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Blob
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ["name", "refcount", "created_at", "updated_at"]
+    list_filter = ["refcount"]
+    search_fields = ["name"]
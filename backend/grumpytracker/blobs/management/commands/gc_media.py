@@ -0,0 +1,128 @@
+import os
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from blobs.models import Blob
+from blobs.references import referenced_names, tracked_fields
+from grumpytracker.images import VARIANT_NAME, VARIANTS_DIR
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the media files no record uses anymore, with their gzipped copies and "
+        "image variants. The reference counts are checked against the records first, "
+        "files written or uploaded again within MEDIA_GC_GRACE are left alone"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=int,
+            help="Seconds a file has to be unused for, defaults to MEDIA_GC_GRACE",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only list the files that would be deleted",
+        )
+
+    def handle(self, *args, **options):
+        grace = options["grace"]
+        if grace is None:
+            grace = settings.MEDIA_GC_GRACE
+        dry_run = options["dry_run"]
+
+        counts = referenced_names()
+        if not dry_run:
+            changed = Blob.objects.recount(counts)
+            if changed:
+                self.stdout.write(f"Fixed the reference count of {changed} files")
+
+        cutoff = time.time() - grace
+        # Uploads that got a file we already had, their records may not be saved yet
+        reused = set(
+            Blob.objects.filter(
+                reused_at__gte=datetime.fromtimestamp(cutoff, tz=timezone.utc)
+            ).values_list("name", flat=True)
+        )
+        orphans = []
+        for name in self.find_files():
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if (
+                name not in counts
+                and name not in reused
+                and os.path.getmtime(path) < cutoff
+            ):
+                orphans.append((name, os.path.getsize(path)))
+        variants = [
+            name
+            for name in self.find_stale_variants()
+            if os.path.getmtime(os.path.join(settings.MEDIA_ROOT, name)) < cutoff
+        ]
+
+        freed = sum(size for _, size in orphans) / 1024 / 1024
+        if dry_run:
+            for name, _ in orphans:
+                self.stdout.write(name)
+            self.stdout.write(
+                f"{len(orphans)} files and {len(variants)} variants would be deleted, "
+                f"freeing {freed:.1f} MB"
+            )
+            return
+
+        for name, _ in orphans:
+            # Takes the gzipped copy and the variants with it
+            default_storage.delete(name)
+        for name in variants:
+            os.remove(os.path.join(settings.MEDIA_ROOT, name))
+
+        # Rows of files that are gone, whoever deleted them
+        unused = Blob.objects.filter(refcount=0).values_list("name", flat=True)
+        gone = [name for name in unused if not default_storage.exists(name)]
+        Blob.objects.filter(refcount=0, name__in=gone).delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {len(orphans)} files and {len(variants)} variants, "
+                f"freed {freed:.1f} MB"
+            )
+        )
+
+    def walk(self, directory: str):
+        """
+        Every file under a directory of the media root, relative to the media root
+        """
+        directory = os.path.join(settings.MEDIA_ROOT, directory)
+        if not os.path.isdir(directory):
+            return
+
+        for root, _, filenames in os.walk(directory):
+            for filename in sorted(filenames):
+                path = os.path.join(root, filename)
+                yield os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
+
+    def find_files(self):
+        """
+        The files in the upload directories of the tracked fields, without the gzipped
+        copies which go with their file
+        """
+        for directory in sorted({str(field.upload_to) for field in tracked_fields()}):
+            for name in self.walk(directory):
+                if not name.endswith(".gz"):
+                    yield name
+
+    def find_stale_variants(self):
+        """
+        Variants whose image was deleted without them, and temporary files of variants
+        that were never finished
+        """
+        for name in self.walk(VARIANTS_DIR):
+            match = VARIANT_NAME.match(name)
+            if match is None or not os.path.exists(
+                os.path.join(settings.MEDIA_ROOT, match["original"])
+            ):
+                yield name
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 03:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='reused_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
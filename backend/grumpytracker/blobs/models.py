@@ -0,0 +1,102 @@
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List
+
+from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+
+def by_count(counts: Counter) -> Dict[int, List[str]]:
+    """
+    Group names by how many times they were counted, every group is a single update
+    """
+    groups = defaultdict(list)
+    for name, count in counts.items():
+        groups[count].append(name)
+
+    return groups
+
+
+class BlobQuerySet(models.QuerySet):
+    def acquire(self, names: Iterable[str]) -> None:
+        """
+        Count new references to media files
+        :param names: The file names, a name is counted as often as it is in the list
+        """
+        counts = Counter(name for name in names if name)
+        if not counts:
+            return
+
+        self.bulk_create([Blob(name=name) for name in counts], ignore_conflicts=True)
+        for count, names in by_count(counts).items():
+            self.filter(name__in=names).update(
+                refcount=F("refcount") + count, updated_at=timezone.now()
+            )
+
+    def release(self, names: Iterable[str]) -> None:
+        """
+        Count references that are gone. Files nobody uses anymore stay on disk until
+        gc_media removes them, an upload of the same bytes could want them again
+        :param names: The file names, a name is counted as often as it is in the list
+        """
+        counts = Counter(name for name in names if name)
+        for count, names in by_count(counts).items():
+            self.filter(name__in=names).update(
+                refcount=Greatest(F("refcount") - count, 0), updated_at=timezone.now()
+            )
+
+    def reuse(self, name: str) -> None:
+        """
+        Note that an upload was stored as a file we already have, gc_media leaves it alone
+        for a while since the record pointing to it may not be saved yet
+        """
+        now = timezone.now()
+        self.bulk_create([Blob(name=name)], ignore_conflicts=True)
+        self.filter(name=name).update(reused_at=now, updated_at=now)
+
+    def recount(self, counts: Counter) -> int:
+        """
+        Set every count to the references the records have right now. Bulk writes don't
+        send the signals that keep the counts up to date
+        :param counts: How many references every file name has
+        :returns: The number of blobs whose count changed
+        """
+        now = timezone.now()
+        self.bulk_create([Blob(name=name) for name in counts], ignore_conflicts=True)
+
+        changed = (
+            self.exclude(name__in=list(counts))
+            .exclude(refcount=0)
+            .update(refcount=0, updated_at=now)
+        )
+        for count, names in by_count(counts).items():
+            changed += (
+                self.filter(name__in=names)
+                .exclude(refcount=count)
+                .update(refcount=count, updated_at=now)
+            )
+
+        return changed
+
+
+class Blob(models.Model):
+    """
+    A file in the media storage. Files are stored once under the hash of their content and
+    shared by every record that uploads the same bytes, refcount is how many of those
+    records point to it
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+    # The last upload of bytes we already had, the file itself is never touched so its
+    # modification time (and the ETag it gives) stays the same
+    reused_at = models.DateTimeField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BlobQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
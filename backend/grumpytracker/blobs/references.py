@@ -0,0 +1,100 @@
+from collections import Counter
+from typing import Dict, List, Optional
+
+from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .models import Blob
+from .tasks import queue_variants
+
+# Models whose files are reference counted, track_files adds them
+TRACKED_MODELS: List[type[models.Model]] = []
+
+
+def file_fields(model: type[models.Model]) -> List[str]:
+    return [
+        field.name
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def tracked_fields() -> List[models.FileField]:
+    return [
+        model._meta.get_field(name)
+        for model in TRACKED_MODELS
+        for name in file_fields(model)
+    ]
+
+
+def referenced_names() -> Counter:
+    """
+    Count the references every tracked record has to a media file, one query per model
+    """
+    counts = Counter()
+    for model in TRACKED_MODELS:
+        fields = file_fields(model)
+        for names in model.objects.values_list(*fields):
+            counts.update(name for name in names if name)
+
+    return counts
+
+
+def saved_fields(model: type[models.Model], update_fields) -> List[str]:
+    return [
+        name
+        for name in file_fields(model)
+        if update_fields is None or name in update_fields
+    ]
+
+
+def remember_files(sender, instance, update_fields=None, **kwargs) -> None:
+    """
+    Signal handler for pre_save, keeps the names the record had before it is saved
+    """
+    fields = saved_fields(sender, update_fields)
+    stored: Optional[Dict[str, str]] = None
+    if fields and not instance._state.adding:
+        stored = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+    instance._stored_files = stored or {}
+
+
+def count_files(sender, instance, update_fields=None, **kwargs) -> None:
+    """
+    Signal handler for post_save, a new file is a reference and the file it replaced
+    lost one. New images get their variants made in the background
+    """
+    stored = getattr(instance, "_stored_files", {})
+    acquired = []
+    released = []
+    for name in saved_fields(sender, update_fields):
+        new, old = getattr(instance, name).name or "", stored.get(name) or ""
+        if new != old:
+            acquired.append(new)
+            released.append(old)
+
+    Blob.objects.acquire(acquired)
+    Blob.objects.release(released)
+    queue_variants(acquired)
+
+
+def forget_files(sender, instance, **kwargs) -> None:
+    """
+    Signal handler for post_delete
+    """
+    Blob.objects.release(getattr(instance, name).name for name in file_fields(sender))
+
+
+def track_files(model: type[models.Model]) -> None:
+    """
+    Count the references this model's records have to media files, gc_media removes the
+    files that have none left. Called from the apps' ready() like track_changes
+    """
+    if model not in TRACKED_MODELS:
+        TRACKED_MODELS.append(model)
+
+    uid = f"blobs:{model._meta.label}"
+    pre_save.connect(remember_files, sender=model, dispatch_uid=uid)
+    post_save.connect(count_files, sender=model, dispatch_uid=uid)
+    post_delete.connect(forget_files, sender=model, dispatch_uid=uid)
@@ -0,0 +1,43 @@
+import os
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+
+from grumpytracker import images
+from jobs.models import Job
+from jobs.registry import task
+
+
+# Resizing is CPU bound, leave the other jobs some room
+@task("blobs.make_variants", concurrency=2)
+def make_variants(job, names: List[str]):
+    """
+    Make the resized variants of new images, a request for a variant that isn't made yet
+    still makes it
+    """
+    formats = images.variant_formats()
+    made = 0
+    for done, name in enumerate(names, start=1):
+        # Deleted again before we got to it
+        if os.path.exists(os.path.join(settings.MEDIA_ROOT, name)):
+            made += images.make_variants(
+                settings.MEDIA_ROOT,
+                name,
+                settings.IMAGE_VARIANT_WIDTHS,
+                formats,
+                settings.IMAGE_VARIANT_QUALITY,
+            )
+        job.set_progress(done=done, total=len(names))
+
+    return {"made": made}
+
+
+def queue_variants(names: Iterable[str]) -> Optional[Job]:
+    """
+    Queue a job making the variants of the images we were given, other files are skipped
+    """
+    names = sorted({name for name in names if name and images.is_raster(name)})
+    if not names or not images.variant_formats():
+        return None
+
+    return Job.objects.enqueue("blobs.make_variants", {"names": names})
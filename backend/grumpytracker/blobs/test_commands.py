@@ -0,0 +1,111 @@
+import os
+import pytest
+from io import StringIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from blobs.models import Blob
+from makes.models import Make
+
+
+def make_old(name: str) -> None:
+    """
+    Pretend a media file was written long ago
+    """
+    os.utime(default_storage.path(name), (0, 0))
+
+
+@pytest.mark.django_db
+class TestGcMediaCommand:
+    """
+    Tests for the gc_media management command
+    """
+
+    @pytest.fixture
+    def media(self, settings, temp_media_dir, sample_uploaded_file):
+        """
+        A make with a logo, an old and a new file nobody uses and a variant of a file
+        that is gone
+        """
+        settings.MEDIA_ROOT = temp_media_dir
+        make = Make.create_with_logo(
+            name="Arri", website="", logo_file=sample_uploaded_file
+        )
+        make_old(make.logo.name)
+
+        svg = b"<svg>" + b"<rect/>" * 200 + b"</svg>"
+        orphan = default_storage.save("camera_images/alexa.svg", ContentFile(svg))
+        variant = f"variants/{orphan}.160w.webp"
+        stale = "variants/camera_images/gone.png.160w.webp"
+        for name in [variant, stale]:
+            # Variants are written next to the storage, not through it
+            os.makedirs(os.path.dirname(default_storage.path(name)), exist_ok=True)
+            with open(default_storage.path(name), "wb") as f:
+                f.write(b"webp")
+            make_old(name)
+        make_old(orphan)
+        # Counts can be off after bulk writes
+        Blob.objects.acquire([orphan])
+
+        young = default_storage.save("make_logos/new.png", ContentFile(b"new"))
+
+        return {
+            "logo": make.logo.name,
+            "orphan": orphan,
+            "variant": variant,
+            "stale": stale,
+            "young": young,
+        }
+
+    def test_dry_run(self, media):
+        """
+        A dry run should only list what would be deleted
+        """
+        out = StringIO()
+        call_command("gc_media", dry_run=True, stdout=out)
+
+        assert media["orphan"] in out.getvalue()
+        assert "1 files and 1 variants would be deleted" in out.getvalue()
+        assert all(default_storage.exists(name) for name in media.values())
+        assert Blob.objects.get(name=media["orphan"]).refcount == 1
+
+    def test_gc_media(self, media):
+        """
+        Old files nobody uses should go with their gzipped copy and variants
+        """
+        out = StringIO()
+        call_command("gc_media", stdout=out)
+
+        assert "Fixed the reference count of 1 files" in out.getvalue()
+        assert "Deleted 1 files and 1 variants" in out.getvalue()
+        for name in ["orphan", "variant", "stale"]:
+            assert not default_storage.exists(media[name])
+        assert not default_storage.exists(f"{media['orphan']}.gz")
+        assert default_storage.exists(media["logo"])
+        assert default_storage.exists(media["young"])
+        assert dict(Blob.objects.values_list("name", "refcount")) == {media["logo"]: 1}
+
+    def test_uploaded_again(self, media):
+        """
+        An old orphan that was just uploaded again should be kept, its record may not be
+        saved yet
+        """
+        with default_storage.open(media["orphan"]) as f:
+            assert default_storage.save("camera_images/red.svg", f) == media["orphan"]
+
+        out = StringIO()
+        call_command("gc_media", stdout=out)
+
+        assert "Deleted 0 files and 1 variants" in out.getvalue()
+        assert default_storage.exists(media["orphan"])
+
+    def test_grace(self, media):
+        """
+        Nothing younger than the grace period should be deleted
+        """
+        out = StringIO()
+        call_command("gc_media", grace=0, stdout=out)
+
+        assert "Deleted 2 files and 1 variants" in out.getvalue()
+        assert not default_storage.exists(media["young"])
+        assert default_storage.exists(media["logo"])
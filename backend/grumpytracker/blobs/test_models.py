@@ -0,0 +1,115 @@
+import os
+import pytest
+from collections import Counter
+from django.conf import settings
+from blobs.models import Blob
+from grumpytracker.images import variant_formats, variant_name
+from jobs.models import Job
+from jobs.worker import Worker
+from makes.models import Make
+
+
+def refcounts():
+    return dict(Blob.objects.values_list("name", "refcount"))
+
+
+@pytest.mark.django_db
+class TestBlobCounts:
+    """
+    Tests for counting the references to media files
+    """
+
+    def test_acquire_and_release(self):
+        """
+        Every name is counted as often as it's given and a count never goes below zero
+        """
+        Blob.objects.acquire(["a.png", "a.png", "b.png", ""])
+        assert refcounts() == {"a.png": 2, "b.png": 1}
+
+        Blob.objects.release(["a.png", "b.png", "b.png", "c.png"])
+        assert refcounts() == {"a.png": 1, "b.png": 0}
+
+    def test_recount(self):
+        """
+        A recount should set every count to the references we found
+        """
+        Blob.objects.acquire(["a.png"] * 5 + ["b.png"])
+
+        changed = Blob.objects.recount(Counter({"b.png": 1, "c.png": 2}))
+
+        assert changed == 2
+        assert refcounts() == {"a.png": 0, "b.png": 1, "c.png": 2}
+
+
+@pytest.mark.django_db
+class TestTrackFiles:
+    """
+    Tests for keeping the counts up to date when records are saved and deleted
+    """
+
+    def test_shared_upload(self, sample_uploaded_file, temp_media_dir):
+        """
+        The same upload should be stored once and counted for every record using it
+        """
+        arri = Make.create_with_logo(name="Arri", website="", logo_file=sample_uploaded_file)
+        sample_uploaded_file.seek(0)
+        red = Make.create_with_logo(name="Red", website="", logo_file=sample_uploaded_file)
+
+        assert arri.logo.name == red.logo.name
+        assert refcounts() == {arri.logo.name: 2}
+
+        red.delete()
+        assert refcounts() == {arri.logo.name: 1}
+
+    def test_save_without_new_file(
+        self, sample_uploaded_file, single_camera, temp_media_dir
+    ):
+        """
+        Saving a record without touching its file should leave the count alone
+        """
+        make = single_camera.make
+        make.update_logo(sample_uploaded_file)
+
+        make.name = "Renamed"
+        make.save()
+        # Renaming a make saves its cameras with update_fields
+        single_camera.save(update_fields=["model"])
+
+        assert refcounts() == {make.logo.name: 1}
+
+
+@pytest.mark.django_db
+class TestVariantsJob:
+    """
+    Tests for making the variants of new images in the background
+    """
+
+    def test_new_image_queues_variants(self, sample_uploaded_file):
+        """
+        Saving a new image should queue a job that makes its variants, other saves
+        should not
+        """
+        make = Make.create_with_logo(name="Arri", website="", logo_file=sample_uploaded_file)
+        job = Job.objects.get(name="blobs.make_variants")
+        assert job.payload == {"names": [make.logo.name]}
+
+        make.name = "Renamed"
+        make.save()
+        assert Job.objects.count() == 1
+
+        # Uploads are stored by their content, an earlier test may have made them
+        paths = [
+            os.path.join(settings.MEDIA_ROOT, variant_name(make.logo.name, width, fmt))
+            for width in settings.IMAGE_VARIANT_WIDTHS
+            for fmt in variant_formats()
+        ]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+        Worker().run_once()
+
+        job.refresh_from_db()
+        assert job.status == Job.DONE
+        assert job.result == {"made": len(paths)}
+        assert all(os.path.exists(path) for path in paths)
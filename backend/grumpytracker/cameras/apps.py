@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class CamerasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cameras'
+
+    def ready(self):
+        from blobs.references import track_files
+        from grumpytracker.cache import track_changes
+
+        # Edits to cameras invalidate the cached catalogue responses
+        track_changes(self.get_model('Camera'))
+
+        # The images are shared files, gc_media removes them once nobody uses them
+        track_files(self.get_model('Camera'))
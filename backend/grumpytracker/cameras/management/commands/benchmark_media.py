@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.views.static import serve
+
+from grumpytracker.media import serve_media
+from grumpytracker.storage import HashedMediaStorage
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare how many media requests a single worker answers per second with "
+        "django.views.static.serve and with our media view, sending the files, answering "
+        "revalidations and handing them to the web server. Files are written to a "
+        "temporary media root"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--files", type=int, default=20, help="Images to serve")
+        parser.add_argument("--size", type=int, default=200, help="Image size in KB")
+        parser.add_argument(
+            "--requests", type=int, default=500, help="Requests to make for every route"
+        )
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                storage = HashedMediaStorage(location=media_root)
+                paths = [
+                    storage.save(
+                        f"camera_images/camera_{i}.png",
+                        ContentFile(os.urandom(options["size"] * 1024)),
+                    )
+                    for i in range(options["files"])
+                ]
+                self.benchmark(media_root, paths, options["requests"])
+        finally:
+            shutil.rmtree(media_root)
+
+    def benchmark(self, media_root: str, paths, requests: int) -> None:
+        factory = RequestFactory()
+        etags = {path: serve_media(factory.get("/"), path)["ETag"] for path in paths}
+
+        routes = {
+            "static.serve": lambda path: serve(
+                factory.get("/"), path, document_root=media_root
+            ),
+            "serve_media": lambda path: serve_media(factory.get("/"), path),
+            "serve_media revalidation (304)": lambda path: serve_media(
+                factory.get("/", headers={"If-None-Match": etags[path]}), path
+            ),
+        }
+        for name, route in routes.items():
+            self.time_route(name, route, paths, requests)
+
+        with override_settings(MEDIA_OFFLOAD_HEADER="X-Accel-Redirect"):
+            self.time_route(
+                "serve_media X-Accel-Redirect",
+                lambda path: serve_media(factory.get("/"), path),
+                paths,
+                requests,
+            )
+
+    def time_route(self, name: str, route, paths, requests: int) -> None:
+        sent = 0
+        start = time.perf_counter()
+        for i in range(requests):
+            response = route(paths[i % len(paths)])
+            # Read the body like the WSGI server would, the worker is busy until it's sent
+            if response.streaming:
+                sent += sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                sent += len(response.content)
+            response.close()
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{name}: {requests / elapsed:.0f} requests/s, "
+            f"{sent / elapsed / 1024 / 1024:.1f} MB/s sent by the worker"
+        )
@@ -0,0 +1,88 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from loguru import logger
+
+from cameras.models import Camera
+from cameras.seed import seed_db
+from formats.models import Format
+from makes.models import Make
+from sources.models import Source
+
+# Each path is timed on an empty catalogue and then seeding again over the first run
+PHASES = ["empty database", "reseed"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time seeding the catalogue one record at a time against the bulk upserts. "
+        "Every run happens in a transaction that is rolled back and skips the images"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--runs", type=int, default=5, help="Number of times to run each path"
+        )
+
+    def handle(self, *args, **options):
+        # The seed logs every record, that would drown the results
+        logger.disable("cameras.seed")
+        try:
+            for name, bulk in [("get_or_create", False), ("bulk upsert", True)]:
+                timings = {phase: [] for phase in PHASES}
+                queries = {}
+                errors = {}
+                for _ in range(options["runs"]):
+                    for phase, (elapsed, count, error) in zip(PHASES, self.run(bulk)):
+                        if error:
+                            errors[phase] = error
+                            continue
+                        timings[phase].append(elapsed)
+                        queries[phase] = count
+
+                for phase in PHASES:
+                    if phase in errors:
+                        self.stdout.write(f"{name}, {phase}: failed, {errors[phase]}")
+                        continue
+
+                    self.stdout.write(
+                        f"{name}, {phase}: median "
+                        f"{statistics.median(timings[phase]):.2f} ms, "
+                        f"{queries[phase]} queries"
+                    )
+        finally:
+            logger.enable("cameras.seed")
+
+    def run(self, bulk: bool):
+        """
+        Seed an empty catalogue and then seed it again
+        :returns: The time (ms), number of queries and error (if it failed) of each seed
+        """
+        results = []
+        with transaction.atomic():
+            for model in [Format, Source, Camera, Make]:
+                model.objects.all().delete()
+
+            for _ in PHASES:
+                try:
+                    with transaction.atomic(), CaptureQueriesContext(
+                        connection
+                    ) as captured:
+                        start = time.perf_counter()
+                        seed_db(bulk=bulk, images=False)
+                        elapsed = (time.perf_counter() - start) * 1000
+                except IntegrityError as e:
+                    # get_or_create looks formats up before save() changes their pixel
+                    # aspect, so seeding twice trips the unique constraint
+                    results.append((None, None, str(e).splitlines()[0]))
+                    continue
+
+                results.append((elapsed, len(captured.captured_queries), None))
+
+            # We never want to keep the benchmark's records
+            transaction.set_rollback(True)
+
+        return results
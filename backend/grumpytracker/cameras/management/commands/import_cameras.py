@@ -0,0 +1,62 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cameras.services.bulk_import import import_cameras, open_images
+from grumpytracker.imports import IMPORT_FORMATS, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create cameras from a manifest (JSON, CSV or NDJSON) and a directory or zip file "
+        "with the images it names"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("manifest", help="Path to the manifest")
+        parser.add_argument("--images", help="Directory or zip file with the images")
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            help="How the manifest is encoded, defaults to its extension",
+        )
+        parser.add_argument("--workers", type=int, help="Threads writing the images")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only validate the manifest"
+        )
+
+    def handle(self, *args, **options):
+        encoding = options["format"]
+        if encoding is None:
+            encoding = os.path.splitext(options["manifest"])[1].lstrip(".").lower()
+            if encoding not in IMPORT_FORMATS:
+                raise CommandError("Can't tell how the manifest is encoded, use --format")
+
+        images = None
+        try:
+            with open(options["manifest"], encoding="utf-8-sig") as f:
+                rows = read_rows(f.read(), encoding)
+            if options["images"]:
+                images = open_images(options["images"])
+
+            cameras, errors = import_cameras(
+                rows,
+                images=images,
+                dry_run=options["dry_run"],
+                workers=options["workers"],
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        finally:
+            if images is not None:
+                images.close()
+
+        for error in errors:
+            self.stderr.write(f"Row {error['row']}: {error['error']}")
+        if errors:
+            raise CommandError(f"{len(errors)} of {len(rows)} cameras have errors")
+
+        if options["dry_run"]:
+            self.stdout.write(f"All {len(cameras)} cameras are valid")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Created {len(cameras)} cameras"))
@@ -0,0 +1,115 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cameras.models import Camera
+from cameras.services.pdf_importer import FormatExtractor, SpecSheetCache
+from cameras.services.spec_import import import_spec_formats
+from jobs.models import Job
+from sources.models import Source
+
+
+class Command(BaseCommand):
+    help = (
+        "Read the recording formats of a manufacturer's spec sheet PDF and add them to "
+        "a camera, formats the camera has are updated. Pages are parsed in parallel "
+        "and kept in SPEC_SHEET_CACHE_DIR so they are not parsed again. Large sheets "
+        "can be queued for the workers with --background"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("pdf", help="Path to the spec sheet")
+        parser.add_argument(
+            "--camera", type=int, required=True, help="Id of the camera it describes"
+        )
+        parser.add_argument("--source", type=int, help="Id of the source to credit")
+        parser.add_argument(
+            "--codec", default="", help="Codec the formats are recorded in"
+        )
+        parser.add_argument(
+            "--workers", type=int, help="Processes to use, defaults to one per CPU"
+        )
+        parser.add_argument(
+            "--no-cache", action="store_true", help="Parse every page again"
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only list the formats we found"
+        )
+        parser.add_argument(
+            "--background",
+            action="store_true",
+            help="Queue the import for the workers instead of running it here",
+        )
+
+    def handle(self, *args, **options):
+        camera = (
+            Camera.objects.select_related("make").filter(pk=options["camera"]).first()
+        )
+        if camera is None:
+            raise CommandError(f"Camera {options['camera']} not found")
+
+        source = None
+        if options["source"] is not None:
+            source = Source.objects.filter(pk=options["source"]).first()
+            if source is None:
+                raise CommandError(f"Source {options['source']} not found")
+
+        if options["background"] and not options["dry_run"]:
+            # The workers may run somewhere else, they need a path that doesn't
+            # depend on where we are
+            pdf = os.path.abspath(options["pdf"])
+            if not os.path.isfile(pdf):
+                raise CommandError(f"{options['pdf']} not found")
+
+            job = Job.objects.enqueue(
+                "cameras.import_spec_pdf",
+                {
+                    "pdf": pdf,
+                    "camera_id": camera.id,
+                    "source_id": source.id if source is not None else None,
+                    "codec": options["codec"],
+                    "use_cache": not options["no_cache"],
+                },
+            )
+            self.stdout.write(self.style.SUCCESS(f"Queued job {job.id}"))
+            return
+
+        cache = None
+        if not options["no_cache"]:
+            cache = SpecSheetCache(settings.SPEC_SHEET_CACHE_DIR)
+        extractor = FormatExtractor(workers=options["workers"], cache=cache)
+        formats = extractor.extract_from_pdf(
+            options["pdf"], on_progress=self.report_progress
+        )
+        try:
+            records, created = import_spec_formats(
+                camera,
+                formats,
+                source=source,
+                codec=options["codec"],
+                dry_run=options["dry_run"],
+            )
+        except (OSError, RuntimeError) as e:
+            # PyMuPDF raises RuntimeErrors for files that aren't PDFs
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Parsed {extractor.parsed_pages} pages, "
+            f"{extractor.cached_pages} came from the cache"
+        )
+        if options["dry_run"]:
+            for record in records:
+                self.stdout.write(record.name)
+            self.stdout.write(f"Found {len(records)} formats for {camera}")
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {created} and updated {len(records) - created} formats "
+                f"for {camera}"
+            )
+        )
+
+    def report_progress(self, done: int, total: int) -> None:
+        self.stdout.write(f"Parsed page {done} of {total}")
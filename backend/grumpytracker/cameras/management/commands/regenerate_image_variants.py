@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cameras.models import Camera
+from grumpytracker.images import is_raster, make_variants, variant_formats
+from makes.models import Make
+
+# The image fields whose upload directories we go through
+IMAGE_FIELDS = [Camera._meta.get_field("image"), Make._meta.get_field("logo")]
+
+
+class Command(BaseCommand):
+    help = (
+        "Make the resized variants of every camera image and make logo in the media "
+        "directory, spread over a few processes. Variants that exist are skipped"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, help="Processes to use, defaults to one per CPU"
+        )
+        parser.add_argument(
+            "--force", action="store_true", help="Make the variants that exist again"
+        )
+
+    def handle(self, *args, **options):
+        originals = list(self.find_originals())
+        self.stdout.write(f"Found {len(originals)} images")
+
+        made = 0
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            # The workers only touch the disk, they get everything they need as arguments
+            futures = {
+                pool.submit(
+                    make_variants,
+                    settings.MEDIA_ROOT,
+                    original,
+                    settings.IMAGE_VARIANT_WIDTHS,
+                    variant_formats(),
+                    settings.IMAGE_VARIANT_QUALITY,
+                    options["force"],
+                ): original
+                for original in originals
+            }
+            for future in as_completed(futures):
+                try:
+                    made += future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{futures[future]}: {e}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Made {made} variants, {failed} images failed")
+        )
+
+    def find_originals(self):
+        """
+        Every image we can resize in the upload directories, relative to the media root
+        """
+        for field in IMAGE_FIELDS:
+            directory = os.path.join(settings.MEDIA_ROOT, field.upload_to)
+            if not os.path.isdir(directory):
+                continue
+
+            for root, _, filenames in os.walk(directory):
+                for filename in sorted(filenames):
+                    if not is_raster(filename):
+                        continue
+                    path = os.path.join(root, filename)
+                    yield os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
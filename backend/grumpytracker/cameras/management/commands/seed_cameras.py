@@ -9,6 +9,11 @@ class Command(BaseCommand):
         parser.add_argument(
             "--reset", action="store_true", help="Clear database before seeding"
         )
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help="Write every table with bulk upserts instead of one record at a time",
+        )
 
     def handle(self, *args, **options):
         if options["reset"]:
@@ -17,6 +22,6 @@ class Command(BaseCommand):
         else:
             self.stdout.write("Seeding database...")
 
-        seed_db()
+        seed_db(bulk=options["bulk"])
 
         self.stdout.write(self.style.SUCCESS("Successfully seeded camera database"))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:29
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.db import migrations
+
+
+# Build the search document for the existing cameras, new saves keep it up to date
+BACKFILL_SEARCH_VECTOR = """
+UPDATE cameras_camera AS camera SET search_vector =
+    setweight(to_tsvector('simple', coalesce(camera.model, '')), 'A')
+    || setweight(to_tsvector('simple', coalesce(make.name, '')), 'A')
+    || setweight(to_tsvector('simple', coalesce(camera.sensor_type, '')), 'B')
+    || setweight(to_tsvector('simple', coalesce(camera.sensor_size, '')), 'B')
+    || setweight(to_tsvector('simple', coalesce(camera.notes, '')), 'C')
+FROM makes_make AS make
+WHERE make.id = camera.make_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cameras', '0003_camera_sensor_size'),
+        ('makes', '0003_make_make_name_upper_trgm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camera',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='camera',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='camera_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='camera',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['model'], name='camera_model_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='camera',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('model'), name='gin_trgm_ops'), name='camera_model_upper_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='camera',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('sensor_type'), name='gin_trgm_ops'), name='camera_sensor_upper_trgm'),
+        ),
+        migrations.RunSQL(BACKFILL_SEARCH_VECTOR, migrations.RunSQL.noop),
+    ]
@@ -1,10 +1,15 @@
 import os
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
 from django.core.validators import MinValueValidator
 from django.core.files import File
 from makes.models import Make
 from django.conf import settings
 from typing import Dict, Any
+from grumpytracker.images import image_variants
+from grumpytracker.search import search_document
 
 
 class Camera(models.Model):
@@ -45,6 +50,9 @@ class Camera(models.Model):
 
     image = models.ImageField(upload_to='camera_images/', blank=True, null=True)
 
+    # Full text search document, this is rebuilt every time the camera is saved
+    search_vector = SearchVectorField(null=True, editable=False)
+
     # Audit fields
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -52,6 +60,25 @@ class Camera(models.Model):
     def __str__(self):
         return f'{self.make.name} {self.model}'
 
+    def build_search_vector(self):
+        """
+        Build the search document for this camera, the model and make are the most important parts
+        """
+        return search_document(
+            (self.model, 'A'),
+            (self.make.name, 'A'),
+            (self.sensor_type, 'B'),
+            (self.sensor_size, 'B'),
+            (self.notes, 'C'),
+        )
+
+    def save(self, *args, **kwargs):
+        """
+        Overrides the model's save function to keep the search document up to date
+        """
+        self.search_vector = self.build_search_vector()
+        super().save(*args, **kwargs)
+
     @classmethod
     def create_with_image(cls, image_file=None, image_path=None, **kwargs):
         """
@@ -103,13 +130,25 @@ class Camera(models.Model):
             'notes': self.notes,
             'discontinued': self.discontinued,
             'image': self.image.url if self.image else None,
+            'image_variants': image_variants(self.image),
         }
 
     def with_formats(self):
         return {
             **self.as_dict(),
-            'formats': [fmt.as_dict() for fmt in self.formats.all()],
+            'formats': [fmt.as_dict() for fmt in self.formats.for_serialization()],
         }
 
     class Meta:
         unique_together = ['make', 'model']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='camera_search_vector_gin'),
+            # Plain trigram index for fuzzy matching the model name
+            GinIndex(fields=['model'], opclasses=['gin_trgm_ops'], name='camera_model_trgm'),
+            # icontains compiles to UPPER(field) LIKE UPPER(term), these indexes match that
+            GinIndex(OpClass(Upper('model'), name='gin_trgm_ops'), name='camera_model_upper_trgm'),
+            GinIndex(
+                OpClass(Upper('sensor_type'), name='gin_trgm_ops'),
+                name='camera_sensor_upper_trgm',
+            ),
+        ]
@@ -1,9 +1,15 @@
 import os
+from typing import Dict, List
+from blobs.models import Blob
+from blobs.references import file_fields
 from makes.models import Make
 from cameras.models import Camera
 from formats.models import Format
+from formats.derivations import derive_formats
+from grumpytracker.cache import bump_label
 from sources.models import Source
-from django.db import transaction, connection
+from django.db import models, transaction, connection
+from django.utils import timezone
 from django.conf import settings
 from django.core.files import File
 from loguru import logger
@@ -14,14 +20,9 @@ SEED_IMAGES_PATH = os.path.join(settings.BASE_DIR, "static", "seed_images")
 
 @transaction.atomic
 def clear_database():
-    # We first delete all seeded images
-    for make in Make.objects.all():
-        if make.logo:
-            make.logo.delete(save=False)
-
-    for camera in Camera.objects.all():
-        if camera.image:
-            camera.image.delete(save=False)
+    # We first delete all seeded images, we only need their names for that
+    delete_files(Make, "logo")
+    delete_files(Camera, "image")
 
     # Format.objects.delete() returns a tuple (count_deleted, dict_with_details)
     formats_deleted = Format.objects.all().delete()[0]
@@ -48,8 +49,122 @@ def clear_database():
     }
 
 
+def delete_files(model, field_name: str) -> None:
+    """
+    Delete the files a model's file field points to
+    """
+    storage = model._meta.get_field(field_name).storage
+    names = (
+        model.objects.exclude(**{f"{field_name}__isnull": True})
+        .exclude(**{field_name: ""})
+        .values_list(field_name, flat=True)
+    )
+    for name in names:
+        storage.delete(name)
+
+
+def upsert(model, records: List[models.Model]) -> List[models.Model]:
+    """
+    Insert the records, or update the ones that already exist, in a single statement.
+    Records are matched on the model's unique_together fields. Files are left alone so
+    re-seeding keeps the images we already have
+    """
+    unique_fields = list(model._meta.unique_together[0])
+    key_fields = [model._meta.get_field(name).attname for name in unique_fields]
+    skip = set(unique_fields) | set(file_fields(model)) | {"created_at"}
+    update_fields = [
+        field.name
+        for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in skip
+    ]
+
+    # Postgres can't update the same row twice in one statement, the last one wins
+    unique = {}
+    for record in records:
+        unique[tuple(getattr(record, name) for name in key_fields)] = record
+
+    return model.objects.bulk_create(
+        unique.values(),
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields,
+    )
+
+
+def upsert_by_name(model, records: List[models.Model]) -> List[models.Model]:
+    """
+    Same as upsert for models that don't have a unique constraint, we find the existing
+    records by name in one query and then insert and update in bulk
+    """
+    existing = {}
+    for record in model.objects.filter(name__in=[record.name for record in records]):
+        existing.setdefault(record.name, record)
+
+    skip = set(file_fields(model)) | {"created_at"}
+    update_fields = [
+        field.name
+        for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in skip
+    ]
+
+    new = []
+    changed = []
+    now = timezone.now()
+    for record in records:
+        found = existing.get(record.name)
+        if found is None:
+            new.append(record)
+            continue
+
+        record.pk = found.pk
+        record.created_at = found.created_at
+        record.updated_at = now
+        for name in file_fields(model):
+            setattr(record, name, getattr(found, name))
+        changed.append(record)
+
+    model.objects.bulk_create(new)
+    if changed:
+        model.objects.bulk_update(changed, update_fields)
+
+    return new + changed
+
+
+def save_seed_images(records: Dict[str, models.Model], field_name: str) -> None:
+    """
+    Attach the seed images to the records that don't have one yet, with a single update
+    :param records: The records by the name of their image in SEED_IMAGES_PATH
+    """
+    if not records:
+        return
+
+    model = type(next(iter(records.values())))
+    have_image = set(
+        model.objects.filter(pk__in=[record.pk for record in records.values()])
+        .exclude(**{f"{field_name}__isnull": True})
+        .exclude(**{field_name: ""})
+        .values_list("pk", flat=True)
+    )
+
+    changed = []
+    for image, record in records.items():
+        path = os.path.join(SEED_IMAGES_PATH, image)
+        if record.pk in have_image or not os.path.exists(path):
+            continue
+
+        with open(path, "rb") as f:
+            field_file = getattr(record, field_name)
+            field_file.save(os.path.basename(path), File(f), save=False)
+        changed.append(record)
+
+    if changed:
+        model.objects.bulk_update(changed, [field_name])
+        # bulk_update does not send post_save, count the references ourselves
+        Blob.objects.acquire(getattr(record, field_name).name for record in changed)
+
+
 @transaction.atomic
-def seed_makes():
+def seed_makes(bulk: bool = False, images: bool = True):
     makes = [
         {
             "name": "ARRI",
@@ -63,13 +178,24 @@ def seed_makes():
         },
     ]
 
+    if bulk:
+        logos = {m.pop("logo"): Make(**m) for m in makes}
+        created_makes = {
+            make.name: make for make in upsert_by_name(Make, list(logos.values()))
+        }
+        if images:
+            save_seed_images(logos, "logo")
+        logger.info(f"Seeded {len(created_makes)} makes")
+
+        return created_makes
+
     created_makes = {}
     for m in makes:
         logo = os.path.join(SEED_IMAGES_PATH, m["logo"])
         logger.warning(f"Loading image from {logo}")
         del m["logo"]
         make, new = Make.objects.get_or_create(**m)
-        if os.path.exists(logo):
+        if images and os.path.exists(logo):
             logger.warning("Logo file was found!")
             with open(logo, "rb") as f:
                 make.logo.save(os.path.basename(logo), File(f), save=True)
@@ -81,7 +207,7 @@ def seed_makes():
 
 
 @transaction.atomic
-def seed_cameras(makes):
+def seed_cameras(makes, bulk: bool = False, images: bool = True):
     cameras = [
         {
             "make": makes.get("ARRI") or Make.objects.get("ARRI"),
@@ -187,12 +313,31 @@ def seed_cameras(makes):
         },
     ]
 
+    if bulk:
+        records = []
+        camera_images = {}
+        for cam in cameras:
+            image = cam.pop("image", None)
+            camera = Camera(**cam)
+            # bulk_create skips save, build the search document ourselves
+            camera.search_vector = camera.build_search_vector()
+            records.append(camera)
+            if image:
+                camera_images[image] = camera
+
+        created_cameras = {camera.model: camera for camera in upsert(Camera, records)}
+        if images:
+            save_seed_images(camera_images, "image")
+        logger.info(f"Seeded {len(created_cameras)} cameras")
+
+        return created_cameras
+
     created_cameras = {}
     for cam in cameras:
         image = os.path.join(SEED_IMAGES_PATH, cam.get("image", "unknown"))
         logger.warning(f"Trying to load image {image}")
         camera, new = Camera.objects.get_or_create(**cam)
-        if os.path.exists(image):
+        if images and os.path.exists(image):
             with open(image, "rb") as f:
                 camera.image.save(os.path.basename(image), File(f), save=True)
         created_cameras[cam["model"]] = camera
@@ -202,7 +347,7 @@ def seed_cameras(makes):
 
 
 @transaction.atomic
-def seed_sources():
+def seed_sources(bulk: bool = False):
     sources = [
         {
             "name": "Alexa 35 User Manual",
@@ -249,6 +394,20 @@ def seed_sources():
         },
     ]
 
+    if bulk:
+        records = []
+        for s in sources:
+            source = Source(**s)
+            source.search_vector = source.build_search_vector()
+            records.append(source)
+
+        created_sources = {
+            source.name: source for source in upsert_by_name(Source, records)
+        }
+        logger.info(f"Seeded {len(created_sources)} sources")
+
+        return created_sources
+
     created_sources = {}
     for s in sources:
         source, new = Source.objects.get_or_create(**s)
@@ -259,7 +418,7 @@ def seed_sources():
 
 
 @transaction.atomic
-def seed_formats(cameras, sources):
+def seed_formats(cameras, sources, bulk: bool = False):
     formats = [
         {
             "camera": cameras.get("Alexa 35") or Camera.objects.get("Alexa 35"),
@@ -1794,6 +1953,21 @@ def seed_formats(cameras, sources):
         },
     ]
 
+    if bulk:
+        records = [Format(**fmt) for fmt in formats]
+        # bulk_create skips save, work out the 3DE and search fields ourselves in one pass
+        derive_formats(records)
+        for format_record in records:
+            format_record.search_vector = format_record.build_search_vector()
+
+        created_formats = {
+            format_record.id: format_record
+            for format_record in upsert(Format, records)
+        }
+        logger.info(f"Seeded {len(created_formats)} formats")
+
+        return created_formats
+
     created_formats = {}
     for fmt in formats:
         format_record, new = Format.objects.get_or_create(**fmt)
@@ -1803,8 +1977,19 @@ def seed_formats(cameras, sources):
         )
 
 
-def seed_db():
-    makes = seed_makes()
-    cameras = seed_cameras(makes)
-    sources = seed_sources()
-    formats = seed_formats(cameras, sources)
+def seed_db(bulk: bool = False, images: bool = True):
+    """
+    Seed the catalogue. The bulk path writes every table in a few statements and can be
+    run again to update the seeded records, the default path saves one record at a time
+    :param bulk: Use bulk upserts instead of get_or_create
+    :param images: Save the make logos and camera images
+    """
+    makes = seed_makes(bulk=bulk, images=images)
+    cameras = seed_cameras(makes, bulk=bulk, images=images)
+    sources = seed_sources(bulk=bulk)
+    formats = seed_formats(cameras, sources, bulk=bulk)
+
+    if bulk:
+        # Bulk writes don't send post_save, let the response cache know
+        for model in [Make, Camera, Source, Format]:
+            bump_label(model._meta.label)
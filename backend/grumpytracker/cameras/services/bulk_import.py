@@ -0,0 +1,247 @@
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+
+from blobs.models import Blob
+from blobs.tasks import queue_variants
+from cameras.models import Camera
+from grumpytracker.cache import bump_label
+from grumpytracker.imports import normalize_values, validation_error
+from grumpytracker.utils import validate_required_fields
+from makes.models import Make
+
+# Same as a single POST to cameras/
+REQUIRED_FIELDS = [
+    "make",
+    "model",
+    "sensor_type",
+    "max_filmback_width",
+    "max_filmback_height",
+    "max_image_width",
+    "max_image_height",
+    "min_frame_rate",
+    "max_frame_rate",
+]
+
+# Everything a manifest can set, image is the name of the camera's image in the archive
+IMPORT_FIELDS = {*REQUIRED_FIELDS, "sensor_size", "notes", "discontinued", "image"}
+
+RowError = Dict[str, Any]
+
+
+class DirectoryImages:
+    """
+    Images for an import in a directory on disk
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = os.path.realpath(path)
+
+    def full_path(self, name: str) -> Optional[str]:
+        path = os.path.realpath(os.path.join(self.path, name))
+        # Manifests can't reach outside the directory with ../
+        if os.path.commonpath([self.path, path]) != self.path:
+            return None
+        return path
+
+    def __contains__(self, name: str) -> bool:
+        path = self.full_path(name)
+        return path is not None and os.path.isfile(path)
+
+    def read(self, name: str) -> bytes:
+        with open(self.full_path(name), "rb") as f:
+            return f.read()
+
+    def close(self) -> None:
+        pass
+
+
+class ZipImages:
+    """
+    Images for an import in a zip file, on disk or uploaded. Reading members is safe
+    from several threads, zipfile locks the underlying file
+    """
+
+    def __init__(self, file) -> None:
+        self.archive = zipfile.ZipFile(file)
+        self.names = {
+            info.filename.removeprefix("./")
+            for info in self.archive.infolist()
+            if not info.is_dir()
+        }
+
+    def __contains__(self, name: str) -> bool:
+        return name.removeprefix("./") in self.names
+
+    def read(self, name: str) -> bytes:
+        return self.archive.read(name.removeprefix("./"))
+
+    def close(self) -> None:
+        self.archive.close()
+
+
+Images = Union[DirectoryImages, ZipImages]
+
+
+def open_images(source) -> Images:
+    """
+    Open the images of an import
+    :param source: A directory, a path to a zip file or an uploaded zip file
+    :raises ValueError: When the source is neither a directory nor a zip file
+    """
+    if isinstance(source, str) and os.path.isdir(source):
+        return DirectoryImages(source)
+
+    try:
+        return ZipImages(source)
+    except (zipfile.BadZipFile, OSError):
+        raise ValueError("Images have to be a directory or a zip file")
+
+
+def make_lookup(rows: List[Dict[str, Any]]) -> Dict[str, Make]:
+    """
+    Find every make the rows use in one query, a make can be given by id or by name
+    :returns: The makes by their id (as text) and by their name
+    """
+    references = {str(row["make"]).strip() for row in rows if row.get("make")}
+    ids = [int(reference) for reference in references if reference.isdigit()]
+    makes = Make.objects.filter(Q(id__in=ids) | Q(name__in=references))
+
+    lookup = {}
+    for make in makes:
+        lookup[make.name] = make
+        lookup[str(make.id)] = make
+    return lookup
+
+
+def write_images(
+    cameras: List[Tuple[Camera, str]], images: Images, workers: int
+) -> List[Camera]:
+    """
+    Save the images of new cameras to storage on a few threads. The cameras are not
+    saved, if any image fails the ones that were written are left for gc_media since
+    other records can share them
+    :param cameras: The cameras and the name of their image in the archive
+    """
+
+    def write(item: Tuple[Camera, str]) -> Camera:
+        camera, name = item
+        camera.image.save(
+            os.path.basename(name), ContentFile(images.read(name)), save=False
+        )
+        return camera
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(write, cameras))
+
+
+def import_cameras(
+    rows: List[Dict[str, Any]],
+    images: Optional[Images] = None,
+    dry_run: bool = False,
+    workers: Optional[int] = None,
+) -> Tuple[List[Camera], List[RowError]]:
+    """
+    Validate and create many cameras at once. Every row is checked before anything is
+    written, if any of them has an error nothing is saved. The cameras are inserted in
+    one statement, their images are written in parallel and attached with one update
+    :param rows: The cameras to create, with the same fields a POST to cameras/ takes
+    :param images: Where to find the images the rows name
+    :param dry_run: Only validate the rows
+    :param workers: Threads writing images, defaults to IMPORT_IMAGE_WORKERS
+    :returns: The cameras (saved unless dry_run) and the errors of every bad row, rows are
+        numbered from 1
+    """
+    errors: List[RowError] = []
+
+    def error(row_number: int, message: str) -> None:
+        errors.append({"row": row_number, "error": message})
+
+    makes = make_lookup(rows)
+
+    cameras = []
+    for row_number, row in enumerate(rows, start=1):
+        unknown = sorted(set(row) - IMPORT_FIELDS)
+        if unknown:
+            error(row_number, f"Unknown fields {', '.join(unknown)}")
+            continue
+
+        missing = validate_required_fields(row, REQUIRED_FIELDS)
+        if missing:
+            error(row_number, missing)
+            continue
+
+        make = makes.get(str(row["make"]).strip())
+        if make is None:
+            error(row_number, f"Make {row['make']} not found")
+            continue
+
+        image = row.get("image")
+        if image and (images is None or image not in images):
+            error(row_number, f"Image {image} not found")
+            continue
+
+        values = {
+            field: value for field, value in row.items() if field not in ("make", "image")
+        }
+        normalize_values(Camera, values)
+        camera = Camera(make=make, **values)
+        try:
+            # Converts the values (CSV sends everything as text) and runs the validators
+            camera.full_clean(
+                exclude=["make", "image"],
+                validate_unique=False,
+                validate_constraints=False,
+            )
+        except ValidationError as e:
+            error(row_number, validation_error(e))
+            continue
+
+        cameras.append((row_number, camera, image))
+
+    existing = set(
+        Camera.objects.filter(
+            make_id__in={camera.make_id for _, camera, _ in cameras},
+            model__in={camera.model for _, camera, _ in cameras},
+        ).values_list("make_id", "model")
+    )
+    seen = {}
+    for row_number, camera, _ in cameras:
+        key = (camera.make_id, camera.model)
+        if key in existing:
+            error(row_number, f"Camera {camera} already exists")
+        elif key in seen:
+            error(row_number, f"Same camera as row {seen[key]}")
+        else:
+            seen[key] = row_number
+
+    errors.sort(key=lambda e: e["row"])
+    if errors or dry_run:
+        return [camera for _, camera, _ in cameras], errors
+
+    for _, camera, _ in cameras:
+        camera.search_vector = camera.build_search_vector()
+
+    with transaction.atomic():
+        created = Camera.objects.bulk_create([camera for _, camera, _ in cameras])
+
+        with_images = [(camera, image) for _, camera, image in cameras if image]
+        written = write_images(
+            with_images, images, workers or settings.IMPORT_IMAGE_WORKERS
+        )
+        Camera.objects.bulk_update(written, ["image"])
+        # bulk_update does not send post_save, count the references ourselves
+        Blob.objects.acquire(camera.image.name for camera in written)
+        queue_variants(camera.image.name for camera in written)
+
+    # bulk_create does not send post_save, let the response cache know
+    bump_label(Camera._meta.label)
+
+    return created, errors
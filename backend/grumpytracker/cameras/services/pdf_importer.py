@@ -1,213 +1,407 @@
-import fitz
+import hashlib
+import json
+import os
 import re
-from pprint import pprint
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
-from typing import List, Dict, Any, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
+import pymupdf
 
-@dataclass
-class FormatExtractor:
-    """Flexible extractor for camera formats"""
-
-    # Common patterns to look for
-    format_header_pattern: str = (
-        r"^(\d+(?:\.\d+)?K\s+\d+:\d+(?:\s+(?:Open\s+Gate|S16))?)$"
-    )
-    dimension_pattern: str = r"(\d+\.\d+)\s*x\s*(\d+\.\d+)\s*mm"
-    resolution_pattern: str = (
-        r"([A-Za-z0-9\.]+(?:\s+[A-Za-z0-9\.]+)*)\s*\((\d+)\s*x\s*(\d+)\)"
-    )
-    circle_pattern: str = r"Image Circle [Ø]?\s*(\d+\.\d+)\s*mm"
-
-    # Results
-    formats_dict: Dict[str, Dict[str, Any]] = field(default_factory=dict)
-    current_format_name: Optional[str] = None
-
-    def extract_from_pdf(self, pdf_path: str) -> List[Dict[str, Any]]:
-        """Extract camera formats from PDF"""
-        doc = fitz.open(pdf_path)
-
-        for page in doc:
-            # Get text blocks with their positions
-            blocks = page.get_text("blocks")
-            blocks.sort(key=lambda b: b[1])  # Sort by top position
-
-            # Process each block
-            for block in blocks:
-                text = block[4]  # Text content is at index 4
-
-                # First check for format headers
-                self.identify_format_header(text)
-
-                # Then extract details
-                if (
-                    self.current_format_name
-                    and self.current_format_name in self.formats_dict
-                ):
-                    self.extract_format_details(text)
-
-        self.clean_formats()
-        # Convert dictionary to list
-        return list(self.formats_dict.values())
-
-    def identify_format_header(self, text: str) -> None:
-        """Identify if text contains a format header and set current_format_name"""
-        lines = text.strip().split("\n")
-
-        for line in lines:
-            # Check for standalone format headers
-            match = re.match(self.format_header_pattern, line.strip())
-            if match:
-                format_name = match.group(1).strip()
-                if len(format_name) > 30:  # Skip if too long
-                    continue
-
-                # Create format if not exists
-                if format_name not in self.formats_dict:
-                    self.formats_dict[format_name] = {
-                        "format_name": format_name,
-                        "resolutions": [],
-                    }
-                self.current_format_name = format_name
-                return
-
-            # Special case for numbered format patterns (e.g., "3.3K 6:5")
-            # that don't match the strict pattern above
-            if re.match(r"^\d+(?:\.\d+)?K\s+\d+:\d+", line.strip()):
-                format_name = line.strip().split("\n")[0]
-                # Limit to the format name part only
-                format_name = re.match(
-                    r"(\d+(?:\.\d+)?K\s+\d+:\d+(?:\s+(?:Open\s+Gate|S16|Ana\.\s+\d+x))?)",
-                    format_name,
-                )
-                if format_name:
-                    format_name = format_name.group(1).strip()
-                    if format_name not in self.formats_dict:
-                        self.formats_dict[format_name] = {
-                            "format_name": format_name,
-                            "resolutions": [],
-                        }
-                    self.current_format_name = format_name
-                    return
-
-    def extract_format_details(self, text: str) -> None:
-        """Extract details for the current format from text"""
-        current_format = self.formats_dict[self.current_format_name]
-
-        # Extract sensor dimensions
-        dim_match = re.search(self.dimension_pattern, text)
-        if dim_match and "Dimensions" in text:
-            current_format["sensor_width"] = float(dim_match.group(1))
-            current_format["sensor_height"] = float(dim_match.group(2))
-
-        # Extract image circle
-        circle_match = re.search(self.circle_pattern, text)
-        if circle_match:
-            current_format["image_circle"] = float(circle_match.group(1))
-
-        # Extract resolutions and check for anamorphic formats
-        self.extract_resolutions(text, current_format)
-
-    def extract_resolutions(self, text: str, current_format: Dict[str, Any]) -> None:
-        """Extract resolution information including special anamorphic formats"""
-        # First look for standard resolutions
-        resolution_matches = re.finditer(self.resolution_pattern, text)
-
-        for match in resolution_matches:
-            name = match.group(1).strip()
-            width = int(match.group(2))
-            height = int(match.group(3))
-
-            # Check if this is an anamorphic format
-            is_anamorphic = False
-            if "Ana" in name or re.search(r"Ana\.", text):
-                is_anamorphic = True
-
-            resolution = {"name": name, "width": width, "height": height}
-
-            if is_anamorphic:
-                resolution["anamorphic"] = True
-
-            # Add if not already in the list
-            self.add_unique_resolution(current_format, resolution)
-
-        # Special handling for lines with "Ana." that might not be captured above
-        if "Ana." in text:
-            # Look for anamorphic resolution pattern
-            anamorphic_matches = re.finditer(
-                r"(\d+(?:\.\d+)?K\s+[\d\.]+:\d+(?:\s+Ana\.\s+\d+x))\s*\((\d+)\s*x\s*(\d+)\)",
-                text,
-            )
-
-            for match in anamorphic_matches:
-                resolution = {
+# Formats start with a header like 4.6K 3:2 Open Gate, other text can follow on the line
+FORMAT_HEADER = re.compile(
+    r"^(\d+(?:\.\d+)?K\s+\d+:\d+(?:\s+(?:Open\s+Gate|S16|Ana\.\s+\d+x))?)"
+)
+DIMENSIONS = re.compile(r"(\d+\.\d+)\s*x\s*(\d+\.\d+)\s*mm")
+RESOLUTION = re.compile(
+    r"([A-Za-z0-9\.]+(?:\s+[A-Za-z0-9\.]+)*)\s*\((\d+)\s*x\s*(\d+)\)"
+)
+ANAMORPHIC_RESOLUTION = re.compile(
+    r"(\d+(?:\.\d+)?K\s+[\d\.]+:\d+(?:\s+Ana\.\s+\d+x))\s*\((\d+)\s*x\s*(\d+)\)"
+)
+IMAGE_CIRCLE = re.compile(r"Image Circle [Ø]?\s*(\d+\.\d+)\s*mm")
+ANAMORPHIC = re.compile(r"Ana\.")
+
+# Longer "headers" are sentences that happen to start with a format
+MAX_NAME_LENGTH = 30
+
+# Pages we hand a worker at a time, sending them one by one costs more than parsing them
+PAGES_PER_TASK = 4
+
+# Bump when parsing changes, cached pages are parsed again from their text
+PARSER_VERSION = 2
+
+# What we read from a text block: the format it starts (if any) and the details in it
+Block = Dict[str, Any]
+
+# The text blocks of a page and what we read from them
+Page = Dict[str, Any]
+
+# The PDF every worker process reads its pages from, opened once per process
+_document = None
+
+
+def open_document(pdf_path: str) -> None:
+    """
+    Initializer of the worker processes, documents can't be sent between processes
+    """
+    global _document
+    _document = pymupdf.open(pdf_path)
+
+
+def is_format_name(name: str) -> bool:
+    """
+    Headers we pick up in the running text are too long or part of a sentence
+    """
+    return len(name) <= MAX_NAME_LENGTH and " was " not in name
+
+
+def find_header(text: str) -> Optional[str]:
+    for line in text.strip().split("\n"):
+        match = FORMAT_HEADER.match(line.strip())
+        if match and is_format_name(match.group(1).strip()):
+            return match.group(1).strip()
+
+    return None
+
+
+def add_unique_resolution(
+    resolutions: List[Dict[str, Any]], resolution: Dict[str, Any]
+) -> None:
+    if not any(
+        r["name"] == resolution["name"]
+        and r["width"] == resolution["width"]
+        and r["height"] == resolution["height"]
+        for r in resolutions
+    ):
+        resolutions.append(resolution)
+
+
+def find_resolutions(text: str) -> List[Dict[str, Any]]:
+    """
+    The resolutions in a block, a block that mentions Ana. is about an anamorphic format
+    """
+    anamorphic = ANAMORPHIC.search(text) is not None
+
+    resolutions = []
+    for match in RESOLUTION.finditer(text):
+        name = match.group(1).strip()
+        resolution = {
+            "name": name,
+            "width": int(match.group(2)),
+            "height": int(match.group(3)),
+        }
+        if anamorphic or "Ana" in name:
+            resolution["anamorphic"] = True
+        add_unique_resolution(resolutions, resolution)
+
+    # The general pattern can swallow the Ana. part of anamorphic names
+    if anamorphic:
+        for match in ANAMORPHIC_RESOLUTION.finditer(text):
+            add_unique_resolution(
+                resolutions,
+                {
                     "name": match.group(1).strip(),
                     "width": int(match.group(2)),
                     "height": int(match.group(3)),
                     "anamorphic": True,
-                }
-                self.add_unique_resolution(current_format, resolution)
-
-    def add_unique_resolution(
-        self, format_data: Dict[str, Any], resolution: Dict[str, Any]
-    ) -> None:
-        """Add resolution if not already present"""
-        if not any(
-            r.get("name") == resolution["name"]
-            and r.get("width") == resolution["width"]
-            and r.get("height") == resolution["height"]
-            for r in format_data["resolutions"]
-        ):
-            format_data["resolutions"].append(resolution)
-
-    def clean_formats(self):
-        """Remove formats without dimensions or resolutions"""
-        formats_to_remove = []
-        for name, format_data in self.formats_dict.items():
-            # Remove formats without dimensions
-            if "sensor_width" not in format_data:
-                formats_to_remove.append(name)
-            # Check for problematic formats
-            elif len(name) > 30 or " was " in name:
-                formats_to_remove.append(name)
-
-        for name in formats_to_remove:
-            del self.formats_dict[name]
-
-    # Add this method to the FormatExtractor class
-    def debug_anamorphic_formats(self, pdf_path):
-        """Debug method to find anamorphic format text"""
-        doc = fitz.open(pdf_path)
-
-        print("=== SEARCHING FOR ANAMORPHIC FORMATS ===")
-        for page in doc:
-            blocks = page.get_text("blocks")
-            for block in blocks:
-                text = block[4]
-                if "Ana" in text:
-                    print("\nFOUND BLOCK WITH 'Ana':")
-                    print("-" * 50)
-                    print(text)
-                    print("-" * 50)
-
-                    # Try to extract with regex
-                    ana_matches = re.finditer(
-                        r"(\d+(?:\.\d+)?K\s+[\d\.]+:\d+(?:\s+Ana\.\s+\d+x))\s*\((\d+)\s*x\s*(\d+)\)",
-                        text,
-                    )
-                    for match in ana_matches:
-                        print(
-                            f"MATCH: {match.group(1)} ({match.group(2)}x{match.group(3)})"
-                        )
+                },
+            )
 
+    return resolutions
 
-# Usage
-extractor = FormatExtractor()
-formats = extractor.extract_from_pdf(
-    "/home/mswed/Documents/coding/springboard/capstone2/backend/grumpytracker/cameras/ALEXA 35 _ ALEXA 35 Live.pdf"
-)
-pprint(formats)
-# Run the debug function
-extractor.debug_anamorphic_formats(
-    "/home/mswed/Documents/coding/springboard/capstone2/backend/grumpytracker/cameras/ALEXA 35 _ ALEXA 35 Live.pdf"
-)
+
+def parse_block(text: str) -> Optional[Block]:
+    """
+    Read a text block, without knowing which format it belongs to
+    :returns: What we found, None if there is nothing
+    """
+    block: Block = {"header": find_header(text)}
+
+    dimensions = DIMENSIONS.search(text)
+    if dimensions and "Dimensions" in text:
+        block["sensor_width"] = float(dimensions.group(1))
+        block["sensor_height"] = float(dimensions.group(2))
+
+    circle = IMAGE_CIRCLE.search(text)
+    if circle:
+        block["image_circle"] = float(circle.group(1))
+
+    resolutions = find_resolutions(text)
+    if resolutions:
+        block["resolutions"] = resolutions
+
+    if block["header"] is None and len(block) == 1:
+        return None
+
+    return block
+
+
+def page_blocks(page) -> List[str]:
+    """
+    The text of a page's blocks from top to bottom
+    """
+    blocks = page.get_text("blocks")
+    blocks.sort(key=lambda b: b[1])
+
+    return [block[4] for block in blocks]
+
+
+def parse_texts(texts: List[str]) -> Page:
+    return {
+        "parser": PARSER_VERSION,
+        "texts": texts,
+        "blocks": [block for block in map(parse_block, texts) if block is not None],
+    }
+
+
+def parse_page(page_number: int) -> Page:
+    """
+    Parse a page of the worker's document. Pages are parsed on their own, which format
+    their first blocks belong to is worked out when the pages are put back in order
+    """
+    return parse_texts(page_blocks(_document[page_number]))
+
+
+def parse_pages(
+    pdf_path: str, page_numbers: List[int], workers: Optional[int]
+) -> Iterator[Page]:
+    """
+    Parse pages of a PDF in a pool of processes
+    :returns: The pages, in the order they were asked for
+    """
+    if not page_numbers:
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=open_document, initargs=(pdf_path,)
+    ) as pool:
+        yield from pool.map(parse_page, page_numbers, chunksize=PAGES_PER_TASK)
+
+
+def pdf_hash(pdf_path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+
+def page_hash(document, page) -> str:
+    """
+    Fingerprint a page without extracting its text. A page's text comes from its content
+    stream, its resources and fonts, and the Form XObjects it draws (nested ones too), a
+    revised sheet keeps all of them on the pages it didn't change
+    """
+    hasher = hashlib.sha256(page.read_contents())
+    hasher.update(repr((tuple(page.rect), page.get_fonts(full=True))).encode())
+
+    kind, resources = document.xref_get_key(page.xref, "Resources")
+    if kind == "xref":
+        resources = document.xref_object(int(resources.split()[0]))
+    hasher.update(resources.encode())
+
+    for xref, *_ in page.get_xobjects():
+        hasher.update(document.xref_object(xref).encode())
+        hasher.update(document.xref_stream(xref) or b"")
+
+    return hasher.hexdigest()
+
+
+def page_hashes(pdf_path: str) -> List[str]:
+    with pymupdf.open(pdf_path) as document:
+        return [page_hash(document, page) for page in document]
+
+
+def read_page(pdf_path: str, page_number: int) -> Page:
+    """
+    Parse a single page in this process
+    """
+    with pymupdf.open(pdf_path) as document:
+        return parse_texts(page_blocks(document[page_number]))
+
+
+class SpecSheetCache:
+    """
+    What we read from spec sheets, kept on disk as JSON files. A PDF's hash gives the
+    hashes of its pages and a page's hash gives its text blocks and the formats details
+    we found in them, so a revised sheet only has its new and edited pages parsed
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, kind, f"{key}.json")
+
+    def get(self, kind: str, key: str) -> Any:
+        try:
+            with open(self.path(kind, key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Missing, or written by a run that was killed halfway
+            return None
+
+    def set(self, kind: str, key: str, value: Any) -> None:
+        path = self.path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write next to the entry and swap it in, two imports can share the cache
+        with tempfile.NamedTemporaryFile(
+            "w",
+            dir=os.path.dirname(path),
+            suffix=".tmp",
+            delete=False,
+            encoding="utf-8",
+        ) as f:
+            json.dump(value, f)
+        os.replace(f.name, path)
+
+    def has(self, kind: str, key: str) -> bool:
+        return os.path.exists(self.path(kind, key))
+
+    def get_pdf(self, key: str) -> Optional[List[str]]:
+        return self.get("pdfs", key)
+
+    def set_pdf(self, key: str, hashes: List[str]) -> None:
+        self.set("pdfs", key, hashes)
+
+    def get_page(self, key: str) -> Optional[Page]:
+        page = self.get("pages", key)
+        if page is not None and page.get("parser") != PARSER_VERSION:
+            # The text is still good, only what we read from it changed
+            page = parse_texts(page["texts"])
+            self.set_page(key, page)
+
+        return page
+
+    def set_page(self, key: str, page: Page) -> None:
+        self.set("pages", key, page)
+
+
+def is_complete(fmt: Dict[str, Any]) -> bool:
+    """
+    Formats without a sensor size are headers we picked up in the running text
+    """
+    return "sensor_width" in fmt
+
+
+def merge_block(fmt: Dict[str, Any], block: Block) -> None:
+    for field in ("sensor_width", "sensor_height", "image_circle"):
+        if field in block:
+            fmt[field] = block[field]
+    for resolution in block.get("resolutions", []):
+        add_unique_resolution(fmt["resolutions"], resolution)
+
+
+def split_format_name(name: str) -> Tuple[str, str, str]:
+    """
+    Split a header into the image format, aspect and the rest, 4.6K 3:2 Open Gate is
+    ("4.6K", "3:2", "Open Gate")
+    """
+    image_format, image_aspect, *rest = name.split()
+    return image_format, image_aspect, " ".join(rest)
+
+
+@dataclass
+class FormatExtractor:
+    """
+    Extract the recording formats from a manufacturer's spec sheet (ARRI, RED...).
+    Pages are parsed in a pool of processes and read one at a time, so a long PDF never
+    has to be held in memory, only the formats found in it
+    """
+
+    # Processes parsing pages, None is one per CPU
+    workers: Optional[int] = None
+    # Where pages we parsed before are kept, None parses every page
+    cache: Optional[SpecSheetCache] = None
+
+    # Pages of the last PDF that were parsed and that came from the cache
+    parsed_pages: int = field(default=0, init=False)
+    cached_pages: int = field(default=0, init=False)
+
+    def extract_from_pdf(
+        self,
+        pdf_path: str,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Extract the formats of a PDF. A format is every block from its header to the
+        next format's header, a header that comes back later in the sheet adds to the
+        format it started. The formats are yielded in the order of the sheet once every
+        page was read
+        :param pdf_path: The spec sheet
+        :param on_progress: Called with the pages done and the page count after a page
+        :returns: The formats with their sensor size and resolutions
+        """
+        if not os.path.isfile(pdf_path):
+            raise FileNotFoundError(f"{pdf_path} not found")
+        with pymupdf.open(pdf_path) as document:
+            page_count = document.page_count
+
+        formats: Dict[str, Dict[str, Any]] = {}
+        current: Optional[Dict[str, Any]] = None
+        pages = self.parse(pdf_path, page_count)
+        for done, blocks in enumerate(pages, start=1):
+            for block in blocks:
+                header = block["header"]
+                if header is not None:
+                    current = formats.setdefault(
+                        header, {"format_name": header, "resolutions": []}
+                    )
+                if current is not None:
+                    merge_block(current, block)
+
+            if on_progress is not None:
+                on_progress(done, page_count)
+
+        for fmt in formats.values():
+            if is_complete(fmt):
+                yield fmt
+
+    def parse(self, pdf_path: str, page_count: int) -> Iterator[List[Block]]:
+        """
+        The blocks of every page in order, pages the cache has are not parsed again
+        """
+        self.parsed_pages = 0
+        self.cached_pages = 0
+        if self.cache is None:
+            for page in parse_pages(pdf_path, list(range(page_count)), self.workers):
+                self.parsed_pages += 1
+                yield page["blocks"]
+            return
+
+        key = pdf_hash(pdf_path)
+        hashes = self.cache.get_pdf(key)
+        if hashes is None:
+            hashes = page_hashes(pdf_path)
+            self.cache.set_pdf(key, hashes)
+
+        # The first of the pages we don't have, identical pages are parsed once. The
+        # pages we have are only read when it's their turn
+        missing = {}
+        for number, page_hash in enumerate(hashes):
+            if page_hash not in missing and not self.cache.has("pages", page_hash):
+                missing[page_hash] = number
+        parsed = parse_pages(pdf_path, list(missing.values()), self.workers)
+
+        for number, page_hash in enumerate(hashes):
+            # A copy of a page we just parsed counts as parsed
+            fresh = page_hash in missing
+            if missing.get(page_hash) == number:
+                page = next(parsed)
+                self.cache.set_page(page_hash, page)
+            else:
+                page = self.cache.get_page(page_hash)
+                if page is None:
+                    # Deleted since we looked, or unreadable
+                    page = read_page(pdf_path, number)
+                    self.cache.set_page(page_hash, page)
+                    fresh = True
+
+            if fresh:
+                self.parsed_pages += 1
+            else:
+                self.cached_pages += 1
+            yield page["blocks"]
@@ -0,0 +1,189 @@
+import re
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+
+from cameras.models import Camera
+from formats.derivations import DERIVED_FIELDS, derive_formats
+from formats.models import Format
+from grumpytracker.cache import bump_label
+from sources.models import Source
+from .pdf_importer import split_format_name
+
+# 4.6K 3:2 Ana. 2x
+SQUEEZE = re.compile(r"Ana\.\s+(\d+(?:\.\d+)?)x")
+
+# Anamorphic resolutions that don't say their squeeze are for the common 2x lenses
+DEFAULT_SQUEEZE = 2.0
+
+# Formats written per statement
+UPSERT_BATCH_SIZE = 500
+
+# The columns that make a format unique, the pixel aspect is one of them
+KEY_FIELDS = [
+    Format._meta.get_field(name).attname for name in Format._meta.unique_together[0]
+]
+
+# What a new revision of a spec sheet can change on a format we have, the rest of the
+# unique key can't change and the notes are ours
+UPDATE_FIELDS = [
+    "sensor_width",
+    "sensor_height",
+    "image_width",
+    "image_height",
+    *[field for field in DERIVED_FIELDS if field != "pixel_aspect"],
+    "search_vector",
+    "updated_at",
+]
+
+
+def format_records(
+    camera: Camera,
+    extracted: Dict[str, Any],
+    source: Optional[Source] = None,
+    codec: str = "",
+) -> List[Format]:
+    """
+    Turn a format read from a spec sheet into records, one for every resolution
+    :param extracted: A format from FormatExtractor.extract_from_pdf
+    """
+    name = extracted["format_name"]
+    image_format, image_aspect, format_name = split_format_name(name)
+    header_squeeze = SQUEEZE.search(name)
+
+    records = []
+    if not extracted["sensor_height"]:
+        # We can't work out an aspect without it
+        return records
+
+    for resolution in extracted["resolutions"]:
+        if not resolution["width"] or not resolution["height"]:
+            continue
+
+        squeeze = SQUEEZE.search(resolution["name"]) or header_squeeze
+        is_anamorphic = bool(resolution.get("anamorphic")) or squeeze is not None
+        if squeeze is not None:
+            pixel_aspect = float(squeeze.group(1))
+        else:
+            pixel_aspect = DEFAULT_SQUEEZE if is_anamorphic else 1.0
+
+        records.append(
+            Format(
+                camera=camera,
+                source=source,
+                image_format=image_format,
+                image_aspect=image_aspect,
+                format_name=format_name,
+                sensor_width=extracted["sensor_width"],
+                sensor_height=extracted["sensor_height"],
+                image_width=resolution["width"],
+                image_height=resolution["height"],
+                is_anamorphic=is_anamorphic,
+                pixel_aspect=pixel_aspect,
+                anamorphic_squeeze=pixel_aspect,
+                codec=codec,
+            )
+        )
+
+    return records
+
+
+def unique_formats(records: List[Format]) -> List[Format]:
+    """
+    Derive the formats' fields and drop the ones that are the same format as one before
+    them, sheets often list a resolution under more than one name
+    """
+    derive_formats(records)
+
+    unique = {}
+    for record in records:
+        unique.setdefault(tuple(getattr(record, name) for name in KEY_FIELDS), record)
+
+    return list(unique.values())
+
+
+def upsert_formats(records: List[Format], update_source: bool) -> int:
+    """
+    Insert the formats, or update the ones that already exist, in a single statement
+    :returns: The number of new formats
+    """
+    existing = set(
+        Format.objects.filter(
+            camera_id__in={record.camera_id for record in records}
+        ).values_list(*KEY_FIELDS)
+    )
+    for record in records:
+        record.search_vector = record.build_search_vector()
+
+    Format.objects.bulk_create(
+        records,
+        update_conflicts=True,
+        unique_fields=list(Format._meta.unique_together[0]),
+        update_fields=UPDATE_FIELDS + (["source"] if update_source else []),
+    )
+
+    keys = {tuple(getattr(record, name) for name in KEY_FIELDS) for record in records}
+    return len(keys - existing)
+
+
+def grow_camera(camera: Camera, records: List[Format]) -> None:
+    """
+    Raise the camera's largest filmback and image to what the spec sheet has
+    """
+    limits = {
+        "max_filmback_width": max(Decimal(str(r.sensor_width)) for r in records),
+        "max_filmback_height": max(Decimal(str(r.sensor_height)) for r in records),
+        "max_image_width": max(r.image_width for r in records),
+        "max_image_height": max(r.image_height for r in records),
+    }
+
+    changed = [
+        field for field, value in limits.items() if value > getattr(camera, field)
+    ]
+    for field in changed:
+        setattr(camera, field, limits[field])
+    if changed:
+        camera.save(update_fields=changed + ["search_vector", "updated_at"])
+
+
+def import_spec_formats(
+    camera: Camera,
+    formats: Iterable[Dict[str, Any]],
+    source: Optional[Source] = None,
+    codec: str = "",
+    dry_run: bool = False,
+) -> Tuple[List[Format], int]:
+    """
+    Save the formats of a spec sheet to a camera. Formats we have are updated, matched on
+    the format's unique fields. The sheet is read before the transaction starts so it
+    doesn't hold its locks while the pages are parsed
+    :param formats: The formats from FormatExtractor.extract_from_pdf
+    :param source: Where the formats come from, formats we have keep theirs without one
+    :param codec: The codec the formats are recorded in, it's part of a format's key
+    :param dry_run: Only read the formats
+    :returns: The formats and how many of them are new
+    """
+    records = unique_formats(
+        [
+            record
+            for extracted in formats
+            for record in format_records(camera, extracted, source, codec)
+        ]
+    )
+    if dry_run or not records:
+        return records, 0
+
+    created = 0
+    with transaction.atomic():
+        for start in range(0, len(records), UPSERT_BATCH_SIZE):
+            created += upsert_formats(
+                records[start : start + UPSERT_BATCH_SIZE],
+                update_source=source is not None,
+            )
+        grow_camera(camera, records)
+
+        # bulk_create does not send post_save, let the response cache know
+        bump_label(Format._meta.label)
+
+    return records, created
@@ -0,0 +1,66 @@
+import os
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+from cameras.models import Camera
+from cameras.services.bulk_import import import_cameras, open_images
+from cameras.services.pdf_importer import FormatExtractor, SpecSheetCache
+from cameras.services.spec_import import import_spec_formats
+from jobs.registry import task
+from sources.models import Source
+
+
+@task("cameras.import_spec_pdf")
+def import_spec_pdf(
+    job,
+    pdf: str,
+    camera_id: int,
+    source_id: Optional[int] = None,
+    codec: str = "",
+    use_cache: bool = True,
+):
+    """
+    Read the formats of a spec sheet and add them to a camera, reporting the pages parsed
+    """
+    camera = Camera.objects.select_related("make").get(pk=camera_id)
+    source = Source.objects.get(pk=source_id) if source_id is not None else None
+
+    cache = SpecSheetCache(settings.SPEC_SHEET_CACHE_DIR) if use_cache else None
+    extractor = FormatExtractor(cache=cache)
+    formats = extractor.extract_from_pdf(
+        pdf, on_progress=lambda done, total: job.set_progress(done=done, total=total)
+    )
+    records, created = import_spec_formats(camera, formats, source=source, codec=codec)
+
+    return {
+        "created": created,
+        "updated": len(records) - created,
+        "parsed_pages": extractor.parsed_pages,
+        "cached_pages": extractor.cached_pages,
+    }
+
+
+@task("cameras.import")
+def import_cameras_job(job, rows: List[Dict[str, Any]], images: Optional[str] = None):
+    """
+    Create the cameras of a bulk import. The rows were checked when the import was
+    queued, a camera created since then is reported as a row error like it would be
+    inline. The uploaded images are deleted once we are done with them
+    """
+    archive = open_images(images) if images else None
+    finished = False
+    try:
+        cameras, errors = import_cameras(rows, images=archive)
+        finished = True
+    finally:
+        if archive is not None:
+            archive.close()
+        # A failed attempt leaves the upload for the next one
+        if images and (finished or job.attempts >= job.max_attempts):
+            os.remove(images)
+
+    if errors:
+        return {"created": 0, "errors": errors}
+
+    return {"created": len(cameras), "cameras": [camera.id for camera in cameras]}
@@ -0,0 +1,571 @@
+import json
+import os
+import shutil
+import pymupdf
+import pytest
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from blobs.models import Blob
+from cameras.models import Camera
+from cameras.seed import seed_db
+from cameras.services import pdf_importer
+from cameras.services.pdf_importer import FormatExtractor, SpecSheetCache
+from cameras.services.spec_import import import_spec_formats
+from formats.models import Format
+from jobs.models import Job
+from jobs.worker import Worker
+from makes.models import Make
+from sources.models import Source
+from versions.models import TableVersion
+
+
+def catalogue():
+    """
+    Everything we seeded, without the ids and timestamps that change between runs
+    """
+    skip = {"id", "camera", "source"}
+    return {
+        "makes": sorted(Make.objects.values_list("name", "website")),
+        "cameras": sorted(Camera.objects.values_list("make__name", "model")),
+        "sources": sorted(Source.objects.values_list("name", "url")),
+        "formats": sorted(
+            (
+                tuple(
+                    value for key, value in fmt.as_dict().items() if key not in skip
+                )
+                for fmt in Format.objects.for_serialization()
+            ),
+            key=repr,
+        ),
+    }
+
+
+@pytest.mark.django_db
+class TestSeed:
+    """
+    Tests for seeding the catalogue
+    """
+
+    def test_bulk_seed_matches_default(self):
+        """
+        The bulk seed should create the same catalogue as saving records one at a time,
+        including the 3DE fields save() works out
+        """
+        seed_db(images=False)
+        expected = catalogue()
+
+        for model in [Format, Source, Camera, Make]:
+            model.objects.all().delete()
+
+        seed_db(bulk=True, images=False)
+
+        assert catalogue() == expected
+        desqueezed = Format.objects.filter(is_desqueezed=True).first()
+        if desqueezed:
+            assert desqueezed.distortion_model_3de == "Anamorphic Rescaled Degree 4"
+        assert not Format.objects.filter(search_vector__isnull=True).exists()
+        assert not Camera.objects.filter(search_vector__isnull=True).exists()
+
+    def test_bulk_seed_idempotent(self):
+        """
+        Seeding again updates the records we have instead of adding new ones
+        """
+        seed_db(bulk=True, images=False)
+        counts = [model.objects.count() for model in [Make, Camera, Source, Format]]
+        Camera.objects.filter(model="Alexa 35").update(sensor_type="Changed")
+
+        seed_db(bulk=True, images=False)
+
+        assert [
+            model.objects.count() for model in [Make, Camera, Source, Format]
+        ] == counts
+        assert Camera.objects.get(model="Alexa 35").sensor_type != "Changed"
+
+    def test_bulk_seed_query_count(self):
+        """
+        The bulk seed writes every table in a few statements
+        """
+        with CaptureQueriesContext(connection) as captured:
+            seed_db(bulk=True, images=False)
+
+        writes = [
+            query
+            for query in captured.captured_queries
+            if query["sql"].startswith(("INSERT", "UPDATE"))
+            and "versions_tableversion" not in query["sql"]
+        ]
+        assert len(writes) <= 5
+        assert Format.objects.count() > 100
+
+    def test_bulk_seed_bumps_versions(self):
+        """
+        Bulk writes don't send post_save, the seed should still invalidate the cached
+        responses of every table it wrote
+        """
+        labels = ["makes.Make", "cameras.Camera", "sources.Source", "formats.Format"]
+        before = TableVersion.objects.current(labels)
+
+        seed_db(bulk=True, images=False)
+
+        after = TableVersion.objects.current(labels)
+        for label in labels:
+            assert after[label].version > before[label].version
+
+
+@pytest.mark.django_db
+class TestBenchmarkSeedCommand:
+    """
+    Tests for the benchmark_seed management command
+    """
+
+    def test_benchmark_seed(self):
+        """
+        The benchmark should time both paths and leave the database the way it found it
+        """
+        out = StringIO()
+        call_command("benchmark_seed", runs=1, stdout=out)
+
+        output = out.getvalue()
+        assert "get_or_create, empty database: median" in output
+        assert "bulk upsert, reseed: median" in output
+        assert Format.objects.count() == 0
+
+
+@pytest.mark.django_db
+class TestImportCamerasCommand:
+    """
+    Tests for the import_cameras management command
+    """
+
+    def test_import_cameras(self, single_make, sample_image_file, tmp_path):
+        """
+        Cameras should be created from a manifest with their images from a directory
+        """
+        manifest = tmp_path / "cameras.ndjson"
+        manifest.write_text(
+            "\n".join(
+                json.dumps(
+                    {
+                        "make": single_make.name,
+                        "model": model,
+                        "sensor_type": "CMOS",
+                        "max_filmback_width": 27.99,
+                        "max_filmback_height": 19.22,
+                        "max_image_width": 4608,
+                        "max_image_height": 3164,
+                        "min_frame_rate": 0.75,
+                        "max_frame_rate": 120,
+                        "image": os.path.basename(sample_image_file),
+                    }
+                )
+                for model in ["Alexa 35", "Alexa Mini LF"]
+            )
+        )
+
+        out = StringIO()
+        call_command(
+            "import_cameras",
+            str(manifest),
+            images=os.path.dirname(sample_image_file),
+            workers=2,
+            stdout=out,
+        )
+
+        assert "Created 2 cameras" in out.getvalue()
+        cameras = Camera.objects.order_by("model")
+        assert [camera.model for camera in cameras] == ["Alexa 35", "Alexa Mini LF"]
+        # The image is stored once and shared
+        assert len({camera.image.name for camera in cameras}) == 1
+        assert Blob.objects.get(name=cameras[0].image.name).refcount == 2
+        assert all(camera.image.storage.exists(camera.image.name) for camera in cameras)
+
+    def test_import_cameras_errors(self, single_make, tmp_path):
+        """
+        Bad rows should be reported and nothing saved, images can't come from outside
+        the images directory
+        """
+        manifest = tmp_path / "cameras.csv"
+        manifest.write_text(
+            "make,model,sensor_type,max_filmback_width,max_filmback_height,max_image_width,max_image_height,min_frame_rate,max_frame_rate,image\n"
+            f"{single_make.id},Alexa 35,CMOS,27.99,19.22,4608,3164,0.75,120,../cameras.csv\n"
+        )
+        images = tmp_path / "images"
+        images.mkdir()
+
+        err = StringIO()
+        with pytest.raises(CommandError):
+            call_command(
+                "import_cameras", str(manifest), images=str(images), stderr=err
+            )
+
+        assert "Row 1: Image ../cameras.csv not found" in err.getvalue()
+        assert not Camera.objects.exists()
+
+
+@pytest.mark.django_db
+class TestBenchmarkMediaCommand:
+    """
+    Tests for the benchmark_media management command
+    """
+
+    def test_benchmark_media(self):
+        """
+        Every route should be timed
+        """
+        out = StringIO()
+        call_command("benchmark_media", files=2, size=1, requests=10, stdout=out)
+
+        output = out.getvalue()
+        assert "static.serve:" in output
+        assert "serve_media:" in output
+        assert "serve_media revalidation (304):" in output
+        assert "serve_media X-Accel-Redirect:" in output
+
+
+@pytest.mark.django_db
+class TestRegenerateImageVariantsCommand:
+    """
+    Tests for the regenerate_image_variants management command
+    """
+
+    def test_regenerate(self, settings, temp_media_dir, sample_image_file):
+        """
+        Every image should get its variants, a second run only makes what's missing
+        """
+        settings.MEDIA_ROOT = temp_media_dir
+        settings.IMAGE_VARIANT_WIDTHS = [32, 64]
+        settings.IMAGE_VARIANT_FORMATS = ["webp"]
+        for directory in ["camera_images", "make_logos"]:
+            os.makedirs(os.path.join(temp_media_dir, directory))
+            shutil.copy(sample_image_file, os.path.join(temp_media_dir, directory))
+
+        out = StringIO()
+        call_command("regenerate_image_variants", workers=2, stdout=out)
+
+        assert "Found 2 images" in out.getvalue()
+        assert "Made 4 variants, 0 images failed" in out.getvalue()
+        assert os.path.exists(
+            os.path.join(
+                temp_media_dir, "variants/make_logos/image_on_disk.png.64w.webp"
+            )
+        )
+
+        out = StringIO()
+        call_command("regenerate_image_variants", stdout=out)
+        assert "Made 0 variants" in out.getvalue()
+
+
+# A three page spec sheet, the first format's image circle is on the second page
+SPEC_PAGES = [
+    [
+        "4.6K 3:2 Open Gate",
+        "Sensor Dimensions 27.99 x 19.22 mm",
+        "ARRIRAW (4608 x 3164)",
+    ],
+    [
+        "Image Circle Ø 33.96 mm",
+        "4K 16:9",
+        "Dimensions 24.88 x 14.00 mm",
+        "4K UHD (3840 x 2160)",
+    ],
+    [
+        "3.3K 6:5 Ana. 2x",
+        "Dimensions 20.22 x 16.85 mm",
+        "3.3K 6:5 Ana. 2x (3328 x 2790)",
+    ],
+]
+
+
+def write_spec_pdf(path, pages, forms: bool = False) -> str:
+    """
+    Write a PDF with a text block for every line of every page
+    :param forms: Draw the text of every page from a Form XObject
+    """
+    document = pymupdf.open()
+    for lines in pages:
+        page = document.new_page()
+        for i, line in enumerate(lines):
+            page.insert_text((72, 72 + i * 60), line)
+
+    if forms:
+        source, document = document, pymupdf.open()
+        for number in range(source.page_count):
+            page = document.new_page()
+            page.show_pdf_page(page.rect, source, number)
+    document.save(path)
+
+    return str(path)
+
+
+@pytest.fixture
+def spec_pdf(tmp_path):
+    return write_spec_pdf(tmp_path / "spec.pdf", SPEC_PAGES)
+
+
+class TestFormatExtractor:
+    """
+    Tests for reading the formats of a spec sheet
+    """
+
+    def test_extract_from_pdf(self, spec_pdf):
+        """
+        Formats should come out in order with the details of the pages they span
+        """
+        progress = []
+        formats = FormatExtractor(workers=2).extract_from_pdf(
+            spec_pdf, on_progress=lambda done, total: progress.append((done, total))
+        )
+
+        formats = list(formats)
+
+        assert [fmt["format_name"] for fmt in formats] == [
+            "4.6K 3:2 Open Gate",
+            "4K 16:9",
+            "3.3K 6:5 Ana. 2x",
+        ]
+        assert formats[0]["sensor_width"] == 27.99
+        assert formats[0]["image_circle"] == 33.96
+        assert formats[0]["resolutions"] == [
+            {"name": "ARRIRAW", "width": 4608, "height": 3164}
+        ]
+        assert all(r["anamorphic"] for r in formats[2]["resolutions"])
+        assert progress == [(1, 3), (2, 3), (3, 3)]
+
+    def test_repeated_header(self, tmp_path):
+        """
+        A header that comes back later in the sheet should add to the format it
+        started instead of making a second one
+        """
+        pages = SPEC_PAGES + [
+            ["4.6K 3:2 Open Gate", "ProRes 4444 XQ (4480 x 3096)"],
+        ]
+        pdf = write_spec_pdf(tmp_path / "spec.pdf", pages)
+
+        formats = list(FormatExtractor(workers=2).extract_from_pdf(pdf))
+
+        assert [fmt["format_name"] for fmt in formats] == [
+            "4.6K 3:2 Open Gate",
+            "4K 16:9",
+            "3.3K 6:5 Ana. 2x",
+        ]
+        assert formats[0]["sensor_width"] == 27.99
+        assert [r["width"] for r in formats[0]["resolutions"]] == [4608, 4480]
+
+    def test_cache(self, spec_pdf, tmp_path):
+        """
+        Pages we parsed before should come from the cache, a revised sheet only has its
+        new and edited pages parsed
+        """
+        cache = SpecSheetCache(str(tmp_path / "cache"))
+        first = FormatExtractor(workers=2, cache=cache)
+        formats = list(first.extract_from_pdf(spec_pdf))
+        assert (first.parsed_pages, first.cached_pages) == (3, 0)
+
+        again = FormatExtractor(workers=2, cache=cache)
+        assert list(again.extract_from_pdf(spec_pdf)) == formats
+        assert (again.parsed_pages, again.cached_pages) == (0, 3)
+
+        revised_pages = [SPEC_PAGES[0], SPEC_PAGES[1], list(SPEC_PAGES[2])]
+        revised_pages[2][1] = "Dimensions 20.22 x 16.90 mm"
+        revised = write_spec_pdf(tmp_path / "revised.pdf", revised_pages)
+        extractor = FormatExtractor(workers=2, cache=cache)
+        formats = list(extractor.extract_from_pdf(revised))
+        assert (extractor.parsed_pages, extractor.cached_pages) == (1, 2)
+        assert formats[2]["sensor_height"] == 16.90
+
+    def test_cache_form_xobjects(self, tmp_path):
+        """
+        Text drawn by a Form XObject is not in the page's content stream, editing it
+        should still have the page parsed again
+        """
+        cache = SpecSheetCache(str(tmp_path / "cache"))
+        spec = write_spec_pdf(tmp_path / "spec.pdf", SPEC_PAGES, forms=True)
+        list(FormatExtractor(cache=cache).extract_from_pdf(spec))
+
+        revised_pages = [SPEC_PAGES[0], SPEC_PAGES[1], list(SPEC_PAGES[2])]
+        revised_pages[2][1] = "Dimensions 20.22 x 16.90 mm"
+        revised = write_spec_pdf(tmp_path / "revised.pdf", revised_pages, forms=True)
+        extractor = FormatExtractor(cache=cache)
+        formats = list(extractor.extract_from_pdf(revised))
+
+        assert (extractor.parsed_pages, extractor.cached_pages) == (1, 2)
+        assert formats[2]["sensor_height"] == 16.90
+
+    def test_cache_broken_page(self, spec_pdf, tmp_path):
+        """
+        A cached page we can't read should be parsed again
+        """
+        cache = SpecSheetCache(str(tmp_path / "cache"))
+        formats = list(FormatExtractor(cache=cache).extract_from_pdf(spec_pdf))
+        pages = tmp_path / "cache" / "pages"
+        with open(pages / sorted(os.listdir(pages))[0], "w") as f:
+            f.write("{")
+
+        extractor = FormatExtractor(cache=cache)
+
+        assert list(extractor.extract_from_pdf(spec_pdf)) == formats
+        assert (extractor.parsed_pages, extractor.cached_pages) == (1, 2)
+
+    def test_cache_new_parser(self, spec_pdf, tmp_path, monkeypatch):
+        """
+        A new parser should read the cached text again instead of the PDF
+        """
+        cache = SpecSheetCache(str(tmp_path / "cache"))
+        formats = list(FormatExtractor(cache=cache).extract_from_pdf(spec_pdf))
+
+        monkeypatch.setattr(pdf_importer, "PARSER_VERSION", 2)
+        extractor = FormatExtractor(cache=cache)
+
+        assert list(extractor.extract_from_pdf(spec_pdf)) == formats
+        assert extractor.cached_pages == 3
+        pages = os.listdir(tmp_path / "cache" / "pages")
+        with open(tmp_path / "cache" / "pages" / pages[0]) as f:
+            assert json.load(f)["parser"] == 2
+
+    def test_missing_pdf(self):
+        """
+        A PDF that isn't there should fail once we start reading
+        """
+        with pytest.raises(FileNotFoundError):
+            next(FormatExtractor().extract_from_pdf("no/such/sheet.pdf"))
+
+
+@pytest.mark.django_db
+class TestImportSpecPdfCommand:
+    """
+    Tests for the import_spec_pdf management command
+    """
+
+    def test_import_spec_pdf(
+        self, settings, tmp_path, spec_pdf, single_camera, single_source
+    ):
+        """
+        The formats should be added to the camera and updated on the next import
+        """
+        settings.SPEC_SHEET_CACHE_DIR = str(tmp_path / "cache")
+        out = StringIO()
+        call_command(
+            "import_spec_pdf",
+            spec_pdf,
+            camera=single_camera.id,
+            source=single_source.id,
+            codec="ARRIRAW",
+            workers=2,
+            stdout=out,
+        )
+
+        assert "Parsed page 3 of 3" in out.getvalue()
+        assert "Parsed 3 pages, 0 came from the cache" in out.getvalue()
+        assert "Created 3 and updated 0 formats" in out.getvalue()
+        anamorphic = Format.objects.get(camera=single_camera, is_anamorphic=True)
+        assert anamorphic.pixel_aspect == 2.0
+        assert anamorphic.image_format == "3.3K"
+        assert anamorphic.format_name == "Ana. 2x"
+        assert anamorphic.filmback_width_3de == pytest.approx(40.44)
+        assert anamorphic.source == single_source
+        open_gate = Format.objects.get(camera=single_camera, image_format="4.6K")
+        assert open_gate.format_name == "Open Gate"
+
+        # The camera grows to the largest filmback on the sheet
+        single_camera.refresh_from_db()
+        assert float(single_camera.max_filmback_width) == 27.99
+        assert float(single_camera.max_filmback_height) == 19.22
+        assert single_camera.max_image_width == 6144
+
+        out = StringIO()
+        call_command(
+            "import_spec_pdf",
+            spec_pdf,
+            camera=single_camera.id,
+            codec="ARRIRAW",
+            stdout=out,
+        )
+        assert "Parsed 0 pages, 3 came from the cache" in out.getvalue()
+        assert "Created 0 and updated 3 formats" in out.getvalue()
+        assert Format.objects.filter(camera=single_camera).count() == 3
+
+    def test_import_spec_pdf_dry_run(self, spec_pdf, single_camera):
+        """
+        A dry run should list the formats without saving them
+        """
+        out = StringIO()
+        call_command(
+            "import_spec_pdf",
+            spec_pdf,
+            camera=single_camera.id,
+            dry_run=True,
+            no_cache=True,
+            stdout=out,
+        )
+
+        assert "Parsed 3 pages, 0 came from the cache" in out.getvalue()
+        assert "Found 3 formats" in out.getvalue()
+        assert not Format.objects.filter(camera=single_camera).exists()
+
+    def test_import_spec_pdf_errors(self, spec_pdf, single_camera):
+        """
+        Unknown cameras and PDFs that aren't there should stop the command
+        """
+        with pytest.raises(CommandError, match="Camera 999 not found"):
+            call_command("import_spec_pdf", spec_pdf, camera=999)
+
+        with pytest.raises(CommandError, match="not found"):
+            call_command(
+                "import_spec_pdf", "no/such/sheet.pdf", camera=single_camera.id
+            )
+
+    def test_import_spec_pdf_background(
+        self, settings, tmp_path, spec_pdf, single_camera
+    ):
+        """
+        With background the sheet should be left to a job, which reports the pages it
+        parsed
+        """
+        settings.SPEC_SHEET_CACHE_DIR = str(tmp_path / "cache")
+        out = StringIO()
+        call_command(
+            "import_spec_pdf",
+            os.path.relpath(spec_pdf),
+            camera=single_camera.id,
+            codec="ARRIRAW",
+            background=True,
+            stdout=out,
+        )
+
+        job = Job.objects.get(name="cameras.import_spec_pdf")
+        assert f"Queued job {job.id}" in out.getvalue()
+        assert job.payload["pdf"] == spec_pdf
+        assert not Format.objects.filter(camera=single_camera).exists()
+
+        Worker().run_once()
+
+        job.refresh_from_db()
+        assert job.status == Job.DONE
+        assert job.progress == {"done": 3, "total": 3}
+        assert job.result["created"] == 3
+        assert Format.objects.filter(camera=single_camera).count() == 3
+
+    def test_import_spec_pdf_parses_outside_transaction(self, single_camera):
+        """
+        The sheet should be read before the transaction starts, parsing a long PDF
+        should not hold its locks
+        """
+        depth = len(connection.atomic_blocks)
+        depths = []
+
+        def formats():
+            depths.append(len(connection.atomic_blocks))
+            yield {
+                "format_name": "4.6K 3:2 Open Gate",
+                "sensor_width": 27.99,
+                "sensor_height": 19.22,
+                "resolutions": [{"name": "ARRIRAW", "width": 4608, "height": 3164}],
+            }
+
+        records, created = import_spec_formats(single_camera, formats())
+
+        assert depths == [depth]
+        assert created == 1
+        assert Format.objects.filter(camera=single_camera).count() == 1
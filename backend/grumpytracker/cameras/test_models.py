@@ -1,4 +1,6 @@
 import pytest
+from blobs.models import Blob
+from django.contrib.postgres.search import SearchQuery
 from django.core.files.uploadedfile import SimpleUploadedFile
 from cameras.models import Camera
 
@@ -89,7 +91,8 @@ class TestCameraModel:
         assert camera.model == "Alexa 35"
         assert camera.image is not None
         assert camera.image.name is not None
-        assert "image_on_disk" in camera.image.name
+        with open(sample_image_file, "rb") as f:
+            assert camera.image.read() == f.read()
 
         # Finally check that we actually created a file
         assert camera.image.file is not None
@@ -136,7 +139,8 @@ class TestCameraModel:
         assert camera.model == "Alexa 35"
         assert camera.image is not None
         assert camera.image.name is not None
-        assert "test_uploaded_image" in camera.image.name
+        sample_uploaded_file.seek(0)
+        assert camera.image.read() == sample_uploaded_file.read()
 
     def test_update_image(self, single_make, sample_uploaded_file, temp_media_dir):
         """
@@ -167,7 +171,8 @@ class TestCameraModel:
         # Confirm that the logo has been updated
         assert camera.image is not None
         assert camera.image.name is not None
-        assert "test_uploaded_image" in camera.image.name
+        sample_uploaded_file.seek(0)
+        assert camera.image.read() == sample_uploaded_file.read()
 
     def test_update_and_replace_image(
         self, single_make, sample_uploaded_file, temp_media_dir
@@ -202,7 +207,12 @@ class TestCameraModel:
 
         # Confirm that the logo has been updated
         assert camera.image.name != initial_logo_name
-        assert "test_uploaded_image" in camera.image.name
+        sample_uploaded_file.seek(0)
+        assert camera.image.read() == sample_uploaded_file.read()
+
+        # The old file lost its only reference, gc_media can remove it
+        assert Blob.objects.get(name=initial_logo_name).refcount == 0
+        assert Blob.objects.get(name=camera.image.name).refcount == 1
 
     def test_make_str(self, single_make):
         """
@@ -221,6 +231,26 @@ class TestCameraModel:
         )
         assert str(camera) == "Sample Make Alexa 35"
 
+    def test_search_vector(self, single_camera):
+        """
+        The search document is built on save and follows changes to the camera and its make
+        """
+        # The sensor type also says KOMODO, search for a camera without it
+        single_camera.sensor_type = "19.9 MP Super 35mm Global Shutter CMOS"
+        single_camera.save()
+        komodo = SearchQuery("komodo", config="simple")
+        assert Camera.objects.filter(search_vector=komodo).exists()
+
+        single_camera.model = "V-RAPTOR"
+        single_camera.save()
+        assert not Camera.objects.filter(search_vector=komodo).exists()
+
+        # Renaming the make should rebuild the camera's document
+        single_camera.make.name = "Grumpy"
+        single_camera.make.save()
+        grumpy = SearchQuery("grumpy", config="simple")
+        assert list(Camera.objects.filter(search_vector=grumpy)) == [single_camera]
+
     def test_audit_fields(self, single_make):
         """
         We auto update audit fields on creation
@@ -281,6 +311,7 @@ class TestCameraModel:
             "notes",
             "discontinued",
             "image",
+            "image_variants",
         }
 
         assert set(result.keys()) == expected_keys
@@ -334,6 +365,7 @@ class TestCameraModel:
             "notes",
             "discontinued",
             "image",
+            "image_variants",
             "formats",
         }
         assert set(result.keys()) == expected_keys
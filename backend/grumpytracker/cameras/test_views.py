@@ -1,10 +1,17 @@
 from pprint import pprint
+import io
+import json
+import os
+import zipfile
 import pytest
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from makes.models import Make
 from cameras.models import Camera
+from grumpytracker.cache import get_cache
+from jobs.worker import Worker
 from django.test.client import encode_multipart, BOUNDARY
+from django.core.files.uploadedfile import SimpleUploadedFile
 
 User = get_user_model()
 
@@ -62,9 +69,37 @@ class TestCamerasListView:
                 "notes",
                 "discontinued",
                 "image",
+                "image_variants",
             }
             assert set(camera_data.keys()) == expected_keys
 
+    @pytest.mark.django_db
+    def test_get_all_cameras_streamed(self, client, multiple_cameras):
+        """
+        Passing stream=true should stream the full list as a JSON array
+        """
+
+        res = client.get(reverse("cameras"), {"stream": "true"})
+
+        assert res.status_code == 200
+        assert res.streaming
+        assert res["Content-Type"] == "application/json"
+
+        data = json.loads(b"".join(res.streaming_content))
+        assert [cam["id"] for cam in data] == [cam.id for cam in multiple_cameras]
+        assert data[0]["make_name"] == "Arri"
+
+    @pytest.mark.django_db
+    def test_get_all_cameras_streamed_empty(self, client):
+        """
+        Streaming an empty table should still give us valid JSON
+        """
+
+        res = client.get(reverse("cameras"), {"stream": "true"})
+
+        assert res.status_code == 200
+        assert json.loads(b"".join(res.streaming_content)) == []
+
     @pytest.mark.django_db
     def test_create_camera_no_image(self, admin_client, single_make):
         """
@@ -128,7 +163,8 @@ class TestCamerasListView:
         # Check the database to make sure the record was created
         camera = Camera.objects.get(model="Alexa Mini With Image")
         assert camera.image is not None
-        assert "test_uploaded_image" in camera.image.name
+        sample_uploaded_file.seek(0)
+        assert camera.image.read() == sample_uploaded_file.read()
 
     @pytest.mark.django_db
     def test_create_camera_with_missing_fields(self, admin_client):
@@ -233,12 +269,73 @@ class TestCameraDetailsView:
             "notes",
             "discontinued",
             "image",
+            "image_variants",
             "formats",
         }
         assert set(data.keys()) == expected_keys
         assert data["model"] == "KOMODO"
         assert data["formats"] == []
 
+    @pytest.mark.django_db
+    def test_get_camera_details_query_count(
+        self, client, multiple_formats, django_assert_num_queries
+    ):
+        """
+        Camera details should take two queries (camera and formats) no matter how many formats it has,
+        plus one for the model versions
+        """
+        camera = multiple_formats[0].camera
+
+        with django_assert_num_queries(3):
+            res = client.get(reverse("camera", args=[camera.id]))
+
+        assert res.status_code == 200
+        data = res.json()
+        assert len(data["formats"]) == 2
+        assert data["formats"][0]["make_name"] == "Arri"
+
+    @pytest.mark.django_db
+    def test_get_camera_details_not_modified(
+        self, single_camera, client, django_assert_num_queries
+    ):
+        """
+        Sending back the ETag should get us a 304 with a single query for the model versions
+        until the camera changes
+        """
+        url = reverse("camera", args=[single_camera.id])
+        res = client.get(url)
+        assert res.status_code == 200
+        etag = res.headers["ETag"]
+        assert not etag.startswith("W/")
+        assert "Last-Modified" in res.headers
+
+        with django_assert_num_queries(1):
+            res = client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == 304
+        assert res.content == b""
+
+        single_camera.model = "KOMODO-X"
+        single_camera.save()
+
+        res = client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == 200
+        assert res.headers["ETag"] != etag
+        assert res.json()["model"] == "KOMODO-X"
+
+    @pytest.mark.django_db
+    def test_get_camera_details_etag_shared(self, single_camera, client):
+        """
+        Versions are kept in the database, a worker that has nothing in its cache should
+        give the same ETag
+        """
+        url = reverse("camera", args=[single_camera.id])
+        etag = client.get(url).headers["ETag"]
+
+        get_cache().clear()
+
+        res = client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == 304
+
     @pytest.mark.django_db
     def test_get_camera_details_not_found(self, client):
         """
@@ -302,7 +399,8 @@ class TestCameraDetailsView:
         single_camera.refresh_from_db()
         assert single_camera.model == "Updated Model"
         assert single_camera.image is not None
-        assert "test_uploaded_image" in single_camera.image.name
+        sample_uploaded_file.seek(0)
+        assert single_camera.image.read() == sample_uploaded_file.read()
 
     @pytest.mark.django_db
     def test_patch_camera_details_not_authenticated(self, client, single_camera):
@@ -428,6 +526,7 @@ class TestCamerasSearchView:
             "notes",
             "discontinued",
             "image",
+            "image_variants",
         }
         assert set(data[0].keys()) == expected_keys
 
@@ -463,6 +562,33 @@ class TestCamerasSearchView:
         assert len(data) == 2
         assert data[0]["model"] == "KOMODO"
 
+    @pytest.mark.django_db
+    def test_search_cameras_fuzzy(self, client, multiple_cameras):
+        """
+        Small typos in a model name should still find the camera
+        """
+        res = client.get(reverse("search_cameras", query={"q": "Alxa Mini LF"}))
+
+        assert res.status_code == 200
+
+        data = res.json()
+        assert len(data) == 1
+        assert data[0]["model"] == "Alexa Mini LF"
+
+    @pytest.mark.django_db
+    def test_search_cameras_ranked(self, client, multiple_cameras):
+        """
+        Model matches should rank above cameras that only match on their sensor type
+        """
+        res = client.get(reverse("search_cameras", query={"q": "35"}))
+
+        assert res.status_code == 200
+
+        # Alexa 35 has 35 in its model, the KOMODOs only have it in their sensor type
+        data = res.json()
+        assert len(data) == 3
+        assert data[0]["model"] == "Alexa 35"
+
     @pytest.mark.django_db
     def test_search_cameras_no_results(self, client, multiple_cameras):
         """
@@ -505,3 +631,205 @@ class TestCamerasSearchView:
         data = res.json()
         assert "error" in data
         assert data["error"] == "No query provided"
+
+
+def bulk_camera_rows(make):
+    return [
+        {
+            "make": make.id,
+            "model": model,
+            "sensor_type": "CMOS",
+            "max_filmback_width": 27.99,
+            "max_filmback_height": 19.22,
+            "max_image_width": 4608,
+            "max_image_height": 3164,
+            "min_frame_rate": 0.75,
+            "max_frame_rate": 120,
+        }
+        for model in ["Alexa 35", "Alexa Mini LF", "Alexa 65"]
+    ]
+
+
+@pytest.mark.django_db
+class TestCamerasBulkView:
+
+    def test_bulk_create_json(
+        self, admin_client, single_make, django_assert_max_num_queries
+    ):
+        """
+        A JSON manifest without images should be created in a handful of queries
+        """
+        rows = bulk_camera_rows(single_make)
+
+        with django_assert_max_num_queries(10):
+            res = admin_client.post(
+                reverse("bulk_cameras"), rows, content_type="application/json"
+            )
+
+        assert res.status_code == 200
+        res_data = res.json()
+        assert res_data["success"] == "Created 3 cameras"
+        assert [camera["model"] for camera in res_data["cameras"]] == [
+            "Alexa 35",
+            "Alexa Mini LF",
+            "Alexa 65",
+        ]
+        assert Camera.objects.filter(search_vector="alexa").count() == 3
+
+    def test_bulk_create_with_images(
+        self, admin_client, single_make, sample_uploaded_file
+    ):
+        """
+        A CSV manifest and a zip of images should create the cameras with their images,
+        makes can be given by name
+        """
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("images/alexa_35.png", sample_uploaded_file.read())
+        archive.seek(0)
+
+        lines = [
+            "make,model,sensor_type,max_filmback_width,max_filmback_height,max_image_width,max_image_height,min_frame_rate,max_frame_rate,discontinued,image",
+            f"{single_make.name},Alexa 35,CMOS,27.99,19.22,4608,3164,0.75,120,FALSE,images/alexa_35.png",
+            f"{single_make.id},Alexa Classic,CMOS,23.76,13.37,2880,1620,0.75,60,TRUE,",
+        ]
+        manifest = SimpleUploadedFile("cameras.csv", "\n".join(lines).encode())
+        images = SimpleUploadedFile("images.zip", archive.getvalue())
+
+        res = admin_client.post(
+            reverse("bulk_cameras"), {"manifest": manifest, "images": images}
+        )
+
+        assert res.status_code == 200
+        alexa_35 = Camera.objects.get(model="Alexa 35")
+        assert alexa_35.image.name.startswith("camera_images/")
+        sample_uploaded_file.seek(0)
+        assert alexa_35.image.read() == sample_uploaded_file.read()
+        assert alexa_35.discontinued is False
+        classic = Camera.objects.get(model="Alexa Classic")
+        assert not classic.image
+        assert classic.discontinued is True
+
+    def test_bulk_create_errors(self, admin_client, single_camera):
+        """
+        Every bad row should be reported and nothing should be saved
+        """
+        make = single_camera.make
+        rows = bulk_camera_rows(make)
+        rows[0]["make"] = "Unknown Make"
+        rows[1]["max_image_width"] = -1
+        rows[2]["image"] = "alexa_65.png"
+        rows.append({**rows[1], "max_image_width": 10, "model": single_camera.model})
+        rows.append({**rows[1], "max_image_width": 10, "model": "Alexa XT"})
+        rows.append({**rows[1], "max_image_width": 10, "model": "Alexa XT"})
+
+        res = admin_client.post(
+            reverse("bulk_cameras"), rows, content_type="application/json"
+        )
+
+        assert res.status_code == 400
+        errors = {error["row"]: error["error"] for error in res.json()["errors"]}
+        assert errors[1] == "Make Unknown Make not found"
+        assert errors[2].startswith("max_image_width:")
+        assert errors[3] == "Image alexa_65.png not found"
+        assert errors[4].endswith("already exists")
+        assert 5 not in errors
+        assert errors[6] == "Same camera as row 5"
+        assert Camera.objects.count() == 1
+
+    def test_bulk_create_dry_run(self, admin_client, single_make):
+        """
+        A dry run should validate the cameras without saving them
+        """
+        res = admin_client.post(
+            reverse("bulk_cameras", query={"dry_run": "true"}),
+            bulk_camera_rows(single_make),
+            content_type="application/json",
+        )
+
+        assert res.status_code == 200
+        assert res.json()["dry_run"] is True
+        assert not Camera.objects.exists()
+
+    def test_bulk_create_bad_images(self, admin_client, single_make):
+        """
+        Images that aren't a zip file should be rejected
+        """
+        manifest = SimpleUploadedFile(
+            "cameras.json", json.dumps(bulk_camera_rows(single_make)).encode()
+        )
+        images = SimpleUploadedFile("images.zip", b"not a zip")
+
+        res = admin_client.post(
+            reverse("bulk_cameras"), {"manifest": manifest, "images": images}
+        )
+
+        assert res.status_code == 400
+        assert res.json()["error"] == "Images have to be a directory or a zip file"
+        assert not Camera.objects.exists()
+
+    def test_bulk_create_background(
+        self, admin_client, single_make, sample_uploaded_file, settings, tmp_path
+    ):
+        """
+        A background import should check the rows now and create the cameras in a job,
+        the uploaded images are kept until the job is done with them
+        """
+        settings.JOB_UPLOADS_DIR = str(tmp_path)
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("alexa_35.png", sample_uploaded_file.read())
+        rows = bulk_camera_rows(single_make)
+        rows[0]["image"] = "alexa_35.png"
+        manifest = SimpleUploadedFile("cameras.json", json.dumps(rows).encode())
+        images = SimpleUploadedFile("images.zip", archive.getvalue())
+
+        res = admin_client.post(
+            reverse("bulk_cameras", query={"background": "true"}),
+            {"manifest": manifest, "images": images},
+        )
+
+        assert res.status_code == 202
+        status_url = res.json()["status_url"]
+        assert not Camera.objects.exists()
+        assert len(os.listdir(tmp_path)) == 1
+
+        Worker().run_once()
+
+        job = admin_client.get(status_url).json()
+        assert job["status"] == "done"
+        assert job["result"]["created"] == 3
+        assert Camera.objects.get(model="Alexa 35").image.name
+        assert os.listdir(tmp_path) == []
+
+    def test_bulk_create_background_errors(self, admin_client, single_camera):
+        """
+        Bad rows should be reported right away instead of queueing a job
+        """
+        rows = bulk_camera_rows(single_camera.make)
+        rows[0]["make"] = "Unknown Make"
+
+        res = admin_client.post(
+            reverse("bulk_cameras", query={"background": "true"}),
+            rows,
+            content_type="application/json",
+        )
+
+        assert res.status_code == 400
+        assert res.json()["errors"][0]["row"] == 1
+        assert Camera.objects.count() == 1
+
+    def test_bulk_create_not_admin(self, regular_user, client, single_make):
+        """
+        Regular users are not allowed to import cameras
+        """
+        client.force_login(regular_user)
+
+        res = client.post(
+            reverse("bulk_cameras"),
+            bulk_camera_rows(single_make),
+            content_type="application/json",
+        )
+
+        assert res.status_code == 403
+        assert not Camera.objects.exists()
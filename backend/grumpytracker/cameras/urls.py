@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path("", views.CamerasListView.as_view(), name="cameras"),
+    path("bulk", views.CamerasBulkView.as_view(), name="bulk_cameras"),
     path("<int:camera_id>", views.CameraDetailsView.as_view(), name="camera"),
     path("search", views.CamerasSearchView.as_view(), name="search_cameras"),
 ]
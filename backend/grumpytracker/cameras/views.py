@@ -4,15 +4,30 @@ from django.views import View
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.http.multipartparser import MultiPartParser
 from grumpytracker.utils import (
     validate_required_fields,
     require_admin,
 )
+from grumpytracker.pagination import paginate
+from grumpytracker.cache import cache_response, conditional_response
+from grumpytracker.streaming import stream_response, wants_stream
+from grumpytracker.search import rank_search
+from grumpytracker.imports import (
+    import_format,
+    parse_rows,
+    keep_upload,
+    read_rows,
+    wants_background,
+    wants_dry_run,
+)
 import json
 from loguru import logger
 
 from cameras.models import Make, Camera
+from cameras.services.bulk_import import import_cameras, open_images
+from jobs.models import Job
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -23,18 +38,21 @@ class CamerasListView(View):
     POST - Creates a new camera
     """
 
+    @method_decorator(conditional_response("cameras.Camera", "makes.Make"))
+    @method_decorator(cache_response("cameras.Camera", "makes.Make"))
     def get(self, request) -> JsonResponse:
         """
-        Return all existing cameras
+        Return all existing cameras, pass limit and after to page through them.
+        Pass stream=true or format=ndjson to stream the full list instead
         """
 
-        cameras = Camera.objects.all()
-        data = []
+        # Every camera reports its make's name so we grab the makes in the same query
+        cameras = Camera.objects.select_related("make")
 
-        for cam in cameras:
-            data.append(cam.as_dict())
+        if wants_stream(request):
+            return stream_response(request, cameras)
 
-        return JsonResponse(data, safe=False)
+        return paginate(request, cameras)
 
     @method_decorator(require_admin)
     def post(self, request) -> JsonResponse:
@@ -97,6 +115,93 @@ class CamerasListView(View):
             return JsonResponse({"error": str(e)}, status=400)
 
 
+@method_decorator(csrf_exempt, name="dispatch")
+class CamerasBulkView(View):
+    """
+    Handle cameras/bulk endpoint
+    POST - Creates many cameras at once
+    """
+
+    @method_decorator(require_admin)
+    def post(self, request) -> JsonResponse:
+        """
+        Create cameras from a manifest. Send it as the body (JSON, CSV or NDJSON like
+        formats/bulk) or, to include images, as a multipart form with the manifest file
+        and a zip of the images it names. Pass dry_run=true to only validate, or
+        background=true to validate now and create the cameras in a job
+        """
+        images = None
+        try:
+            if request.content_type == "multipart/form-data":
+                manifest = request.FILES.get("manifest")
+                if manifest is None:
+                    return JsonResponse({"error": "manifest is required"}, status=400)
+
+                rows = read_rows(
+                    manifest.read().decode("utf-8-sig"),
+                    import_format(request, manifest.name),
+                )
+                if "images" in request.FILES:
+                    images = open_images(request.FILES["images"])
+            else:
+                rows = parse_rows(request)
+        except (UnicodeDecodeError, ValueError) as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        dry_run = wants_dry_run(request)
+        background = wants_background(request) and not dry_run
+        try:
+            cameras, errors = import_cameras(
+                rows, images=images, dry_run=dry_run or background
+            )
+        finally:
+            if images is not None:
+                images.close()
+
+        if errors:
+            return JsonResponse(
+                {
+                    "error": f"{len(errors)} of {len(rows)} cameras have errors",
+                    "errors": errors,
+                },
+                status=400,
+            )
+
+        if background:
+            # Writing the cameras and their images can take a while, the caller follows
+            # the job instead
+            job = Job.objects.enqueue(
+                "cameras.import",
+                {
+                    "rows": rows,
+                    "images": (
+                        keep_upload(request.FILES["images"]) if images else None
+                    ),
+                },
+                user=request.user,
+            )
+            return JsonResponse(
+                {"job": job.as_dict(), "status_url": reverse("job", args=[job.id])},
+                status=202,
+            )
+
+        if dry_run:
+            return JsonResponse(
+                {
+                    "success": f"All {len(cameras)} cameras are valid",
+                    "dry_run": True,
+                    "cameras": [camera.as_dict() for camera in cameras],
+                }
+            )
+
+        return JsonResponse(
+            {
+                "success": f"Created {len(cameras)} cameras",
+                "cameras": [camera.as_dict() for camera in cameras],
+            }
+        )
+
+
 @method_decorator(csrf_exempt, name="dispatch")
 class CameraDetailsView(View):
     """
@@ -106,12 +211,20 @@ class CameraDetailsView(View):
     DELETE - Delete a camera
     """
 
+    @method_decorator(
+        conditional_response(
+            "cameras.Camera", "makes.Make", "formats.Format", "sources.Source"
+        )
+    )
+    @method_decorator(
+        cache_response("cameras.Camera", "makes.Make", "formats.Format", "sources.Source")
+    )
     def get(self, request, camera_id: int) -> JsonResponse:
         """
         Get a camera by its interanl ID
         :param make_id: ID of camera in the database
         """
-        camera = get_object_or_404(Camera, id=camera_id)
+        camera = get_object_or_404(Camera.objects.select_related("make"), id=camera_id)
         return JsonResponse(camera.with_formats(), safe=False)
 
     @method_decorator(require_admin)
@@ -177,6 +290,8 @@ class CamerasSearchView(View):
     GET - Returns the a list of cameras based on a search query
     """
 
+    @method_decorator(conditional_response("cameras.Camera", "makes.Make"))
+    @method_decorator(cache_response("cameras.Camera", "makes.Make"))
     def get(self, request) -> JsonResponse:
         """
         Search the database for a camera based on make, model and sensor type
@@ -187,17 +302,21 @@ class CamerasSearchView(View):
 
         terms = query.split()
 
-        # Start building the query by getting all cameras with JOIN on makes
-        cameras = Camera.objects.select_related("make")
-
-        # Build the WHERE clause for each term
+        # Every term has to match the make, model or sensor type
+        match = Q()
         for term in terms:
-            cameras = cameras.filter(
+            match &= (
                 Q(make__name__icontains=term)
                 | Q(model__icontains=term)
                 | Q(sensor_type__icontains=term)
             )
 
+        # Get all cameras with JOIN on makes, add full text and fuzzy model matches
+        # and order them by relevance
+        cameras = rank_search(
+            Camera.objects.select_related("make"), query, match, fuzzy_field="model"
+        )
+
         # Execute the query
         found_cameras = [camera.as_dict() for camera in cameras]
 
@@ -3,10 +3,14 @@ Test configuration for pytest-django. Fixtures put here are apperantly available
 """
 
 import os
+import json
+import threading
+import time
 import django
 import pytest
 import tempfile
 import shutil
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from PIL import Image
 from io import BytesIO
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -19,6 +23,21 @@ def pytest_configure():
     django.setup()
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    Rolling back the test database does not send delete signals, so we need to clear the
+    cached responses and users or the next test could get records that no longer exist
+    """
+    from django.core.cache import cache
+    from grumpytracker.cache import get_cache
+    from grumpytracker.middleware import user_cache
+
+    cache.clear()
+    get_cache().clear()
+    user_cache.clear()
+
+
 @pytest.fixture
 def regular_user():
     """
@@ -452,3 +471,116 @@ def temp_media_dir():
     temp_dir = tempfile.mkdtemp()
     yield temp_dir
     shutil.rmtree(temp_dir)
+
+
+class StandInTMDB:
+    """
+    A local server that answers like TMDB so we can test without a network. Add the answers
+    the test needs with add(), everything else returns a 404 like TMDB does
+    """
+
+    def __init__(self):
+        self.routes = {}
+        # Every request we got, with the client address so we can check connection reuse
+        self.requests = []
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 so clients can keep the connection alive
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                path = path.removeprefix("/3")
+                stand_in.requests.append(
+                    {
+                        "path": path,
+                        "query": query,
+                        "client": self.client_address,
+                        "authorization": self.headers.get("Authorization"),
+                    }
+                )
+                status, body, delay = stand_in.routes.get(
+                    path, (404, {"status_message": "Not found"}, 0)
+                )
+                time.sleep(delay)
+
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                # Keep the test output clean
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/3"
+
+    def add(self, path: str, body, status: int = 200, delay: float = 0):
+        """
+        Answer a path (/movie/123) with a JSON body
+        :param delay: Seconds to wait before answering
+        """
+        self.routes[path] = (status, body, delay)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def tmdb_server(settings):
+    """
+    Start a stand-in TMDB server and point the TMDB client at it
+    """
+    server = StandInTMDB()
+    server.start()
+    settings.TMDB_BASE_URL = server.url
+    settings.TMDB_API_READ_KEY = "test-read-key"
+
+    yield server
+
+    server.stop()
+
+
+@pytest.fixture
+def test_tasks():
+    """
+    Register a few background tasks for the job queue tests, and forget them afterwards
+    """
+    from jobs import registry
+    from jobs.models import Job
+
+    calls = []
+
+    @registry.task("tests.echo")
+    def echo(job, **payload):
+        calls.append(payload)
+        return payload
+
+    @registry.task("tests.flaky", max_attempts=2)
+    def flaky(job):
+        raise RuntimeError("TMDB is down")
+
+    @registry.task("tests.limited", concurrency=1)
+    def limited(job):
+        return "ok"
+
+    @registry.task("tests.slow")
+    def slow(job, seconds):
+        # Runs past the lock timeout without reporting progress, then looks for lost jobs
+        time.sleep(seconds)
+        return Job.objects.requeue_stale()
+
+    yield calls
+
+    for name in ["tests.echo", "tests.flaky", "tests.limited", "tests.slow"]:
+        registry._tasks.pop(name, None)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class FormatsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'formats'
+
+    def ready(self):
+        from grumpytracker.cache import track_changes
+
+        # Edits to formats invalidate the cached catalogue responses
+        track_changes(self.get_model('Format'))
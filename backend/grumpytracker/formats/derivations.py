@@ -0,0 +1,268 @@
+"""
+Works out the fields we derive from a format's sensor and image (the search name, the 3DE
+filmback, distortion model and tracking workflow) for many formats at once. Everything works
+on columns, lists with one value per format, so imports and recomputes do a single pass.
+NumPy is used when it is installed, otherwise we fall back to plain Python
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is optional, the plain Python version gives the same results
+    np = None
+
+# The fields the derivations read
+INPUT_FIELDS = [
+    "image_format",
+    "image_aspect",
+    "format_name",
+    "sensor_width",
+    "sensor_height",
+    "image_width",
+    "image_height",
+    "pixel_aspect",
+    "is_anamorphic",
+    "is_desqueezed",
+    "anamorphic_squeeze",
+    "filmback_width_3de",
+    "filmback_height_3de",
+    "tracking_workflow",
+]
+
+# The fields the derivations write
+DERIVED_FIELDS = [
+    "format_search",
+    "pixel_aspect",
+    "anamorphic_squeeze",
+    "filmback_width_3de",
+    "filmback_height_3de",
+    "distortion_model_3de",
+    "tracking_workflow",
+]
+
+SPHERICAL_MODEL = "Radial Standard Degree 4"
+ANAMORPHIC_MODEL = "Anamorphic Standard Degree 4"
+DESQUEEZED_MODEL = "Anamorphic Rescaled Degree 4"
+
+# Sensor and image aspects closer than this are considered the same
+ASPECT_TOLERANCE = 0.001
+
+Columns = Dict[str, Sequence[Any]]
+
+
+def desqueezed_workflow(
+    filmback_width: Optional[float],
+    filmback_height: Optional[float],
+    squeeze: float,
+) -> str:
+    return (
+        "IMPORTANT: Although this footage appears with square pixels (PAR 1.0), "
+        "it was shot in an anamorphic format and desqueezed in-camera!\n\n"
+        "1. Import with Pixel Aspect = 1.0\n"
+        "2. Set Filmback to {:.2f} x {:.2f} mm\n"
+        "3. Use '{}' lens distortion model\n"
+        "4. Set the distortion model's Anamorphic Squeeze to {:.1f}\n"
+        "5. Do NOT use Pixel Aspect for desqueezing"
+    ).format(filmback_width or 0, filmback_height or 0, DESQUEEZED_MODEL, squeeze)
+
+
+def adjusted_filmback_note(sensor_height: Any, filmback_height: float) -> str:
+    return (
+        "Note: The filmback height has been adjusted from the make's "
+        f"specification ({sensor_height} mm) to {filmback_height:.2f} mm "
+        "to ensure a pixel aspect ratio of exactly 1.0 in 3DE.\n\n"
+        "This adjustment compensates for slight differences between the sensor's "
+        "physical aspect ratio and the recorded image aspect ratio."
+    )
+
+
+def format_search(image_format: str, image_aspect: str, format_name: str) -> str:
+    return " ".join(filter(None, [image_format, image_aspect, format_name]))
+
+
+def spherical_filmback(row: Dict[str, Any]):
+    """
+    The filmback for square pixels, the height is adjusted when the sensor and the image
+    don't have the same aspect
+    :returns: Filmback width, height and if we had to adjust it
+    """
+    image_aspect = row["image_width"] / row["image_height"]
+    sensor_aspect = float(row["sensor_width"]) / float(row["sensor_height"])
+    if abs(sensor_aspect - image_aspect) > ASPECT_TOLERANCE:
+        return row["sensor_width"], float(row["sensor_width"]) / image_aspect, True
+
+    return row["sensor_width"], row["sensor_height"], False
+
+
+def derive_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Derive the fields of a single format, this is the plain Python version
+    """
+    derived = {
+        "format_search": format_search(
+            row["image_format"], row["image_aspect"], row["format_name"]
+        ),
+        "pixel_aspect": row["pixel_aspect"],
+        "anamorphic_squeeze": row["anamorphic_squeeze"],
+        "filmback_width_3de": row["filmback_width_3de"],
+        "filmback_height_3de": row["filmback_height_3de"],
+        "tracking_workflow": row["tracking_workflow"],
+    }
+    has_filmback = bool(row["filmback_width_3de"]) and bool(row["filmback_height_3de"])
+
+    if not row["is_anamorphic"]:
+        width, height, adjusted = spherical_filmback(row)
+        derived["pixel_aspect"] = 1.0
+        derived["filmback_width_3de"] = width
+        derived["filmback_height_3de"] = height
+        derived["distortion_model_3de"] = SPHERICAL_MODEL
+        if adjusted:
+            derived["tracking_workflow"] = adjusted_filmback_note(
+                row["sensor_height"], height
+            )
+    elif not row["is_desqueezed"]:
+        # Raw anamorphic footage, the filmback is the sensor stretched by the squeeze
+        if not has_filmback:
+            derived["filmback_width_3de"] = row["sensor_width"] * row["pixel_aspect"]
+            derived["filmback_height_3de"] = row["sensor_height"]
+        derived["distortion_model_3de"] = ANAMORPHIC_MODEL
+    else:
+        # Desqueezed in camera, the squeeze moves to the distortion model. Once it moved the
+        # pixel aspect is 1.0 and we keep the squeeze we backed up
+        if row["pixel_aspect"] != 1.0:
+            derived["anamorphic_squeeze"] = row["pixel_aspect"]
+        derived["pixel_aspect"] = 1.0
+        if not has_filmback:
+            width, height, _ = spherical_filmback(row)
+            derived["filmback_width_3de"] = width
+            derived["filmback_height_3de"] = height
+        derived["distortion_model_3de"] = DESQUEEZED_MODEL
+        derived["tracking_workflow"] = desqueezed_workflow(
+            derived["filmback_width_3de"],
+            derived["filmback_height_3de"],
+            derived["anamorphic_squeeze"],
+        )
+
+    return derived
+
+
+def derive_python(columns: Columns) -> Dict[str, List[Any]]:
+    count = len(columns["image_format"])
+    rows = [
+        derive_row({field: columns[field][i] for field in INPUT_FIELDS})
+        for i in range(count)
+    ]
+
+    return {field: [row[field] for row in rows] for field in DERIVED_FIELDS}
+
+
+def derive_numpy(columns: Columns) -> Dict[str, List[Any]]:
+    """
+    Same as derive_python, the numbers for every format are worked out in one pass and only
+    the workflow texts are built per format
+    """
+
+    def floats(field: str):
+        # None becomes NaN so missing filmbacks survive the conversion
+        return np.array(columns[field], dtype=float)
+
+    sensor_width = floats("sensor_width")
+    sensor_height = floats("sensor_height")
+    image_width = floats("image_width")
+    image_height = floats("image_height")
+    pixel_aspect = floats("pixel_aspect")
+    squeeze = floats("anamorphic_squeeze")
+    filmback_width = floats("filmback_width_3de")
+    filmback_height = floats("filmback_height_3de")
+    anamorphic = np.array(columns["is_anamorphic"], dtype=bool)
+    desqueezed = anamorphic & np.array(columns["is_desqueezed"], dtype=bool)
+    raw = anamorphic & ~desqueezed
+
+    has_filmback = (np.nan_to_num(filmback_width) != 0) & (
+        np.nan_to_num(filmback_height) != 0
+    )
+    needs_spherical = ~anamorphic | (desqueezed & ~has_filmback)
+    if np.any(needs_spherical & ((sensor_height == 0) | (image_height == 0))):
+        # Same as the plain Python version, we can't work out an aspect
+        raise ZeroDivisionError("Formats need a sensor and image height")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        image_aspect = image_width / image_height
+        sensor_aspect = sensor_width / sensor_height
+        adjusted = np.abs(sensor_aspect - image_aspect) > ASPECT_TOLERANCE
+        spherical_height = np.where(adjusted, sensor_width / image_aspect, sensor_height)
+
+    missing = anamorphic & ~has_filmback
+    new_filmback_width = np.select(
+        [~anamorphic, missing & ~desqueezed, missing & desqueezed],
+        [sensor_width, sensor_width * pixel_aspect, sensor_width],
+        filmback_width,
+    )
+    new_filmback_height = np.select(
+        [~anamorphic, missing & ~desqueezed, missing & desqueezed],
+        [spherical_height, sensor_height, spherical_height],
+        filmback_height,
+    )
+    new_squeeze = np.where(desqueezed & (pixel_aspect != 1.0), pixel_aspect, squeeze)
+    new_pixel_aspect = np.where(raw, pixel_aspect, 1.0)
+    distortion = np.select(
+        [~anamorphic, raw], [SPHERICAL_MODEL, ANAMORPHIC_MODEL], DESQUEEZED_MODEL
+    )
+
+    def values(array) -> List[Optional[float]]:
+        # Missing filmbacks went in as NaN, they come back out as None
+        return [None if value != value else value for value in array.tolist()]
+
+    widths = values(new_filmback_width)
+    heights = values(new_filmback_height)
+    squeezes = new_squeeze.tolist()
+
+    # Texts can't be vectorized, only build them for the formats that get one
+    workflows = list(columns["tracking_workflow"])
+    for i in np.flatnonzero(~anamorphic & adjusted):
+        workflows[i] = adjusted_filmback_note(columns["sensor_height"][i], heights[i])
+    for i in np.flatnonzero(desqueezed):
+        workflows[i] = desqueezed_workflow(widths[i], heights[i], squeezes[i])
+
+    return {
+        "format_search": [
+            format_search(*parts)
+            for parts in zip(
+                columns["image_format"], columns["image_aspect"], columns["format_name"]
+            )
+        ],
+        "pixel_aspect": new_pixel_aspect.tolist(),
+        "anamorphic_squeeze": squeezes,
+        "filmback_width_3de": widths,
+        "filmback_height_3de": heights,
+        "distortion_model_3de": distortion.tolist(),
+        "tracking_workflow": workflows,
+    }
+
+
+def derive(columns: Columns) -> Dict[str, List[Any]]:
+    """
+    Derive the fields of many formats at once
+    :param columns: A list of values for every field in INPUT_FIELDS, one value per format
+    :returns: A list of values for every field in DERIVED_FIELDS, in the same order
+    """
+    if not columns["image_format"]:
+        return {field: [] for field in DERIVED_FIELDS}
+
+    if np is not None:
+        return derive_numpy(columns)
+
+    return derive_python(columns)
+
+
+def derive_formats(formats: Sequence[Any]) -> None:
+    """
+    Derive the fields of format records (or anything with the same attributes) in place
+    """
+    columns = {field: [getattr(fmt, field) for fmt in formats] for field in INPUT_FIELDS}
+    derived = derive(columns)
+    for field, values in derived.items():
+        for fmt, value in zip(formats, values):
+            setattr(fmt, field, value)
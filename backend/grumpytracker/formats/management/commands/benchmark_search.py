@@ -0,0 +1,139 @@
+import statistics
+import time
+
+from django.contrib.postgres.search import SearchVector
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q, Value
+
+from cameras.models import Camera
+from formats.models import Format
+from grumpytracker.search import SEARCH_CONFIG, rank_search
+from makes.models import Make
+from sources.models import Source
+
+# Pieces we combine into synthetic format names
+RESOLUTIONS = ["2K", "2.8K", "3.2K", "3.4K", "4K", "4.5K", "4.6K", "5.1K", "6K", "8K"]
+ASPECTS = ["16:9", "17:9", "3:2", "4:3", "6:5", "2:1", "2.39:1"]
+NAMES = ["Open Gate", "S16", "Super 35", "HD", "UHD", "Full Frame", "LF", "Ana. 2x"]
+CODECS = ["ARRIRAW", "ProRes", "R3D", "X-OCN", "BRAW"]
+
+# Real model names mixed into the synthetic cameras so the searches have something to find
+MODELS = ["Alexa Mini LF", "Alexa 35", "Alexa LF", "Amira", "KOMODO", "V-RAPTOR"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the camera and format search queries against a synthetic catalogue. "
+        "The catalogue is created in a transaction and rolled back when we are done"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--formats", type=int, default=100_000, help="Number of formats to create"
+        )
+        parser.add_argument(
+            "--runs", type=int, default=20, help="Number of times to run each query"
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f"Creating {options['formats']} formats...")
+            self.create_catalogue(options["formats"])
+
+            # Make sure the planner knows how big the tables are
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+            cameras = Camera.objects.select_related("make")
+            formats = Format.objects.for_serialization()
+            queries = {
+                "cameras q=alexa mini lf": lambda: rank_search(
+                    cameras,
+                    "alexa mini lf",
+                    Q(model__icontains="alexa mini lf"),
+                    fuzzy_field="model",
+                ),
+                "cameras q=alxa mini lf (fuzzy)": lambda: rank_search(
+                    cameras,
+                    "alxa mini lf",
+                    Q(model__icontains="alxa mini lf"),
+                    fuzzy_field="model",
+                ),
+                "formats format=4.6K 3:2 Open Gate": lambda: formats.filter(
+                    format_search__icontains="4.6K 3:2 Open Gate"
+                ),
+                "formats q=open gate camera=alexa mini lf": lambda: rank_search(
+                    formats.filter(camera__model__icontains="alexa mini lf"),
+                    "open gate",
+                    Q(format_search__icontains="open gate"),
+                ),
+            }
+
+            for name, build_query in queries.items():
+                timings = []
+                for _ in range(options["runs"]):
+                    start = time.perf_counter()
+                    # We time the first page since that's what the site shows
+                    list(build_query()[:50])
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                self.stdout.write(
+                    f"{name}: median {statistics.median(timings):.2f} ms, "
+                    f"max {max(timings):.2f} ms"
+                )
+
+            # We never want to keep the synthetic data
+            transaction.set_rollback(True)
+
+    def create_catalogue(self, format_count: int) -> None:
+        """
+        Create a make, cameras and formats in bulk. bulk_create skips save so we build the
+        search documents ourselves
+        """
+        make = Make.objects.create(name="Benchmark", website="https://example.com")
+        source = Source.objects.create(name="Benchmark Source")
+
+        formats_per_camera = len(RESOLUTIONS) * len(ASPECTS) * len(NAMES)
+        camera_count = max(1, -(-format_count // formats_per_camera))
+        cameras = Camera.objects.bulk_create(
+            Camera(
+                make=make,
+                model=f"{MODELS[i % len(MODELS)]} {i}",
+                sensor_type="Benchmark CMOS sensor",
+                min_frame_rate=1,
+                max_frame_rate=120,
+            )
+            for i in range(camera_count)
+        )
+        Camera.objects.filter(make=make).update(
+            search_vector=SearchVector("model", weight="A", config=SEARCH_CONFIG)
+            + SearchVector(Value(make.name), weight="A", config=SEARCH_CONFIG)
+            + SearchVector("sensor_type", weight="B", config=SEARCH_CONFIG)
+        )
+
+        new_formats = []
+        for i in range(format_count):
+            resolution = RESOLUTIONS[i % len(RESOLUTIONS)]
+            aspect = ASPECTS[(i // len(RESOLUTIONS)) % len(ASPECTS)]
+            name = NAMES[(i // (len(RESOLUTIONS) * len(ASPECTS))) % len(NAMES)]
+            new_formats.append(
+                Format(
+                    camera=cameras[i // formats_per_camera],
+                    source=source,
+                    image_format=resolution,
+                    image_aspect=aspect,
+                    format_name=name,
+                    format_search=f"{resolution} {aspect} {name}",
+                    codec=CODECS[i % len(CODECS)],
+                    sensor_width=27.99,
+                    sensor_height=19.22,
+                    image_width=4608,
+                    image_height=3164,
+                )
+            )
+        Format.objects.bulk_create(new_formats, batch_size=5000)
+        Format.objects.filter(source=source).update(
+            search_vector=SearchVector("format_search", weight="A", config=SEARCH_CONFIG)
+            + SearchVector("codec", weight="B", config=SEARCH_CONFIG)
+        )
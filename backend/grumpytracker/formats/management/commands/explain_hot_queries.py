@@ -0,0 +1,146 @@
+import json
+from typing import Any, Dict, Iterator
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from cameras.models import Camera
+from formats.models import Format
+from grumpytracker.views import SearchView
+from jobs.models import Job
+from makes.models import Make
+from projects.models import Project, TMDBCacheEntry, Vote
+from sources.models import Source
+
+
+def walk_plan(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Go through every node of an EXPLAIN (FORMAT JSON) plan
+    """
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk_plan(child)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN ANALYZE over the main query of every hot endpoint and flag the "
+        "sequential scans on tables big enough to need an index"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--query", default="alexa", help="What to search for in the search queries"
+        )
+        parser.add_argument(
+            "--min-rows",
+            type=int,
+            default=1000,
+            help="Only flag sequential scans on tables with at least this many rows",
+        )
+        parser.add_argument(
+            "--no-analyze",
+            action="store_true",
+            help="Don't refresh the planner statistics before explaining",
+        )
+        parser.add_argument(
+            "--fail",
+            action="store_true",
+            help="Exit with an error if we flagged anything, for CI",
+        )
+
+    def handle(self, *args, **options):
+        if not options["no_analyze"]:
+            # Plans are only as good as the statistics they are based on
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        queries = self.hot_queries(options["query"])
+        table_rows = self.table_rows()
+
+        flagged = 0
+        for name, queryset in queries.items():
+            result = json.loads(queryset.explain(analyze=True, format="json"))[0]
+            self.stdout.write(f"{name}: {result['Execution Time']:.2f} ms")
+
+            for node in walk_plan(result["Plan"]):
+                if node["Node Type"] != "Seq Scan":
+                    continue
+
+                table = node["Relation Name"]
+                rows = table_rows.get(table, 0)
+                if rows >= options["min_rows"]:
+                    flagged += 1
+                    self.stdout.write(
+                        self.style.WARNING(f"  Seq Scan on {table} ({rows} rows)")
+                    )
+                elif options["verbosity"] > 1:
+                    self.stdout.write(
+                        f"  Seq Scan on {table} ({rows} rows, small table)"
+                    )
+
+        self.stdout.write(f"{flagged} sequential scans on large tables")
+        if flagged and options["fail"]:
+            raise CommandError(f"Found {flagged} sequential scans on large tables")
+
+    def hot_queries(self, query: str) -> Dict[str, QuerySet]:
+        """
+        The queries behind our busiest endpoints, built the same way the views build them.
+        We use the first project and format we have to fill in the lookups
+        """
+        page = settings.API_DEFAULT_PAGE_SIZE
+        cameras = Camera.objects.select_related("make")
+        formats = Format.objects.for_serialization()
+        queries = {
+            "makes list": Make.objects.with_cameras_count().order_by("id")[:page],
+            "cameras list": cameras.order_by("id")[:page],
+            "formats list": formats.order_by("id")[:page],
+            "sources list": Source.objects.order_by("id")[:page],
+            "projects list": Project.objects.order_by("id")[:page],
+            f"makes search q={query}": SearchView.search_makes(query),
+            f"cameras search q={query}": SearchView.search_cameras(query),
+            f"formats search q={query}": SearchView.search_formats(query),
+            f"sources search q={query}": SearchView.search_sources(query),
+            f"projects search q={query}": Project.objects.filter(
+                name__icontains=query
+            ),
+            "formats filter is_anamorphic image_format": formats.filter(
+                is_anamorphic=True, image_format="4.6K"
+            ),
+            "formats filter image_width image_height": formats.filter(
+                image_width=4608, image_height=3164
+            ),
+            "projects by tmdb_id": Project.objects.filter(tmdb_id__in=[1, 2, 3]),
+            "tmdb cache lookup": TMDBCacheEntry.objects.filter(key__in=["0" * 64]),
+            "next queued job": Job.objects.filter(
+                status=Job.QUEUED, run_after__lte=timezone.now()
+            ).order_by("run_after", "id")[:1],
+        }
+
+        project = Project.objects.order_by("id").first()
+        fmt = Format.objects.order_by("id").first()
+        if project is not None:
+            queries["project formats with votes"] = project.voted_formats()
+        if project is not None and fmt is not None:
+            queries["project format votes"] = Vote.objects.filter(
+                project=project, fmt=fmt, vote_type="up"
+            )
+
+        return queries
+
+    def table_rows(self) -> Dict[str, int]:
+        """
+        Postgres' estimate of how many rows every table has, from the last ANALYZE
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relname, reltuples FROM pg_class "
+                "WHERE relkind = 'r' AND relnamespace = current_schema()::regnamespace"
+            )
+            rows = cursor.fetchall()
+
+        # reltuples is -1 for tables that were never analyzed
+        return {table: max(int(count), 0) for table, count in rows}
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from formats.derivations import DERIVED_FIELDS, INPUT_FIELDS, derive_formats
+from formats.models import Format
+from grumpytracker.cache import bump_label
+
+
+class Command(BaseCommand):
+    help = (
+        "Work out the 3DE filmback, distortion model, tracking workflow and search fields of "
+        "every format again, use after changing how they are derived"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="How many formats to derive and update at a time",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many formats would change",
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        # The search vector also reads the codec and notes
+        fields = set(INPUT_FIELDS) | {"codec", "notes", "make_notes"}
+        queryset = Format.objects.only(*fields).order_by("id")
+
+        total = 0
+        changed = 0
+        last_id = 0
+        while True:
+            formats = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not formats:
+                break
+
+            last_id = formats[-1].id
+            total += len(formats)
+
+            before = [[getattr(fmt, field) for field in DERIVED_FIELDS] for fmt in formats]
+            derive_formats(formats)
+            updated = [
+                fmt
+                for fmt, old in zip(formats, before)
+                if old != [getattr(fmt, field) for field in DERIVED_FIELDS]
+            ]
+            changed += len(updated)
+
+            if options["dry_run"]:
+                continue
+
+            # Rebuild every search vector, we can't compare the ones we have
+            for fmt in formats:
+                fmt.search_vector = fmt.build_search_vector()
+            Format.objects.bulk_update(
+                formats, [*DERIVED_FIELDS, "search_vector"], batch_size=batch_size
+            )
+
+        if options["dry_run"]:
+            self.stdout.write(f"{changed} of {total} formats would change")
+        else:
+            # bulk_update does not send post_save, let the response cache know
+            bump_label(Format._meta.label)
+            self.stdout.write(self.style.SUCCESS(f"Updated {changed} of {total} formats"))
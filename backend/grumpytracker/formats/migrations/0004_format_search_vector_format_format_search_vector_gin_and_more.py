@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:29
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.db import migrations
+
+
+# Build the search document for the existing formats, new saves keep it up to date
+BACKFILL_SEARCH_VECTOR = """
+UPDATE formats_format SET search_vector =
+    setweight(to_tsvector('simple', coalesce(format_search, '')), 'A')
+    || setweight(to_tsvector('simple', coalesce(codec, '')), 'B')
+    || setweight(to_tsvector('simple', coalesce(notes, '')), 'C')
+    || setweight(to_tsvector('simple', coalesce(make_notes, '')), 'C');
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cameras', '0004_camera_search_vector_camera_camera_search_vector_gin_and_more'),
+        ('formats', '0003_alter_format_anamorphic_squeeze_and_more'),
+        ('sources', '0002_source_search_vector_source_source_search_vector_gin_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='format',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='format',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='format_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='format',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['format_search'], name='format_search_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='format',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('format_search'), name='gin_trgm_ops'), name='format_search_upper_trgm'),
+        ),
+        migrations.RunSQL(BACKFILL_SEARCH_VECTOR, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cameras', '0004_camera_search_vector_camera_camera_search_vector_gin_and_more'),
+        ('formats', '0004_format_search_vector_format_format_search_vector_gin_and_more'),
+        ('sources', '0002_source_search_vector_source_source_search_vector_gin_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='format',
+            index=models.Index(fields=['is_anamorphic', 'image_format'], name='format_anamorphic_image_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='format',
+            index=models.Index(fields=['image_width', 'image_height'], name='format_resolution_idx'),
+        ),
+    ]
@@ -1,16 +1,64 @@
 from typing import Dict, Any
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
 from django.core.validators import MaxValueValidator, MinValueValidator
 from cameras.models import Camera
 from sources.models import Source
+from grumpytracker.search import search_document
+from .derivations import derive_formats
 from loguru import logger
 
 
+class FormatQuerySet(models.QuerySet):
+    """
+    Shared queries for formats
+    """
+
+    # Everything Format.as_dict reads, including the camera and make it reports on
+    SERIALIZED_FIELDS = (
+        "camera__model",
+        "camera__make__name",
+        "source",
+        "image_format",
+        "image_aspect",
+        "format_name",
+        "sensor_width",
+        "sensor_height",
+        "image_width",
+        "image_height",
+        "pixel_aspect",
+        "is_anamorphic",
+        "is_desqueezed",
+        "anamorphic_squeeze",
+        "filmback_width_3de",
+        "filmback_height_3de",
+        "distortion_model_3de",
+        "is_downsampled",
+        "is_upscaled",
+        "codec",
+        "raw_recording_available",
+        "notes",
+        "make_notes",
+        "tracking_workflow",
+    )
+
+    def for_serialization(self) -> "FormatQuerySet":
+        """
+        Join the camera and its make and only load the columns as_dict needs. Any code that
+        returns formats through the API should start from this so we don't run extra queries per row
+        """
+        return self.select_related("camera__make").only(*self.SERIALIZED_FIELDS)
+
+
 class Format(models.Model):
     """
     Model for a recording format. This has all the information a tracker would be looking for.
     """
 
+    objects = FormatQuerySet.as_manager()
+
     # Define relationships
     camera = models.ForeignKey(Camera, on_delete=models.CASCADE, related_name="formats")
     source = models.ForeignKey(
@@ -25,6 +73,9 @@ class Format(models.Model):
     # The above fields should usually be searched together
     format_search = models.CharField(max_length=500, blank=True)
 
+    # Full text search document, this is rebuilt every time the format is saved
+    search_vector = SearchVectorField(null=True, editable=False)
+
     # Physical sensor info
     sensor_width = models.FloatField(
         validators=[MinValueValidator(0), MaxValueValidator(1000)]
@@ -112,6 +163,26 @@ class Format(models.Model):
             "is_downsampled",
             "pixel_aspect",
         ]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="format_search_vector_gin"),
+            # Plain trigram index for fuzzy matching the format name
+            GinIndex(
+                fields=["format_search"], opclasses=["gin_trgm_ops"], name="format_search_trgm"
+            ),
+            # icontains compiles to UPPER(field) LIKE UPPER(term), this index matches that
+            GinIndex(
+                OpClass(Upper("format_search"), name="gin_trgm_ops"),
+                name="format_search_upper_trgm",
+            ),
+            # The search filters, people usually look for anamorphic formats of a size
+            models.Index(
+                fields=["is_anamorphic", "image_format"],
+                name="format_anamorphic_image_idx",
+            ),
+            models.Index(
+                fields=["image_width", "image_height"], name="format_resolution_idx"
+            ),
+        ]
 
     @property
     def name(self):
@@ -123,7 +194,7 @@ class Format(models.Model):
             "camera": self.camera.id,
             "camera_model": self.camera.model,
             "make_name": self.camera.make.name,
-            "source": self.source.id,
+            "source": self.source_id,
             "image_format": self.image_format,
             "image_aspect": self.image_aspect,
             "format_name": self.format_name,
@@ -147,106 +218,31 @@ class Format(models.Model):
             "tracking_workflow": self.tracking_workflow,
         }
 
-    def ensure_sperical_filmback(self) -> bool:
+    def build_search_vector(self):
         """
-        Ensure that the 3de filmaback is correct for a spherical lens while maintaining a pixel aspect of 1.0.
-        If there's a mismatch between the filmback aspect and the image aspect adjust the filmback height to match
+        Build the search document for this format, the format name is the most important part
         """
+        return search_document(
+            (self.format_search, "A"),
+            (self.codec, "B"),
+            (self.notes, "C"),
+            (self.make_notes, "C"),
+        )
 
-        self.pixel_aspect = 1.0
-
-        # Calculate aspect ratios
-        sensor_aspect = float(self.sensor_width) / float(self.sensor_height)
-        image_aspect = self.image_width / self.image_height
-
-        if abs(sensor_aspect - image_aspect) > 0.001:
-            # There is a mismatch between the two aspects adjust the filmback height
-            self.filmback_width_3de = self.sensor_width
-            self.filmback_height_3de = float(self.sensor_width) / image_aspect
-
-            return True
-        else:
-            # There is no mismath we can use the sensor info
-            self.filmback_width_3de = self.sensor_width
-            self.filmback_height_3de = self.sensor_height
-
-            return False
-
-    def ensure_anamorphic_filmaback(self) -> bool:
+    def derive_fields(self) -> None:
         """
-        Ensure that the 3de filmback is correct for an anamorphic lens
-        :return: True if desqueezed False if not
+        Fill in the fields we work out from the rest of the format: the search fields, the 3DE
+        filmback, distortion model and tracking workflow. save() calls this, code that skips
+        save (bulk_create) should use derivations.derive_formats to do many formats at once
         """
-        # This is anamorphic footage figure out correct setup
-        if not self.is_desqueezed:
-            # This is raw footage
-            if not self.filmback_width_3de or not self.filmback_height_3de:
-                # Calculate correct filmback - simply multiply width by squeeze factor
-                self.filmback_width_3de = self.sensor_width * self.pixel_aspect
-                self.filmback_height_3de = self.sensor_height
-
-            return False
-        else:
-            # This is already desqueezed footage with PAR 1.0
-            # Backup the original pixel aspect
-            self.anamorphic_squeeze = self.pixel_aspect
-
-            # Set the pixel aspect to 1
-            self.pixel_aspect = 1.0
-
-            if not self.filmback_width_3de or not self.filmback_height_3de:
-                # Desqueezed plates are treated like spherical plates we just set the original filmback
-                self.ensure_sperical_filmback()
-
-            return True
+        derive_formats([self])
+        self.search_vector = self.build_search_vector()
 
     def save(self, *args, **kwargs):
         """
-        Overrides the model's save function.
+        Overrides the model's save function to keep the derived fields up to date
         """
-        # Set the format search field
-        format_parts = [
-            self.image_format or "",
-            self.image_aspect or "",
-            self.format_name or "",
-        ]
-
-        self.format_search = " ".join(filter(None, format_parts))
-
-        if self.is_anamorphic:
-            # This is an anamorphic format update the 3de filmabck
-            desqueezed = self.ensure_anamorphic_filmaback()
-            if desqueezed:
-                self.distortion_model_3de = "Anamorphic Rescaled Degree 4"
-
-                self.tracking_workflow = (
-                    "IMPORTANT: Although this footage appears with square pixels (PAR 1.0), "
-                    "it was shot in an anamorphic format and desqueezed in-camera!\n\n"
-                    "1. Import with Pixel Aspect = 1.0\n"
-                    "2. Set Filmback to {:.2f} x {:.2f} mm\n"
-                    "3. Use '{}' lens distortion model\n"
-                    "4. Set the distortion model's Anamorphic Squeeze to {:.1f}\n"
-                    "5. Do NOT use Pixel Aspect for desqueezing"
-                ).format(
-                    self.filmback_width_3de or 0,
-                    self.filmback_height_3de or 0,
-                    self.distortion_model_3de,
-                    self.anamorphic_squeeze,
-                )
-            else:
-                self.distortion_model_3de = "Anamorphic Standard Degree 4"
-        else:
-            # This is a spherical format check if we had to update the 3de filmaback
-            adjusted = self.ensure_sperical_filmback()
-            if adjusted:
-                self.tracking_workflow = (
-                    "Note: The filmback height has been adjusted from the make's "
-                    f"specification ({self.sensor_height} mm) to {self.filmback_height_3de:.2f} mm "
-                    "to ensure a pixel aspect ratio of exactly 1.0 in 3DE.\n\n"
-                    "This adjustment compensates for slight differences between the sensor's "
-                    "physical aspect ratio and the recorded image aspect ratio."
-                )
-            self.distortion_model_3de = "Radial Standard Degree 4"
+        self.derive_fields()
 
         # Run the parent class save function
         super().save(*args, **kwargs)
@@ -0,0 +1,187 @@
+from typing import Any, Dict, List, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from cameras.models import Camera
+from grumpytracker.cache import bump_label
+from grumpytracker.imports import normalize_values, validation_error
+from grumpytracker.utils import validate_required_fields
+from sources.models import Source
+from .derivations import derive_formats
+from .models import Format
+
+# Same as a single POST to formats/
+REQUIRED_FIELDS = [
+    "camera",
+    "source",
+    "image_format",
+    "sensor_width",
+    "sensor_height",
+    "image_width",
+    "image_height",
+]
+
+# Everything a bulk import can set, the rest is derived
+IMPORT_FIELDS = {
+    *REQUIRED_FIELDS,
+    "image_aspect",
+    "format_name",
+    "pixel_aspect",
+    "is_anamorphic",
+    "is_desqueezed",
+    "anamorphic_squeeze",
+    "filmback_width_3de",
+    "filmback_height_3de",
+    "is_downsampled",
+    "is_upscaled",
+    "codec",
+    "raw_recording_available",
+    "notes",
+    "make_notes",
+    "tracking_workflow",
+}
+
+RowError = Dict[str, Any]
+
+
+def reference_ids(row: Dict[str, Any]) -> Tuple[int, int]:
+    return int(row["camera"]), int(row["source"])
+
+
+def check_formats(
+    rows: List[Dict[str, Any]],
+) -> Tuple[List[Format], List[RowError]]:
+    """
+    Validate the rows of a bulk import against each other and the formats we have
+    :returns: The unsaved formats and the errors of every bad row, rows are numbered
+        from 1
+    """
+    errors: List[RowError] = []
+
+    def error(row_number: int, message: str) -> None:
+        errors.append({"row": row_number, "error": message})
+
+    # Look up every camera and source the rows use in one query each
+    references = {}
+    for row_number, row in enumerate(rows, start=1):
+        try:
+            references[row_number] = reference_ids(row)
+        except (KeyError, TypeError, ValueError):
+            continue
+    cameras = Camera.objects.select_related("make").in_bulk(
+        {camera_id for camera_id, _ in references.values()}
+    )
+    sources = set(
+        Source.objects.filter(
+            id__in={source_id for _, source_id in references.values()}
+        ).values_list("id", flat=True)
+    )
+
+    formats = []
+    for row_number, row in enumerate(rows, start=1):
+        unknown = sorted(set(row) - IMPORT_FIELDS)
+        if unknown:
+            error(row_number, f"Unknown fields {', '.join(unknown)}")
+            continue
+
+        missing = validate_required_fields(row, REQUIRED_FIELDS)
+        if missing:
+            error(row_number, missing)
+            continue
+
+        if row_number not in references:
+            error(row_number, "camera and source have to be ids")
+            continue
+
+        camera_id, source_id = references[row_number]
+        if camera_id not in cameras:
+            error(row_number, f"Camera {camera_id} not found")
+            continue
+        if source_id not in sources:
+            error(row_number, f"Source {source_id} not found")
+            continue
+
+        values = {
+            field: value
+            for field, value in row.items()
+            if field not in ("camera", "source")
+        }
+        normalize_values(Format, values)
+        fmt = Format(camera=cameras[camera_id], source_id=source_id, **values)
+        try:
+            # Converts the values (CSV sends everything as text) and runs the validators
+            fmt.full_clean(
+                exclude=["camera", "source"],
+                validate_unique=False,
+                validate_constraints=False,
+            )
+        except ValidationError as e:
+            error(row_number, validation_error(e))
+            continue
+
+        if not fmt.sensor_height or not fmt.image_height:
+            # CSV zeros get past the required check, we can't derive an aspect from them
+            error(row_number, "sensor_height and image_height can't be 0")
+            continue
+
+        formats.append((row_number, fmt))
+
+    # The pixel aspect is part of the unique key and can change, derive before comparing
+    derive_formats([fmt for _, fmt in formats])
+
+    key_fields = [
+        Format._meta.get_field(name).attname for name in Format._meta.unique_together[0]
+    ]
+    existing = set(
+        Format.objects.filter(
+            camera_id__in={fmt.camera_id for _, fmt in formats}
+        ).values_list(*key_fields)
+    )
+    seen = {}
+    for row_number, fmt in formats:
+        key = tuple(getattr(fmt, field) for field in key_fields)
+        if key in existing:
+            error(row_number, f"Format {fmt.name} already exists")
+        elif key in seen:
+            error(row_number, f"Same format as row {seen[key]}")
+        else:
+            seen[key] = row_number
+
+    errors.sort(key=lambda e: e["row"])
+    return [fmt for _, fmt in formats], errors
+
+
+def import_formats(
+    rows: List[Dict[str, Any]], dry_run: bool = False
+) -> Tuple[List[Format], List[RowError]]:
+    """
+    Validate and create many formats at once. Every row is checked before anything is
+    written, if any of them has an error nothing is saved
+    :param rows: The formats to create, with the same fields a POST to formats/ takes
+    :param dry_run: Only validate the rows
+    :returns: The formats (saved unless dry_run) and the errors of every bad row, rows are
+        numbered from 1
+    """
+    formats, errors = check_formats(rows)
+    if errors or dry_run:
+        return formats, errors
+
+    for fmt in formats:
+        fmt.search_vector = fmt.build_search_vector()
+
+    try:
+        with transaction.atomic():
+            Format.objects.bulk_create(formats)
+    except IntegrityError:
+        # Another import (or a delete) got in between our checks and the insert, the
+        # rows it broke fail the checks now
+        formats, errors = check_formats(rows)
+        if not errors:
+            raise
+        return formats, errors
+
+    # bulk_create does not send post_save, let the response cache know
+    bump_label(Format._meta.label)
+
+    return formats, errors
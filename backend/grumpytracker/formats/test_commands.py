@@ -0,0 +1,102 @@
+import pytest
+from io import StringIO
+from django.core.management import CommandError, call_command
+from formats.models import Format
+from versions.models import TableVersion
+
+
+@pytest.mark.django_db
+class TestBenchmarkSearchCommand:
+    """
+    Tests for the benchmark_search management command
+    """
+
+    def test_benchmark_search(self, multiple_formats):
+        """
+        The benchmark should time every query and leave the database the way it found it
+        """
+        out = StringIO()
+        call_command("benchmark_search", formats=600, runs=2, stdout=out)
+
+        output = out.getvalue()
+        assert "Creating 600 formats" in output
+        assert "cameras q=alexa mini lf: median" in output
+        assert "formats q=open gate camera=alexa mini lf: median" in output
+
+        # The synthetic catalogue is rolled back
+        assert Format.objects.count() == len(multiple_formats)
+
+
+@pytest.mark.django_db
+class TestExplainHotQueriesCommand:
+    """
+    Tests for the explain_hot_queries management command
+    """
+
+    def test_explain_hot_queries(self, multiple_formats, multiple_projects):
+        """
+        Every hot query should be explained, small tables are not flagged
+        """
+        out = StringIO()
+        call_command("explain_hot_queries", stdout=out)
+
+        output = out.getvalue()
+        assert "formats list:" in output
+        assert "cameras search q=alexa:" in output
+        assert "project formats with votes:" in output
+        assert "next queued job:" in output
+        assert "0 sequential scans on large tables" in output
+
+    def test_explain_hot_queries_flags_seq_scans(self, multiple_formats):
+        """
+        Our test tables are tiny so Postgres scans them, with no minimum size those are
+        flagged and --fail turns them into an error
+        """
+        out = StringIO()
+        with pytest.raises(CommandError):
+            call_command("explain_hot_queries", min_rows=0, fail=True, stdout=out)
+
+        assert "Seq Scan on formats_format" in out.getvalue()
+
+
+@pytest.mark.django_db
+class TestRecomputeFormatDerivationsCommand:
+    """
+    Tests for the recompute_format_derivations management command
+    """
+
+    def test_recompute(self, multiple_formats):
+        """
+        Formats whose derived fields went stale should be fixed, the rest left as they are
+        """
+        Format.objects.filter(id=multiple_formats[0].id).update(
+            distortion_model_3de=None, filmback_height_3de=1.0, format_search=""
+        )
+
+        version = TableVersion.objects.current(["formats.Format"])["formats.Format"]
+
+        out = StringIO()
+        call_command("recompute_format_derivations", batch_size=2, stdout=out)
+
+        assert f"Updated 1 of {len(multiple_formats)} formats" in out.getvalue()
+        # bulk_update sends no post_save, the cached format responses are invalidated
+        current = TableVersion.objects.current(["formats.Format"])["formats.Format"]
+        assert current.version > version.version
+        fmt = Format.objects.get(id=multiple_formats[0].id)
+        assert fmt.distortion_model_3de == "Radial Standard Degree 4"
+        assert fmt.filmback_height_3de == multiple_formats[0].filmback_height_3de
+        assert fmt.format_search == "4.6K 3:2 Open Gate"
+        assert Format.objects.filter(search_vector="open").exists()
+
+    def test_recompute_dry_run(self, multiple_formats):
+        """
+        A dry run should only report what would change
+        """
+        Format.objects.update(distortion_model_3de=None)
+
+        out = StringIO()
+        call_command("recompute_format_derivations", dry_run=True, stdout=out)
+
+        count = len(multiple_formats)
+        assert f"{count} of {count} formats would change" in out.getvalue()
+        assert not Format.objects.exclude(distortion_model_3de=None).exists()
@@ -1,4 +1,5 @@
 import pytest
+from formats import derivations
 from formats.models import Format
 
 
@@ -372,3 +373,167 @@ class TestFormatModel:
 
         assert fmt.distortion_model_3de == "Anamorphic Rescaled Degree 4"
         assert "desqueezed in-camera" in fmt.tracking_workflow
+
+    def test_desqueezed_save_keeps_squeeze(self, single_camera, single_source):
+        """
+        Saving a desqueezed format again should keep the squeeze it backed up the first time
+        """
+        fmt = Format.objects.create(
+            camera=single_camera,
+            image_format="3.8K",
+            image_aspect="2:1",
+            sensor_width=18.7,
+            sensor_height=18.7,
+            image_width=3840,
+            image_height=1920,
+            is_anamorphic=True,
+            is_desqueezed=True,
+            pixel_aspect=2.0,
+            source=single_source,
+        )
+        fmt.notes = "Edited"
+        fmt.save()
+        fmt.refresh_from_db()
+
+        assert fmt.pixel_aspect == 1.0
+        assert fmt.anamorphic_squeeze == 2.0
+        assert "Anamorphic Squeeze to 2.0" in fmt.tracking_workflow
+
+
+# Every kind of format the derivations handle
+DERIVATION_CASES = [
+    # Spherical, sensor and image aspects match
+    dict(sensor_width=16.0, sensor_height=9.0, image_width=3840, image_height=2160),
+    # Spherical, the filmback height gets adjusted
+    dict(sensor_width=28.0, sensor_height=19.2, image_width=4608, image_height=3164),
+    # Raw anamorphic with and without a filmback
+    dict(is_anamorphic=True, pixel_aspect=2.0),
+    dict(
+        is_anamorphic=True,
+        pixel_aspect=1.8,
+        filmback_width_3de=30.0,
+        filmback_height_3de=18.8,
+    ),
+    # Desqueezed anamorphic, fresh and already derived
+    dict(is_anamorphic=True, is_desqueezed=True, pixel_aspect=2.0),
+    dict(
+        is_anamorphic=True,
+        is_desqueezed=True,
+        anamorphic_squeeze=1.33,
+        filmback_width_3de=18.7,
+        filmback_height_3de=9.35,
+    ),
+]
+
+
+def derivation_columns():
+    defaults = {
+        "image_format": "3.8K",
+        "image_aspect": "2:1",
+        "format_name": "",
+        "sensor_width": 18.7,
+        "sensor_height": 18.7,
+        "image_width": 3840,
+        "image_height": 1920,
+        "pixel_aspect": 1.0,
+        "is_anamorphic": False,
+        "is_desqueezed": False,
+        "anamorphic_squeeze": 1.0,
+        "filmback_width_3de": None,
+        "filmback_height_3de": None,
+        "tracking_workflow": None,
+    }
+    rows = [{**defaults, **case} for case in DERIVATION_CASES]
+
+    return {field: [row[field] for row in rows] for field in derivations.INPUT_FIELDS}
+
+
+class TestFormatDerivations:
+    """
+    Tests for the batch derivations behind Format.save
+    """
+
+    def test_numpy_matches_python(self):
+        """
+        Both versions of the derivations should give the same results
+        """
+        pytest.importorskip("numpy")
+        columns = derivation_columns()
+
+        vectorized = derivations.derive_numpy(columns)
+        plain = derivations.derive_python(columns)
+
+        for field in derivations.DERIVED_FIELDS:
+            assert vectorized[field] == pytest.approx(plain[field]), field
+
+    def test_without_numpy(self, monkeypatch):
+        """
+        The derivations should fall back to plain Python when NumPy isn't installed
+        """
+        monkeypatch.setattr(derivations, "np", None)
+        derived = derivations.derive(derivation_columns())
+
+        assert derived["distortion_model_3de"] == [
+            "Radial Standard Degree 4",
+            "Radial Standard Degree 4",
+            "Anamorphic Standard Degree 4",
+            "Anamorphic Standard Degree 4",
+            "Anamorphic Rescaled Degree 4",
+            "Anamorphic Rescaled Degree 4",
+        ]
+        assert derived["filmback_width_3de"][2] == pytest.approx(37.4)
+        assert derived["filmback_width_3de"][3] == 30.0
+        assert derived["anamorphic_squeeze"][4:] == [2.0, 1.33]
+        assert derived["pixel_aspect"][4:] == [1.0, 1.0]
+        assert derived["tracking_workflow"][0] is None
+        assert "has been adjusted" in derived["tracking_workflow"][1]
+
+    def test_empty(self):
+        """
+        Deriving nothing should give empty columns
+        """
+        columns = {field: [] for field in derivations.INPUT_FIELDS}
+
+        assert derivations.derive(columns) == {
+            field: [] for field in derivations.DERIVED_FIELDS
+        }
+
+    @pytest.mark.parametrize("numpy", [True, False])
+    def test_zero_height(self, monkeypatch, numpy):
+        """
+        Spherical formats need a height to work out their aspect
+        """
+        if numpy:
+            pytest.importorskip("numpy")
+        else:
+            monkeypatch.setattr(derivations, "np", None)
+
+        columns = derivation_columns()
+        columns["image_height"][0] = 0
+
+        with pytest.raises(ZeroDivisionError):
+            derivations.derive(columns)
+
+    @pytest.mark.django_db
+    def test_derive_formats_matches_save(self, single_camera):
+        """
+        Deriving formats in bulk should give what saving them one by one does
+        """
+        columns = derivation_columns()
+        cases = [
+            {field: columns[field][i] for field in derivations.INPUT_FIELDS}
+            for i in range(len(DERIVATION_CASES))
+        ]
+
+        saved = [
+            Format.objects.create(camera=single_camera, codec=str(i), **case)
+            for i, case in enumerate(cases)
+        ]
+        bulk = [Format(camera=single_camera, **case) for case in cases]
+        derivations.derive_formats(bulk)
+
+        for saved_format, bulk_format in zip(saved, bulk):
+            for field in derivations.DERIVED_FIELDS:
+                assert getattr(bulk_format, field) == pytest.approx(
+                    getattr(saved_format, field)
+                ), field
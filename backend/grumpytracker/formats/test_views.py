@@ -1,8 +1,11 @@
 from pprint import pprint
+import json
 import pytest
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery
 from django.test.client import encode_multipart, BOUNDARY
+from formats import services
 from formats.models import Format
 
 User = get_user_model()
@@ -75,6 +78,124 @@ class TestFormatsListView:
             }
             assert set(format_data.keys()) == expected_keys
 
+    @pytest.mark.django_db
+    def test_get_formats_paginated(self, client, multiple_formats):
+        """
+        Passing a limit should return a page of formats and a cursor for the next one
+        """
+
+        res = client.get(reverse("formats"), {"limit": 3})
+
+        assert res.status_code == 200
+        data = res.json()
+        assert set(data.keys()) == {"results", "next"}
+        assert [fmt["id"] for fmt in data["results"]] == [
+            fmt.id for fmt in multiple_formats[:3]
+        ]
+        assert data["next"] is not None
+
+        # Follow the cursor to the last page
+        res = client.get(reverse("formats"), {"limit": 3, "after": data["next"]})
+
+        assert res.status_code == 200
+        data = res.json()
+        assert [fmt["id"] for fmt in data["results"]] == [multiple_formats[3].id]
+        assert data["next"] is None
+
+    @pytest.mark.django_db
+    def test_get_formats_paginated_bad_params(self, client, multiple_formats):
+        """
+        Bad limits and cursors should return an error
+        """
+
+        res = client.get(reverse("formats"), {"limit": "abc"})
+        assert res.status_code == 400
+        assert res.json()["error"] == "limit must be a number"
+
+        res = client.get(reverse("formats"), {"limit": 0})
+        assert res.status_code == 400
+        assert res.json()["error"] == "limit must be greater than 0"
+
+        res = client.get(reverse("formats"), {"after": "not-a-cursor"})
+        assert res.status_code == 400
+        assert res.json()["error"] == "Invalid cursor"
+
+    @pytest.mark.django_db
+    def test_get_formats_max_page_size(self, client, settings, multiple_formats):
+        """
+        Unpaginated requests are capped at the max page size and get a cursor header
+        """
+        settings.API_MAX_PAGE_SIZE = 2
+
+        res = client.get(reverse("formats"))
+
+        assert res.status_code == 200
+        data = res.json()
+        assert [fmt["id"] for fmt in data] == [fmt.id for fmt in multiple_formats[:2]]
+        assert "X-Next-Cursor" in res
+
+        # The cursor from the header lets us keep going, and the limit is capped as well
+        res = client.get(
+            reverse("formats"), {"limit": 100, "after": res["X-Next-Cursor"]}
+        )
+
+        assert res.status_code == 200
+        data = res.json()
+        assert [fmt["id"] for fmt in data["results"]] == [
+            fmt.id for fmt in multiple_formats[2:]
+        ]
+        assert data["next"] is None
+
+    @pytest.mark.django_db
+    def test_get_all_formats_ndjson(self, client, settings, multiple_formats):
+        """
+        Passing format=ndjson should stream one format per line
+        """
+        # Make sure we go through more than one chunk
+        settings.API_STREAM_CHUNK_SIZE = 3
+
+        res = client.get(reverse("formats"), {"format": "ndjson"})
+
+        assert res.status_code == 200
+        assert res.streaming
+        assert res["Content-Type"] == "application/x-ndjson"
+
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        data = [json.loads(line) for line in lines]
+        assert [fmt["id"] for fmt in data] == [fmt.id for fmt in multiple_formats]
+        assert data[0]["image_format"] == "4.6K"
+
+    @pytest.mark.django_db
+    def test_get_all_formats_streamed_ignores_max_page_size(
+        self, client, settings, multiple_formats
+    ):
+        """
+        Streaming is meant for full dumps so it is not capped like the regular list
+        """
+        settings.API_MAX_PAGE_SIZE = 2
+
+        res = client.get(reverse("formats"), {"stream": "true"})
+
+        assert res.status_code == 200
+        data = json.loads(b"".join(res.streaming_content))
+        assert len(data) == 4
+
+    @pytest.mark.django_db
+    def test_get_all_formats_query_count(
+        self, client, multiple_formats, django_assert_num_queries
+    ):
+        """
+        Listing formats should take a single query no matter how many formats we have, plus
+        one for the model versions
+        """
+
+        with django_assert_num_queries(2):
+            res = client.get(reverse("formats"))
+
+        assert res.status_code == 200
+        data = res.json()
+        assert {fmt["make_name"] for fmt in data} == {"Arri", "RED"}
+
     @pytest.mark.django_db
     def test_create_format(self, admin_client, single_camera, single_source):
         """
@@ -226,6 +347,43 @@ class TestFormatDetailsView:
         assert set(data.keys()) == expected_keys
         assert data["image_format"] == "HD"
 
+    @pytest.mark.django_db
+    def test_get_format_details_cache_invalidated_by_camera(
+        self, single_format, client, django_assert_num_queries
+    ):
+        """
+        The format details include the camera model, renaming the camera should not leave
+        the old name in the cache
+        """
+        res = client.get(reverse("format", args=[single_format.id]))
+        assert res.json()["camera_model"] == "KOMODO"
+
+        # Only the model versions
+        with django_assert_num_queries(1):
+            res = client.get(reverse("format", args=[single_format.id]))
+        assert res.json()["camera_model"] == "KOMODO"
+
+        camera = single_format.camera
+        camera.model = "KOMODO-X"
+        camera.save()
+
+        res = client.get(reverse("format", args=[single_format.id]))
+        assert res.json()["camera_model"] == "KOMODO-X"
+
+    @pytest.mark.django_db
+    def test_get_format_details_cache_invalidated_by_source(self, single_format, client):
+        """
+        Deleting the source nulls the format's source without saving the format, the
+        cached details should not keep the old source
+        """
+        res = client.get(reverse("format", args=[single_format.id]))
+        assert res.json()["source"] == single_format.source_id
+
+        single_format.source.delete()
+
+        res = client.get(reverse("format", args=[single_format.id]))
+        assert res.json()["source"] is None
+
     @pytest.mark.django_db
     def test_get_format_details_not_found(self, client):
         """
@@ -349,6 +507,21 @@ class TestFormatDetailsView:
 
 
 class TestFormatsSearchView:
+    @pytest.mark.django_db
+    def test_search_formats_query_count(
+        self, client, multiple_formats, django_assert_num_queries
+    ):
+        """
+        Searching formats should take a single query no matter how many formats we find, plus
+        one for the model versions
+        """
+
+        with django_assert_num_queries(2):
+            res = client.get(reverse("search_formats", query={"source": "Sample"}))
+
+        assert res.status_code == 200
+        assert len(res.json()) == 4
+
     @pytest.mark.django_db
     def test_search_formats(self, client, multiple_formats):
         """
@@ -543,6 +716,27 @@ class TestFormatsSearchView:
         assert len(data) == 3
         assert "adjusted" in data[0]["tracking_workflow"]
 
+    def test_search_formats_full_text(self, client, multiple_formats):
+        """
+        q should search the format name, codec and notes
+        """
+        res = client.get(reverse("search_formats", query={"q": "open gate"}))
+        assert res.status_code == 200
+
+        data = res.json()
+        assert {fmt["image_format"] for fmt in data} == {"4.6K", "3K"}
+
+        # q can be combined with the other filters
+        res = client.get(
+            reverse("search_formats", query={"q": "open gate", "codec": "ProRes"})
+        )
+        assert res.status_code == 200
+
+        data = res.json()
+        assert len(data) == 1
+        assert data[0]["image_format"] == "3K"
+
+    @pytest.mark.django_db
     def test_search_formats_return_value(self, client, multiple_formats):
         """
         Formats should return a dict
@@ -641,3 +835,211 @@ class TestFormatsSearchView:
         data = res.json()
         assert "error" in data
         assert data["error"] == "No query provided"
+
+
+def bulk_format_rows(camera, source):
+    return [
+        {
+            "camera": camera.id,
+            "source": source.id,
+            "image_format": image_format,
+            "image_aspect": "16:9",
+            "sensor_width": 24.0,
+            "sensor_height": 13.5,
+            "image_width": width,
+            "image_height": height,
+            "codec": "ProRes",
+        }
+        for image_format, width, height in [
+            ("4K", 3840, 2160),
+            ("2K", 1920, 1080),
+            ("6K", 6144, 3456),
+        ]
+    ]
+
+
+@pytest.mark.django_db
+class TestFormatsBulkView:
+
+    def test_bulk_create_json(
+        self, admin_client, single_camera, single_source, django_assert_max_num_queries
+    ):
+        """
+        A JSON array of formats should be created in a handful of queries
+        """
+        rows = bulk_format_rows(single_camera, single_source)
+
+        with django_assert_max_num_queries(10):
+            res = admin_client.post(
+                reverse("bulk_formats"), rows, content_type="application/json"
+            )
+
+        assert res.status_code == 200
+        res_data = res.json()
+        assert res_data["success"] == "Created 3 formats"
+        assert [fmt["image_format"] for fmt in res_data["formats"]] == ["4K", "2K", "6K"]
+
+        fmt = Format.objects.get(id=res_data["formats"][0]["id"])
+        assert fmt.distortion_model_3de == "Radial Standard Degree 4"
+        assert fmt.format_search == "4K 16:9"
+        prores = SearchQuery("prores", config="simple")
+        assert Format.objects.filter(search_vector=prores).count() == 3
+
+    def test_bulk_create_csv(self, admin_client, single_camera, single_source):
+        """
+        CSV uploads send everything as text, values should be converted like JSON ones
+        """
+        lines = [
+            "camera,source,image_format,sensor_width,sensor_height,image_width,image_height,is_anamorphic,is_desqueezed,pixel_aspect,notes",
+            f"{single_camera.id},{single_source.id},3.8K,18.7,18.7,3840,1920,TRUE,true,2.0,",
+            f"{single_camera.id},{single_source.id},4K,16.0,9.0,3840,2160,false,false,,Spherical",
+        ]
+
+        res = admin_client.post(
+            reverse("bulk_formats"), "\n".join(lines), content_type="text/csv"
+        )
+
+        assert res.status_code == 200
+        anamorphic, spherical = Format.objects.order_by("id")
+        assert anamorphic.is_desqueezed is True
+        assert anamorphic.anamorphic_squeeze == 2.0
+        assert anamorphic.pixel_aspect == 1.0
+        assert anamorphic.distortion_model_3de == "Anamorphic Rescaled Degree 4"
+        assert spherical.is_anamorphic is False
+        assert spherical.image_width == 3840
+        assert spherical.notes == "Spherical"
+
+    def test_bulk_create_ndjson(self, admin_client, single_camera, single_source):
+        """
+        NDJSON should be read one format per line, picked with ?format=ndjson
+        """
+        rows = bulk_format_rows(single_camera, single_source)
+        body = "\n".join(json.dumps(row) for row in rows) + "\n\n"
+
+        res = admin_client.post(
+            reverse("bulk_formats", query={"format": "ndjson"}),
+            body,
+            content_type="text/plain",
+        )
+
+        assert res.status_code == 200
+        assert Format.objects.count() == 3
+
+    def test_bulk_create_errors(self, admin_client, single_format):
+        """
+        Every bad row should be reported and nothing should be saved
+        """
+        rows = bulk_format_rows(single_format.camera, single_format.source)
+        rows[0]["camera"] = 999999
+        rows[1]["sensor_width"] = "wide"
+        del rows[2]["image_width"]
+        rows.append({**rows[1], "sensor_width": 24.0, "colour": "red"})
+        rows.append({**rows[1], "sensor_width": 24.0, "image_format": "5K"})
+        rows.append({**rows[1], "sensor_width": 24.0, "image_format": "5K"})
+        existing = {
+            "camera": single_format.camera.id,
+            "source": single_format.source.id,
+            "image_format": single_format.image_format,
+            "image_aspect": single_format.image_aspect,
+            "format_name": single_format.format_name,
+            "sensor_width": single_format.sensor_width,
+            "sensor_height": single_format.sensor_height,
+            "image_width": single_format.image_width,
+            "image_height": single_format.image_height,
+            "codec": single_format.codec,
+        }
+        rows.append(existing)
+
+        res = admin_client.post(
+            reverse("bulk_formats"), rows, content_type="application/json"
+        )
+
+        assert res.status_code == 400
+        errors = {error["row"]: error["error"] for error in res.json()["errors"]}
+        assert errors[1] == "Camera 999999 not found"
+        assert errors[2].startswith("sensor_width:")
+        assert errors[3] == "image_width is required"
+        assert errors[4] == "Unknown fields colour"
+        assert 5 not in errors
+        assert errors[6] == "Same format as row 5"
+        assert errors[7].endswith("already exists")
+        assert Format.objects.count() == 1
+
+    def test_bulk_create_race(
+        self, admin_client, single_camera, single_source, monkeypatch
+    ):
+        """
+        A format another import creates after our checks should be reported on its row
+        instead of failing the request
+        """
+        rows = bulk_format_rows(single_camera, single_source)
+        check_formats = services.check_formats
+
+        def racing_check(rows):
+            formats, errors = check_formats(rows)
+            if not Format.objects.exists():
+                # The other import commits the first format between our check and insert
+                check_formats(rows[:1])[0][0].save()
+            return formats, errors
+
+        monkeypatch.setattr(services, "check_formats", racing_check)
+        res = admin_client.post(
+            reverse("bulk_formats"), rows, content_type="application/json"
+        )
+
+        assert res.status_code == 400
+        errors = {error["row"]: error["error"] for error in res.json()["errors"]}
+        assert list(errors) == [1]
+        assert errors[1].endswith("already exists")
+        assert Format.objects.count() == 1
+
+    def test_bulk_create_dry_run(self, admin_client, single_camera, single_source):
+        """
+        A dry run should validate and derive the formats without saving them
+        """
+        rows = bulk_format_rows(single_camera, single_source)
+
+        res = admin_client.post(
+            reverse("bulk_formats", query={"dry_run": "true"}),
+            rows,
+            content_type="application/json",
+        )
+
+        assert res.status_code == 200
+        res_data = res.json()
+        assert res_data["dry_run"] is True
+        assert res_data["formats"][0]["id"] is None
+        assert res_data["formats"][0]["filmback_width_3de"] == 24.0
+        assert not Format.objects.exists()
+
+    def test_bulk_create_invalid_body(self, admin_client):
+        """
+        Bodies we can't read should be rejected
+        """
+        res = admin_client.post(
+            reverse("bulk_formats"), {"camera": 1}, content_type="application/json"
+        )
+        assert res.status_code == 400
+        assert res.json()["error"] == "Expected a list of records"
+
+        res = admin_client.post(
+            reverse("bulk_formats", query={"format": "xml"}),
+            "<formats/>",
+            content_type="application/xml",
+        )
+        assert res.status_code == 400
+        assert res.json()["error"] == "Unknown format xml"
+
+    def test_bulk_create_not_admin(
+        self, regular_user, client, single_camera, single_source
+    ):
+        """
+        Regular users are not allowed to import formats
+        """
+        client.force_login(regular_user)
+        rows = bulk_format_rows(single_camera, single_source)
+
+        res = client.post(reverse("bulk_formats"), rows, content_type="application/json")
+
+        assert res.status_code == 403
+        assert not Format.objects.exists()
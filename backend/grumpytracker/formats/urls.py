@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path("", views.FormatsListView.as_view(), name="formats"),
+    path("bulk", views.FormatsBulkView.as_view(), name="bulk_formats"),
     path("<int:format_id>", views.FormatDetailsView.as_view(), name="format"),
     path("search", views.FormatsSearchView.as_view(), name="search_formats"),
 ]
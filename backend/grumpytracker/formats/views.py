@@ -1,16 +1,27 @@
+from django.db.models import Q
 from django.http import JsonResponse
 from django.views import View
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import get_object_or_404
 from grumpytracker.utils import validate_required_fields, require_admin
+from grumpytracker.pagination import paginate
+from grumpytracker.cache import cache_response, conditional_response
+from grumpytracker.streaming import stream_response, wants_stream
+from grumpytracker.search import rank_search
+from grumpytracker.imports import parse_rows, wants_dry_run
 import json
 from loguru import logger
 
 from .models import Format
+from .services import import_formats
 from sources.models import Source
 from cameras.models import Camera
 
+# Deleting a source sets the formats' source to null without saving them, so the
+# responses depend on the sources as well
+DEPENDS_ON = ("formats.Format", "cameras.Camera", "makes.Make", "sources.Source")
+
 
 @method_decorator(csrf_exempt, name="dispatch")
 class FormatsListView(View):
@@ -20,18 +31,20 @@ class FormatsListView(View):
     POST - Creates a new format
     """
 
+    @method_decorator(conditional_response(*DEPENDS_ON))
+    @method_decorator(cache_response(*DEPENDS_ON))
     def get(self, request) -> JsonResponse:
         """
-        Return all existing formats
+        Return all existing formats, pass limit and after to page through them.
+        Pass stream=true or format=ndjson to stream the full list instead
         """
 
-        formats = Format.objects.all()
-        data = []
+        formats = Format.objects.for_serialization()
 
-        for fmt in formats:
-            data.append(fmt.as_dict())
+        if wants_stream(request):
+            return stream_response(request, formats)
 
-        return JsonResponse(data, safe=False)
+        return paginate(request, formats)
 
     @method_decorator(require_admin)
     def post(self, request) -> JsonResponse:
@@ -95,6 +108,53 @@ class FormatsListView(View):
             return JsonResponse({"error": str(e)}, status=400)
 
 
+@method_decorator(csrf_exempt, name="dispatch")
+class FormatsBulkView(View):
+    """
+    Handle formats/bulk endpoint
+    POST - Creates many formats at once
+    """
+
+    @method_decorator(require_admin)
+    def post(self, request) -> JsonResponse:
+        """
+        Create formats from a JSON array, a CSV file (text/csv or ?format=csv) or NDJSON
+        (application/x-ndjson or ?format=ndjson). Every row is validated first and if any of
+        them fails nothing is saved. Pass dry_run=true to only validate
+        """
+        try:
+            rows = parse_rows(request)
+        except (UnicodeDecodeError, ValueError) as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        dry_run = wants_dry_run(request)
+        formats, errors = import_formats(rows, dry_run=dry_run)
+        if errors:
+            return JsonResponse(
+                {
+                    "error": f"{len(errors)} of {len(rows)} formats have errors",
+                    "errors": errors,
+                },
+                status=400,
+            )
+
+        if dry_run:
+            return JsonResponse(
+                {
+                    "success": f"All {len(formats)} formats are valid",
+                    "dry_run": True,
+                    "formats": [fmt.as_dict() for fmt in formats],
+                }
+            )
+
+        return JsonResponse(
+            {
+                "success": f"Created {len(formats)} formats",
+                "formats": [fmt.as_dict() for fmt in formats],
+            }
+        )
+
+
 @method_decorator(csrf_exempt, name="dispatch")
 class FormatDetailsView(View):
     """
@@ -104,12 +164,14 @@ class FormatDetailsView(View):
     DELETE - Delete a format
     """
 
+    @method_decorator(conditional_response(*DEPENDS_ON))
+    @method_decorator(cache_response(*DEPENDS_ON))
     def get(self, request, format_id: int) -> JsonResponse:
         """
         Get a format by its interanl ID
         :param format_id: ID of format in the database
         """
-        fmt = get_object_or_404(Format, id=format_id)
+        fmt = get_object_or_404(Format.objects.for_serialization(), id=format_id)
         return JsonResponse(fmt.as_dict(), safe=False)
 
     @method_decorator(require_admin)
@@ -186,10 +248,16 @@ class FormatsSearchView(View):
     GET - Returns the a list of formats based on a search query
     """
 
+    @method_decorator(conditional_response(*DEPENDS_ON))
+    @method_decorator(cache_response(*DEPENDS_ON))
     def get(self, request) -> JsonResponse:
         """
-        Search the database for a format based on model and sensor type
+        Search the database for a format based on model and sensor type.
+        q runs a full text search over the format's name, codec and notes and orders the
+        results by relevance
         """
+        query = request.GET.get("q", "").strip()
+
         filter_map = {
             "make": "camera__make__name__icontains",
             "camera": "camera__model__icontains",
@@ -217,7 +285,7 @@ class FormatsSearchView(View):
         }
 
         # Check if any valid search terms are provided
-        valid_terms_found = False
+        valid_terms_found = bool(query)
         for param in filter_map.keys():
             term = request.GET.get(param)
             if term and term.strip():  # Check for non-empty, non-whitespace terms
@@ -247,13 +315,17 @@ class FormatsSearchView(View):
 
         logger.info(filters)
 
-        # Start building the query by getting all cameras with JOIN on makes
-        formats = Format.objects.select_related("camera", "source")
+        # Start building the query by getting all formats with JOIN on cameras and makes
+        formats = Format.objects.for_serialization()
 
         # Build the WHERE clause for each term
         if filters:
             formats = formats.filter(**filters)
 
+        if query:
+            # Format names are codes like 4.6K 3:2, fuzzy matching them just adds noise
+            formats = rank_search(formats, query, Q(format_search__icontains=query))
+
         # Execute the query
         found_formats = [fmt.as_dict() for fmt in formats]
 
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import connections
+from loguru import logger
+
+# Quick work we don't want the caller to wait for (TMDB refreshes). Slow work that has to
+# survive a restart goes to the job queue instead
+_pool = ThreadPoolExecutor(
+    max_workers=settings.BACKGROUND_THREADS, thread_name_prefix="background"
+)
+
+
+def run_in_background(func: Callable[..., Any], *args: Any) -> None:
+    """
+    Run a function on the background thread pool. Work is lost if the process stops, so only
+    use it for things that can be retried
+    """
+
+    def run():
+        try:
+            func(*args)
+        except Exception as e:
+            logger.exception(f"Background task {func.__name__} failed: {e}")
+        finally:
+            # The thread opened its own database connection, don't leave it behind
+            connections.close_all()
+
+    _pool.submit(run)
@@ -0,0 +1,165 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Callable, List, Sequence
+
+from django.core.cache import caches
+from django.db.models import Model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from versions.models import TableVersion
+
+# Name of the entry in settings.CACHES we keep the catalogue responses in
+RESPONSE_CACHE = "catalogue"
+
+# Labels of the models whose changes bump their version, track_changes adds them
+TRACKED_LABELS: List[str] = []
+
+
+def get_cache():
+    return caches[RESPONSE_CACHE]
+
+
+def get_versions(labels: Sequence[str]) -> List[TableVersion]:
+    """
+    Get the current version of every model a response depends on, with the time the
+    model last changed for Last-Modified. They come from the database so every worker
+    gives a resource the same ETag
+    """
+    versions = TableVersion.objects.current(labels)
+    return [versions[label] for label in labels]
+
+
+def get_request_versions(request, labels: Sequence[str]) -> List[TableVersion]:
+    """
+    Same as get_versions but only queries once per request, the ETag, Last-Modified and
+    the response cache all need the versions
+    """
+    if not hasattr(request, "_model_versions"):
+        request._model_versions = {}
+
+    labels = tuple(labels)
+    if labels not in request._model_versions:
+        request._model_versions[labels] = get_versions(labels)
+
+    return request._model_versions[labels]
+
+
+def bump_label(label: str) -> None:
+    """
+    Move a model's version forward, this invalidates every cached response and ETag
+    that depends on it
+    """
+    TableVersion.objects.bump(label)
+
+
+def bump_version(sender, **kwargs) -> None:
+    """
+    Signal handler for post_save and post_delete
+    """
+    bump_label(sender._meta.label)
+
+
+def track_changes(model: type[Model]) -> None:
+    """
+    Invalidate the cached responses every time a record of this model is saved or deleted.
+    Called from the apps' ready() so it is connected no matter who makes the change
+    """
+    label = model._meta.label
+    if label not in TRACKED_LABELS:
+        TRACKED_LABELS.append(label)
+
+    uid = f"response_cache:{label}"
+    post_save.connect(bump_version, sender=model, dispatch_uid=uid)
+    post_delete.connect(bump_version, sender=model, dispatch_uid=uid)
+
+    # Adding to a plain many to many field (project.cameras.add()) only sends m2m_changed
+    def bump_relation(sender, action: str, **kwargs) -> None:
+        if action.startswith("post_"):
+            bump_label(label)
+
+    for field in model._meta.many_to_many:
+        if field.remote_field.through._meta.auto_created:
+            m2m_changed.connect(
+                bump_relation,
+                sender=field.remote_field.through,
+                weak=False,
+                dispatch_uid=f"{uid}:{field.name}",
+            )
+
+
+def cache_response(*depends_on: str) -> Callable:
+    """
+    Cache a view's successful GET responses, the key is the full URL with the query string
+    and the versions of the models the response is built from
+    :param depends_on: Labels of the models the response uses (makes.Make)
+    """
+
+    def decorator(view_func: Callable) -> Callable:
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view_func(request, *args, **kwargs)
+
+            # Hash the path so long search queries don't go over memcached/redis key limits
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            versions = ":".join(
+                str(version.version)
+                for version in get_request_versions(request, depends_on)
+            )
+            key = f"response:{versions}:{path}"
+
+            cache = get_cache()
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            # Streams are meant for full dumps, we don't want them in memory
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, response)
+
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def conditional_response(*depends_on: str, per_user: bool = False) -> Callable:
+    """
+    Add a strong ETag and Last-Modified to a view's GET responses based on the versions of the
+    models it is built from. Clients that send a matching If-None-Match (or If-Modified-Since)
+    get a 304 before the view runs, only the versions are queried and nothing is serialized
+    :param depends_on: Labels of the models the response uses (makes.Make)
+    :param per_user: The response changes with the logged in user (their votes)
+    """
+
+    def etag(request, *args, **kwargs) -> str:
+        versions = [v.version for v in get_request_versions(request, depends_on)]
+        user = request.user.id if per_user else None
+        tag = f"{request.get_full_path()}:{versions}:{user}"
+        return hashlib.md5(tag.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs) -> datetime:
+        return max(v.changed_at for v in get_request_versions(request, depends_on))
+
+    def decorator(view_func: Callable) -> Callable:
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(
+            view_func
+        )
+        if not per_user:
+            return conditional_view
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Shared caches should not give one user's votes to someone else
+            patch_vary_headers(response, ["Authorization"])
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,173 @@
+import os
+import re
+import tempfile
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models.fields.files import FieldFile
+from django.utils._os import safe_join
+from loguru import logger
+from PIL import Image, ImageOps, features
+
+# Resized copies of images live under this directory of the media root
+VARIANTS_DIR = "variants"
+
+# variants/camera_images/<sha256>.png.480w.webp
+VARIANT_NAME = re.compile(
+    r"^%s/(?P<original>.+\.[^./]+)\.(?P<width>\d+)w\.(?P<format>[a-z]+)$" % VARIANTS_DIR
+)
+
+# Pillow's name for the formats we can write
+PILLOW_FORMATS = {"webp": "WEBP", "avif": "AVIF"}
+
+# Originals we can resize, Pillow can't read vector logos like SVGs
+RASTER_EXTENSIONS = {".bmp", ".gif", ".jpeg", ".jpg", ".png", ".tif", ".tiff", ".webp"}
+
+
+@lru_cache
+def can_write(fmt: str) -> bool:
+    return fmt in PILLOW_FORMATS and features.check(fmt)
+
+
+def variant_formats() -> List[str]:
+    """
+    The configured formats this Pillow build can write, AVIF needs Pillow built with libavif
+    """
+    return [fmt for fmt in settings.IMAGE_VARIANT_FORMATS if can_write(fmt)]
+
+
+def is_raster(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in RASTER_EXTENSIONS
+
+
+def variant_name(name: str, width: int, fmt: str) -> str:
+    return f"{VARIANTS_DIR}/{name}.{width}w.{fmt}"
+
+
+def image_variants(image: FieldFile) -> Optional[Dict[str, Any]]:
+    """
+    The URLs of an image's resized copies for as_dict, by format and then by width so they
+    drop straight into a srcset. The copies are made the first time they are requested
+    :returns: The variants and the smallest one as a thumbnail, None without an image or
+        for one we can't resize
+    """
+    if not image or not is_raster(image.name):
+        return None
+
+    formats = variant_formats()
+    widths = sorted(settings.IMAGE_VARIANT_WIDTHS)
+    if not formats or not widths:
+        return None
+
+    variants = {
+        fmt: {
+            f"{width}w": image.storage.url(variant_name(image.name, width, fmt))
+            for width in widths
+        }
+        for fmt in formats
+    }
+
+    return {"thumbnail": variants[formats[0]][f"{widths[0]}w"], **variants}
+
+
+def make_variant(
+    media_root: str, original: str, width: int, fmt: str, quality: int
+) -> str:
+    """
+    Resize an image and save it in another format, images smaller than the width keep
+    their size. This only touches the disk so it can run in another process
+    :returns: The variant's name
+    """
+    name = variant_name(original, width, fmt)
+    path = os.path.join(media_root, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with Image.open(os.path.join(media_root, original)) as image:
+        # Phones store the rotation in EXIF, resized copies lose it so apply it first
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        image.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+
+        # Write next to the variant and swap it in, requests can make the same variant
+        # at the same time
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), suffix=".tmp", delete=False
+        ) as temporary:
+            image.save(temporary, PILLOW_FORMATS[fmt], quality=quality)
+        os.replace(temporary.name, path)
+
+    return name
+
+
+def make_variants(
+    media_root: str,
+    original: str,
+    widths: Sequence[int],
+    formats: Sequence[str],
+    quality: int,
+    force: bool = False,
+) -> int:
+    """
+    Make every variant of an image that is missing, or all of them with force
+    :returns: The number of variants we made
+    """
+    made = 0
+    for width in widths:
+        for fmt in formats:
+            name = variant_name(original, width, fmt)
+            if not force and os.path.exists(os.path.join(media_root, name)):
+                continue
+            make_variant(media_root, original, width, fmt, quality)
+            made += 1
+
+    return made
+
+
+def create_requested_variant(path: str) -> bool:
+    """
+    Make the variant a media request asked for if it is one we offer and its original
+    exists, anything else is a 404 so nobody can make us resize to arbitrary sizes
+    :returns: True if the variant exists now
+    """
+    match = VARIANT_NAME.match(path)
+    if match is None:
+        return False
+
+    width, fmt = int(match["width"]), match["format"]
+    original = match["original"]
+    if width not in settings.IMAGE_VARIANT_WIDTHS or fmt not in variant_formats():
+        return False
+    if not is_raster(original):
+        return False
+    try:
+        if not os.path.isfile(safe_join(settings.MEDIA_ROOT, original)):
+            return False
+    except SuspiciousFileOperation:
+        return False
+
+    try:
+        make_variant(
+            settings.MEDIA_ROOT, original, width, fmt, settings.IMAGE_VARIANT_QUALITY
+        )
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning(f"Could not make {path}: {e}")
+        return False
+
+    return True
+
+
+def delete_variants(media_root: str, name: str) -> None:
+    """
+    Remove the variants of an image we are deleting, whatever sizes they were made in
+    """
+    directory = os.path.join(media_root, VARIANTS_DIR, os.path.dirname(name))
+    if not os.path.isdir(directory):
+        return
+
+    variant = re.compile(r"^%s\.\d+w\.[a-z]+$" % re.escape(os.path.basename(name)))
+    for filename in os.listdir(directory):
+        if variant.match(filename):
+            os.remove(os.path.join(directory, filename))
@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models
+
+IMPORT_FORMATS = ("json", "csv", "ndjson")
+
+CONTENT_TYPES = {
+    "application/json": "json",
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+}
+
+TRUE_VALUES = {"true", "t", "yes", "y", "1"}
+FALSE_VALUES = {"false", "f", "no", "n", "0"}
+
+
+def import_format(request, filename: Optional[str] = None) -> str:
+    """
+    Work out how the uploaded rows are encoded, ?format= wins over the file's extension
+    and the content type. We default to a JSON array
+    :param filename: Name of the uploaded file the rows are in, if they are in one
+    """
+    requested = request.GET.get("format", "").lower()
+    if requested:
+        if requested not in IMPORT_FORMATS:
+            raise ValueError(f"Unknown format {requested}")
+        return requested
+
+    extension = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    if extension in IMPORT_FORMATS:
+        return extension
+
+    return CONTENT_TYPES.get(request.content_type, "json")
+
+
+def parse_rows(request) -> List[Dict[str, Any]]:
+    """
+    Read the rows of a bulk import sent as the request's body
+    :raises ValueError: When the body can't be parsed or has too many rows
+    """
+    return read_rows(request.body.decode("utf-8-sig"), import_format(request))
+
+
+def read_rows(text: str, encoding: str) -> List[Dict[str, Any]]:
+    """
+    Read the rows of a bulk import, a JSON array of objects, a CSV file with a header or
+    NDJSON (one object per line). Empty CSV cells are left out of their row so the model
+    defaults apply
+    :param encoding: One of IMPORT_FORMATS
+    :raises ValueError: When the text can't be parsed or has too many rows
+    """
+    if encoding == "csv":
+        rows = [
+            {field: value for field, value in row.items() if field and value != ""}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    elif encoding == "ndjson":
+        rows = []
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_number}: {e}")
+    else:
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if not isinstance(rows, list):
+            raise ValueError("Expected a list of records")
+
+    if not rows:
+        raise ValueError("No records provided")
+    if len(rows) > settings.API_IMPORT_MAX_ROWS:
+        raise ValueError(
+            f"Too many records, send at most {settings.API_IMPORT_MAX_ROWS} at a time"
+        )
+    if not all(isinstance(row, dict) for row in rows):
+        raise ValueError("Every record has to be an object")
+
+    return rows
+
+
+def wants_dry_run(request) -> bool:
+    return request.GET.get("dry_run", "").lower() == "true"
+
+
+def wants_background(request) -> bool:
+    return request.GET.get("background", "").lower() == "true"
+
+
+def keep_upload(upload) -> str:
+    """
+    Copy an uploaded file to JOB_UPLOADS_DIR so a background job can read it after the
+    request is gone, the job deletes it
+    :returns: The path of the copy
+    """
+    os.makedirs(settings.JOB_UPLOADS_DIR, exist_ok=True)
+    extension = os.path.splitext(upload.name or "")[1].lower()
+    path = os.path.join(settings.JOB_UPLOADS_DIR, f"{uuid.uuid4().hex}{extension}")
+
+    upload.seek(0)
+    with open(path, "wb") as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+
+    return path
+
+
+def validation_error(e: ValidationError) -> str:
+    """
+    Flatten a model validation error into a single line for the row's error report
+    """
+    if hasattr(e, "error_dict"):
+        return "; ".join(
+            f"{field}: {' '.join(messages)}"
+            for field, messages in e.message_dict.items()
+        )
+
+    return " ".join(e.messages)
+
+
+def normalize_values(model: type[models.Model], values: Dict[str, Any]) -> None:
+    """
+    Fix up values the model fields would reject for how they are spelled rather than what
+    they are. Django only takes True/False spelled its own way while spreadsheets write
+    true, TRUE, yes... and it turns JSON floats into decimals with every digit of the
+    float. Values we don't recognize are left for the model validation to report
+    """
+    for field in model._meta.concrete_fields:
+        value = values.get(field.name)
+        if isinstance(field, models.DecimalField) and isinstance(value, float):
+            values[field.name] = str(value)
+        elif isinstance(field, models.BooleanField) and isinstance(value, str):
+            if value.strip().lower() in TRUE_VALUES:
+                values[field.name] = True
+            elif value.strip().lower() in FALSE_VALUES:
+                values[field.name] = False
@@ -0,0 +1,230 @@
+import mimetypes
+import os
+import re
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+from .images import create_requested_variant
+from .storage import is_hashed
+
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Bytes read at a time when we send part of a file ourselves
+CHUNK_SIZE = 64 * 1024
+
+
+def cache_headers(path: str, stat: os.stat_result) -> Dict[str, str]:
+    """
+    Validators and caching rules for a media file, content hashed names never change so
+    they are cached for good while other names have to be revalidated once in a while
+    """
+    if is_hashed(path):
+        cache_control = f"public, max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        cache_control = f"public, max-age={settings.MEDIA_MAX_AGE}"
+
+    return {
+        "ETag": f'"{stat.st_size:x}-{int(stat.st_mtime):x}"',
+        "Last-Modified": http_date(stat.st_mtime),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+
+
+def gzip_etag(etag: str) -> str:
+    """
+    The gzipped copy of a file is a different set of bytes and needs its own ETag
+    """
+    return f'{etag[:-1]}-gz"'
+
+
+def accepts_gzip(request) -> bool:
+    """
+    Check Accept-Encoding takes gzip, gzip;q=0 turns it down and * stands for every
+    coding the header doesn't name
+    """
+    qualities = {}
+    for coding in request.headers.get("Accept-Encoding", "").split(","):
+        name, _, params = coding.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    quality = qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0)))
+    return quality > 0
+
+
+def not_modified(request, etag: str, mtime: float) -> bool:
+    """
+    Check the request's validators, If-None-Match wins over If-Modified-Since
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        etags = parse_etags(if_none_match)
+        return "*" in etags or etag in etags or gzip_etag(etag) in etags
+
+    if_modified_since = request.headers.get("If-Modified-Since")
+    return if_modified_since is not None and not was_modified_since(
+        if_modified_since, mtime
+    )
+
+
+def requested_range(request, etag: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    The single byte range the client asked for, we send the whole file for anything else
+    :returns: The first and last byte, None for the whole file
+    :raises ValueError: When the range is outside the file
+    """
+    match = RANGE.match(request.headers.get("Range", "").strip())
+    if not match or not any(match.groups()):
+        return None
+
+    # The client's copy is out of date, it needs the whole file
+    if_range = request.headers.get("If-Range")
+    if if_range is not None and if_range != etag:
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # bytes=-500 is the last 500 bytes
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        first, last = int(first), min(int(last) if last else size - 1, size - 1)
+
+    if first > last or first >= size:
+        raise ValueError(f"Range outside of {size} bytes")
+
+    return first, last
+
+
+def file_range(path: str, first: int, last: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def offload(path: str, full_path: str, content_type: str) -> HttpResponse:
+    """
+    Let the web server in front of us send the file. nginx wants a URI of an internal
+    location (X-Accel-Redirect), Apache and friends want the file's path (X-Sendfile)
+    """
+    header = settings.MEDIA_OFFLOAD_HEADER
+    response = HttpResponse(content_type=content_type)
+    if header.lower() == "x-accel-redirect":
+        response[header] = f"{settings.MEDIA_OFFLOAD_PREFIX}{quote(path)}"
+    else:
+        response[header] = full_path
+
+    return response
+
+
+def send_file(
+    request,
+    full_path: str,
+    stat: os.stat_result,
+    headers: Dict[str, str],
+    content_type: str,
+) -> HttpResponse:
+    """
+    Send the file from this process. FileResponse lets the WSGI server use sendfile, parts
+    of files are streamed and text files use their gzipped copy when the client takes it
+    """
+    try:
+        byte_range = requested_range(request, headers["ETag"], stat.st_size)
+    except ValueError:
+        response = HttpResponse(status=416, content_type=content_type)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+        return response
+
+    if byte_range is not None:
+        first, last = byte_range
+        response = StreamingHttpResponse(
+            file_range(full_path, first, last), status=206, content_type=content_type
+        )
+        response["Content-Range"] = f"bytes {first}-{last}/{stat.st_size}"
+        response["Content-Length"] = str(last - first + 1)
+        return response
+
+    compressed = f"{full_path}.gz"
+    if os.path.exists(compressed):
+        if accepts_gzip(request):
+            response = FileResponse(open(compressed, "rb"), content_type=content_type)
+            response["Content-Encoding"] = "gzip"
+            response["ETag"] = gzip_etag(headers["ETag"])
+        else:
+            response = FileResponse(open(full_path, "rb"), content_type=content_type)
+        response["Vary"] = "Accept-Encoding"
+        return response
+
+    return FileResponse(open(full_path, "rb"), content_type=content_type)
+
+
+@require_safe
+def serve_media(request, path: str):
+    """
+    Serve an uploaded file. Files are sent with caching headers and answer conditional and
+    range requests, the web server sends them when MEDIA_OFFLOAD_HEADER is set and we
+    stream them ourselves otherwise
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404(f"{path} not found")
+
+    if not os.path.exists(full_path):
+        # Image variants are made the first time they are asked for and kept on disk
+        create_requested_variant(path)
+
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404(f"{path} not found")
+
+    if not os.path.isfile(full_path):
+        raise Http404(f"{path} not found")
+
+    headers = cache_headers(path, stat)
+    if not_modified(request, headers["ETag"], stat.st_mtime):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+    if settings.MEDIA_OFFLOAD_HEADER:
+        response = offload(path, full_path, content_type)
+    else:
+        response = send_file(request, full_path, stat, headers, content_type)
+
+    for header, value in headers.items():
+        response.setdefault(header, value)
+
+    return response
+
@@ -1,7 +1,83 @@
+import copy
 import jwt
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from users.models import User
-from typing import Any
+from typing import Any, Optional
+
+
+class UserCache:
+    """
+    Small thread safe LRU cache of users by id. Saving or deleting a user drops them from
+    the cache of the worker that made the change, the other workers have one cache each
+    and serve the old user for at most ttl seconds
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._users = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, user_id: int) -> Optional[User]:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+
+            user, expires = entry
+            if expires < monotonic():
+                del self._users[user_id]
+                return None
+
+            self._users.move_to_end(user_id)
+
+        # Every request gets its own copy so changes to request.user don't leak to other requests
+        return copy.copy(user)
+
+    def set(self, user: User) -> None:
+        with self._lock:
+            self._users[user.id] = (copy.copy(user), monotonic() + self.ttl)
+            self._users.move_to_end(user.id)
+            while len(self._users) > self.max_size:
+                # Drop the least recently used user
+                self._users.popitem(last=False)
+
+    def delete(self, user_id: int) -> None:
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache(settings.JWT_USER_CACHE_SIZE, settings.JWT_USER_CACHE_TTL)
+
+
+def forget_user(sender, instance: User, **kwargs) -> None:
+    """
+    Signal handler, drop a user from the cache when they are updated or deleted
+    """
+    user_cache.delete(instance.id)
+
+
+def get_user(user_id: int) -> Optional[User]:
+    """
+    Get a user from the cache or from the database if we don't have it
+    :returns: The user or None if it does not exist or was deactivated
+    """
+    user = user_cache.get(user_id)
+    if user is None:
+        user = User.objects.filter(id=user_id, is_active=True).first()
+        if user is None:
+            return None
+        user_cache.set(user)
+
+    return user
 
 
 class JWTAuthMiddleware:
@@ -21,17 +97,20 @@ class JWTAuthMiddleware:
 
             try:
                 payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
-                user = User.objects.get(id=payload.get("user_id"))
+                user_id = payload.get("user_id")
+                # If the user is gone we keep whoever the session middleware found
+                session_user = request.user
 
-                # Set the user as the current user
-                request.user = user
+                # Set the user as the current user, we only look them up if the
+                # view actually uses request.user
+                request.user = SimpleLazyObject(
+                    lambda: get_user(user_id) or session_user
+                )
             except jwt.ExpiredSignatureError:
                 # The token expired
                 pass
             except jwt.InvalidTokenError:
                 pass
-            except User.DoesNotExist:
-                pass
 
         response = self.get_response(request)
 
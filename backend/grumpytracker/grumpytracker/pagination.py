@@ -0,0 +1,114 @@
+import base64
+import binascii
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Model, QuerySet
+from django.http import JsonResponse
+
+# Name of the header we use to tell unpaginated callers their list was cut short
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    """
+    Turn the id of the last record on a page into an opaque cursor
+    """
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[int]:
+    """
+    Turn a cursor back into the id we should continue after
+    :returns: The id or None if the cursor is not valid
+    """
+    try:
+        # Add back the padding we stripped when encoding
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, last_id = base64.urlsafe_b64decode(padded).decode().partition(":")
+        if prefix != "id":
+            return None
+        return int(last_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def parse_page_params(request) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+    """
+    Read the limit and after query params
+    :returns: limit, after id and an error message if something is wrong
+    """
+    max_size = settings.API_MAX_PAGE_SIZE
+
+    limit = request.GET.get("limit")
+    if limit:
+        try:
+            limit = int(limit)
+        except ValueError:
+            return None, None, "limit must be a number"
+        if limit < 1:
+            return None, None, "limit must be greater than 0"
+        # Never go over our hard limit
+        limit = min(limit, max_size)
+    else:
+        limit = settings.API_DEFAULT_PAGE_SIZE
+
+    after = None
+    cursor = request.GET.get("after")
+    if cursor:
+        after = decode_cursor(cursor)
+        if after is None:
+            return None, None, "Invalid cursor"
+
+    return limit, after, None
+
+
+def get_page(queryset: QuerySet, limit: int, after: Optional[int] = None):
+    """
+    Grab a single page of records ordered by id, starting after the given id
+    :returns: List of records and the cursor for the next page (None if this is the last page)
+    """
+    queryset = queryset.order_by("id")
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+
+    # We grab one extra record so we know if there is another page
+    records = list(queryset[: limit + 1])
+    if len(records) > limit:
+        records = records[:limit]
+        return records, encode_cursor(records[-1].id)
+
+    return records, None
+
+
+def paginate(
+    request,
+    queryset: QuerySet,
+    serialize: Callable[[Model], Dict[str, Any]] = lambda obj: obj.as_dict(),
+) -> JsonResponse:
+    """
+    Return a list endpoint's records. Passing limit or after switches to cursor pagination and
+    returns the results with a cursor for the next page. Without them we keep returning a
+    plain list, but never more than API_MAX_PAGE_SIZE records
+    :param queryset: The records we want to return
+    :param serialize: Function that turns a record into a dictionary
+    """
+    if "limit" in request.GET or "after" in request.GET:
+        limit, after, error = parse_page_params(request)
+        if error:
+            return JsonResponse({"error": error}, status=400)
+
+        records, next_cursor = get_page(queryset, limit, after)
+
+        return JsonResponse(
+            {"results": [serialize(obj) for obj in records], "next": next_cursor}
+        )
+
+    # This is an unpaginated request, we keep the old response shape
+    records, next_cursor = get_page(queryset, settings.API_MAX_PAGE_SIZE)
+    response = JsonResponse([serialize(obj) for obj in records], safe=False)
+    if next_cursor:
+        # The list was cut short, let the caller know where to continue from
+        response[NEXT_CURSOR_HEADER] = next_cursor
+
+    return response
@@ -0,0 +1,74 @@
+from functools import reduce
+from operator import add
+from typing import Optional, Tuple
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db.models import F, FloatField, Q, QuerySet, Value
+from django.db.models.functions import Coalesce
+
+# Camera models and format names are not english words, so we don't want them stemmed
+SEARCH_CONFIG = "simple"
+
+# pg_trgm's default threshold (0.3) is too loose for short model names, it would match
+# "Alexa 35" with "Alexa Mini LF". We still use the operator so the trigram index is used
+# and then keep only the closer matches
+FUZZY_MATCH_THRESHOLD = 0.5
+
+
+def search_document(*parts: Tuple[Optional[str], str]) -> Optional[SearchVector]:
+    """
+    Build a weighted search vector from (text, weight) pairs. The text is passed in as a value so
+    the vector can be saved along with the rest of the record
+    :returns: The combined search vector or None if none of the parts have text
+    """
+    vectors = [
+        SearchVector(Value(text), weight=weight, config=SEARCH_CONFIG)
+        for text, weight in parts
+        if text
+    ]
+
+    return reduce(add, vectors) if vectors else None
+
+
+def search_query(query: str) -> SearchQuery:
+    """
+    Turn the user's query into a full text query, websearch lets users quote phrases and
+    exclude words like they would on a search engine
+    """
+    return SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+
+
+def rank_search(
+    queryset: QuerySet, query: str, match: Q, fuzzy_field: Optional[str] = None
+) -> QuerySet:
+    """
+    Filter a queryset that has a search_vector field and order the results by relevance.
+    A record is returned if it passes the view's own filters, matches the full text query or
+    its fuzzy_field is close to the query (to deal with typos in model names)
+    :param queryset: Records to search, the model needs a search_vector field
+    :param query: The user's query
+    :param match: The view's regular filters
+    :param fuzzy_field: The field we compare to the query with trigram similarity, skip it when
+    the records have names that are too close to each other (Source-A, Source-B)
+    """
+    text_query = search_query(query)
+    rank = Coalesce(
+        SearchRank(F("search_vector"), text_query),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+    found = match | Q(search_vector=text_query)
+
+    if fuzzy_field:
+        queryset = queryset.annotate(similarity=TrigramSimilarity(fuzzy_field, query))
+        rank = rank + F("similarity")
+        found |= Q(**{f"{fuzzy_field}__trigram_similar": query}) & Q(
+            similarity__gte=FUZZY_MATCH_THRESHOLD
+        )
+
+    return queryset.annotate(rank=rank).filter(found).order_by("-rank", "id")
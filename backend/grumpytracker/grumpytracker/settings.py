@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -27,6 +27,11 @@ MEDIA_ROOT = os.environ.get('RAILWAY_VOLUME_MOUNT_PATH', os.path.join(BASE_DIR,
 SECRET_KEY = config('SECRET_KEY')
 
 JWT_SECRET = config('JWT_SECRET')
+# Users we found from a JWT are kept in memory so we don't look them up on every request.
+# Each worker has its own cache, a user changed on another worker is served for up to
+# JWT_USER_CACHE_TTL seconds so keep it short
+JWT_USER_CACHE_SIZE = config('JWT_USER_CACHE_SIZE', default=1024, cast=int)
+JWT_USER_CACHE_TTL = config('JWT_USER_CACHE_TTL', default=30, cast=int)
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = config('DEBUG', default='True').lower() in ['true', '1', 'yes']
@@ -47,6 +52,8 @@ CORS_ALLOWED_ORIGINS = [
     'https://thegrumpytracker.xyz',
     'https://wholesome-renewal-production.up.railway.app',  # Railway front end
 ]
+# Let the front end read the pagination cursor on truncated lists
+CORS_EXPOSE_HEADERS = ['X-Next-Cursor']
 
 # Application definition
 
@@ -57,6 +64,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_extensions',
     'corsheaders',
     'makes',
@@ -65,6 +73,9 @@ INSTALLED_APPS = [
     'formats',
     'users',
     'projects',
+    'jobs',
+    'blobs',
+    'versions',
 ]
 
 MIDDLEWARE = [
@@ -154,7 +165,121 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Uploaded media is stored under the hash of its content, see grumpytracker/storage.py
+STORAGES = {
+    'default': {'BACKEND': 'grumpytracker.storage.HashedMediaStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Media delivery
+# Hashed media names always point to the same content, browsers and proxies can keep them
+MEDIA_IMMUTABLE_MAX_AGE = config('MEDIA_IMMUTABLE_MAX_AGE', default=60 * 60 * 24 * 365, cast=int)
+# Files saved before we hashed names are cached for this long and then revalidated
+MEDIA_MAX_AGE = config('MEDIA_MAX_AGE', default=60 * 60, cast=int)
+# Let the web server send media files instead of a Python worker. X-Accel-Redirect for nginx
+# (with an internal location at MEDIA_OFFLOAD_PREFIX aliased to MEDIA_ROOT) or X-Sendfile
+# for Apache/Caddy/lighttpd, empty to send them ourselves
+MEDIA_OFFLOAD_HEADER = config('MEDIA_OFFLOAD_HEADER', default='')
+MEDIA_OFFLOAD_PREFIX = config('MEDIA_OFFLOAD_PREFIX', default='/protected-media/')
+# gc_media leaves files nobody uses alone until they are this old (seconds), an upload can
+# be on disk a moment before the record pointing to it is saved
+MEDIA_GC_GRACE = config('MEDIA_GC_GRACE', default=60 * 60 * 24, cast=int)
+
+# Image variants
+# Camera images and make logos are offered resized to these widths in these formats, the
+# copies are made the first time they are requested. AVIF is skipped if Pillow can't write it
+IMAGE_VARIANT_WIDTHS = config('IMAGE_VARIANT_WIDTHS', default='160,480', cast=Csv(int))
+IMAGE_VARIANT_FORMATS = config('IMAGE_VARIANT_FORMATS', default='avif,webp', cast=Csv())
+IMAGE_VARIANT_QUALITY = config('IMAGE_VARIANT_QUALITY', default=80, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The catalogue cache holds the makes, cameras, formats and sources GET responses. They are
+# keyed on the model versions in the database so every process serves up to date responses,
+# it lives in memory by default, a shared backend lets processes share the entries, e.g.
+# CATALOGUE_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache with a directory
+# or django.core.cache.backends.redis.RedisCache with redis://host:6379 as the location
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalogue': {
+        'BACKEND': config(
+            'CATALOGUE_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': config('CATALOGUE_CACHE_LOCATION', default='catalogue'),
+        'TIMEOUT': config('CATALOGUE_CACHE_TIMEOUT', default=60 * 60, cast=int),
+    },
+}
+
+# TMDB
+TMDB_API_READ_KEY = config('TMDB_API_READ_KEY', default='')
+TMDB_BASE_URL = config('TMDB_BASE_URL', default='https://api.themoviedb.org/3')
+# Seconds we wait to connect and then for TMDB to answer, slow calls should not hold a worker
+TMDB_CONNECT_TIMEOUT = config('TMDB_CONNECT_TIMEOUT', default=3.05, cast=float)
+TMDB_READ_TIMEOUT = config('TMDB_READ_TIMEOUT', default=10, cast=float)
+# Size of the connection pool, this is also how many requests we send at the same time
+TMDB_MAX_CONNECTIONS = config('TMDB_MAX_CONNECTIONS', default=10, cast=int)
+TMDB_RETRIES = config('TMDB_RETRIES', default=2, cast=int)
+# TMDB allows around 50 requests per second, we stay under it
+TMDB_RATE_LIMIT = config('TMDB_RATE_LIMIT', default=40, cast=float)
+# TMDB responses are kept in the database. Each endpoint (the first part of the path) has its
+# own TTL in seconds, searches change as titles get added while details rarely do
+TMDB_CACHE_TTLS = {
+    'search': 60 * 60,
+    'movie': 60 * 60 * 24 * 7,
+    'tv': 60 * 60 * 24 * 7,
+}
+TMDB_CACHE_DEFAULT_TTL = 60 * 60 * 24
+# For this long after the TTL we still answer from the cache and refresh in the background
+TMDB_CACHE_STALE_TTL = config('TMDB_CACHE_STALE_TTL', default=60 * 60 * 24, cast=int)
+TMDB_CACHE_MAX_ENTRIES = config('TMDB_CACHE_MAX_ENTRIES', default=10000, cast=int)
+# Shorter project searches only look at our own projects, so search as you type doesn't
+# send every keystroke to TMDB
+TMDB_SEARCH_MIN_LENGTH = config('TMDB_SEARCH_MIN_LENGTH', default=3, cast=int)
+
+# Threads used for quick fire and forget work (refreshing stale TMDB responses)
+BACKGROUND_THREADS = config('BACKGROUND_THREADS', default=4, cast=int)
+
+# Background jobs, queued in the database and run by `manage.py run_worker`
+# Jobs each worker process runs at the same time
+JOB_WORKER_CONCURRENCY = config('JOB_WORKER_CONCURRENCY', default=4, cast=int)
+# Seconds an idle worker waits before looking at the queue again
+JOB_POLL_INTERVAL = config('JOB_POLL_INTERVAL', default=1, cast=float)
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=3, cast=int)
+# Seconds before the first retry, doubled on every attempt after that
+JOB_RETRY_DELAY = config('JOB_RETRY_DELAY', default=30, cast=int)
+# A running job whose worker has not checked in for this long (seconds) is given to another
+# worker, its worker most likely died
+JOB_LOCK_TIMEOUT = config('JOB_LOCK_TIMEOUT', default=60 * 15, cast=int)
+# Seconds between the updates a worker makes to the lock of the job it's running, keep it
+# well under JOB_LOCK_TIMEOUT
+JOB_HEARTBEAT_INTERVAL = config('JOB_HEARTBEAT_INTERVAL', default=60, cast=float)
+# Restoring more projects than this runs in the background and reports its progress
+PROJECT_RESTORE_INLINE_LIMIT = config('PROJECT_RESTORE_INLINE_LIMIT', default=50, cast=int)
+
+# API pagination
+# List endpoints never return more than API_MAX_PAGE_SIZE records in a single response
+API_DEFAULT_PAGE_SIZE = config('API_DEFAULT_PAGE_SIZE', default=100, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=1000, cast=int)
+# Number of rows fetched from the database at a time when streaming a full list
+API_STREAM_CHUNK_SIZE = config('API_STREAM_CHUNK_SIZE', default=2000, cast=int)
+# Bulk imports are validated and written in one go, larger uploads have to be split
+API_IMPORT_MAX_ROWS = config('API_IMPORT_MAX_ROWS', default=5000, cast=int)
+# Threads writing the images of a bulk camera import to storage
+IMPORT_IMAGE_WORKERS = config('IMPORT_IMAGE_WORKERS', default=8, cast=int)
+# Where uploads waiting for a background job are kept, the job deletes them when it's done
+JOB_UPLOADS_DIR = config(
+    'JOB_UPLOADS_DIR', default=os.path.join(BASE_DIR, '.cache', 'job_uploads')
+)
+# Where import_spec_pdf keeps the pages it parsed, a revised sheet only has its changed
+# pages parsed again
+SPEC_SHEET_CACHE_DIR = config(
+    'SPEC_SHEET_CACHE_DIR', default=os.path.join(BASE_DIR, '.cache', 'spec_sheets')
+)
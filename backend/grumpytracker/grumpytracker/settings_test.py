@@ -22,5 +22,10 @@ DATABASES = {
 MEDIA_ROOT = os.path.join(tempfile.gettempdir(), "grumpytracker_test_media")
 MEDIA_URL = "/test_media/"
 
+SPEC_SHEET_CACHE_DIR = os.path.join(
+    tempfile.gettempdir(), "grumpytracker_test_spec_sheets"
+)
+JOB_UPLOADS_DIR = os.path.join(tempfile.gettempdir(), "grumpytracker_test_job_uploads")
+
 DEBUG = True
 TESTING = True
@@ -0,0 +1,94 @@
+import gzip
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from blobs.models import Blob
+
+from .images import delete_variants
+
+# camera_images/<sha256>.png, Django adds _abcdefg when two uploads race for the same
+# name. Image variants add their width and format, camera_images/<sha256>.png.480w.webp
+CONTENT_NAME = re.compile(
+    r"(^|/)[0-9a-f]{64}(_[A-Za-z0-9]{7})?\.[^./]+(\.\d+w\.[^./]+)?$"
+)
+
+# Text based files are worth keeping a gzipped copy of, images are compressed already
+COMPRESSIBLE_EXTENSIONS = {".svg", ".json", ".txt", ".csv", ".xml"}
+
+
+def file_hash(content: File) -> str:
+    hasher = hashlib.sha256()
+    for chunk in content.chunks():
+        hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+
+def is_hashed(name: str) -> bool:
+    """
+    Check if a media file name has a content hash, those files never change and can be
+    cached forever
+    """
+    return CONTENT_NAME.search(name) is not None
+
+
+def content_name(name: str, content: File) -> str:
+    """
+    The name a file is stored under, the hash of its content in the upload directory
+    """
+    directory, filename = os.path.split(name)
+    name = f"{file_hash(content)}{os.path.splitext(filename)[1].lower()}"
+
+    return f"{directory}/{name}" if directory else name
+
+
+class HashedMediaStorage(FileSystemStorage):
+    """
+    Content addressed media storage, logo.png is saved as make_logos/<sha256>.png. Every
+    upload of the same bytes gets the same name so the file is stored once and shared,
+    the blobs app counts the records using it and gc_media removes it once nobody does.
+    A name always points to the same content so clients and proxies can cache media
+    forever. Text files also get a gzipped copy next to them for the media view to serve
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        if not is_hashed(name):
+            name = content_name(name, content)
+            if self.exists(name):
+                # We have these bytes already, the file is left as it is
+                Blob.objects.reuse(name)
+                return name
+
+        name = super().save(name, content, max_length=max_length)
+        self.save_compressed(name)
+
+        return name
+
+    def save_compressed(self, name: str) -> None:
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return
+
+        with self.open(name) as f:
+            data = f.read()
+
+        compressed = gzip.compress(data, mtime=0)
+        # Not worth a second file (and a Vary header) if it barely got smaller
+        if len(compressed) < len(data) * 0.9:
+            with open(f"{self.path(name)}.gz", "wb") as f:
+                f.write(compressed)
+
+    def delete(self, name):
+        super().delete(name)
+        compressed = f"{self.path(name)}.gz"
+        if os.path.exists(compressed):
+            os.remove(compressed)
+        delete_variants(self.location, name)
@@ -0,0 +1,69 @@
+import json
+from typing import Any, Callable, Dict, Iterator
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, QuerySet
+from django.http import StreamingHttpResponse
+
+
+def wants_stream(request) -> bool:
+    """
+    Check if the caller asked for a streamed response, either with ?stream=true
+    or by asking for newline delimited JSON with ?format=ndjson
+    """
+    return (
+        request.GET.get("stream", "").lower() == "true"
+        or request.GET.get("format", "").lower() == "ndjson"
+    )
+
+
+def iter_rows(
+    queryset: QuerySet, serialize: Callable[[Model], Dict[str, Any]]
+) -> Iterator[str]:
+    """
+    Serialize the queryset one record at a time. We use iterator() so Django does not
+    cache the whole table on the queryset while we are going through it
+    """
+    queryset = queryset.order_by("id")
+    for obj in queryset.iterator(chunk_size=settings.API_STREAM_CHUNK_SIZE):
+        # JsonResponse uses the Django encoder so we do the same for dates and decimals
+        yield json.dumps(serialize(obj), cls=DjangoJSONEncoder)
+
+
+def json_array(rows: Iterator[str]) -> Iterator[str]:
+    """
+    Wrap serialized rows in a JSON array without holding them all in memory
+    """
+    yield "["
+    for index, row in enumerate(rows):
+        yield row if index == 0 else f",{row}"
+    yield "]"
+
+
+def ndjson(rows: Iterator[str]) -> Iterator[str]:
+    """
+    Emit one JSON document per line
+    """
+    for row in rows:
+        yield f"{row}\n"
+
+
+def stream_response(
+    request,
+    queryset: QuerySet,
+    serialize: Callable[[Model], Dict[str, Any]] = lambda obj: obj.as_dict(),
+) -> StreamingHttpResponse:
+    """
+    Stream every record in the queryset as a JSON array or as NDJSON (?format=ndjson).
+    Unlike the regular list responses this is not capped by API_MAX_PAGE_SIZE, it is meant for
+    tools that need to dump the full catalogue
+    :param queryset: The records we want to return
+    :param serialize: Function that turns a record into a dictionary
+    """
+    rows = iter_rows(queryset, serialize)
+
+    if request.GET.get("format", "").lower() == "ndjson":
+        return StreamingHttpResponse(ndjson(rows), content_type="application/x-ndjson")
+
+    return StreamingHttpResponse(json_array(rows), content_type="application/json")
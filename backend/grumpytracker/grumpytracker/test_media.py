@@ -0,0 +1,325 @@
+import gzip
+import hashlib
+import os
+from io import BytesIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.urls import reverse
+from PIL import Image
+
+from blobs.models import Blob
+from grumpytracker.storage import HashedMediaStorage, is_hashed
+from makes.models import Make
+
+
+@pytest.fixture
+def media_storage(settings, temp_media_dir):
+    settings.MEDIA_ROOT = temp_media_dir
+    return HashedMediaStorage(location=temp_media_dir)
+
+
+@pytest.mark.django_db
+class TestHashedMediaStorage:
+    """
+    Tests for the storage that puts content hashes in media file names
+    """
+
+    def test_hashed_names(self, media_storage):
+        """
+        The name should be the hash of the content and the same content stored only once
+        """
+        first = media_storage.save("logos/arri.png", ContentFile(b"first"))
+        second = media_storage.save("logos/arri.png", ContentFile(b"second"))
+        again = media_storage.save("logos/red.PNG", ContentFile(b"first"))
+
+        assert first == f"logos/{hashlib.sha256(b'first').hexdigest()}.png"
+        assert is_hashed(first) and is_hashed(second)
+        assert again == first
+        assert len(os.listdir(media_storage.path("logos"))) == 2
+        assert media_storage.open(first).read() == b"first"
+        assert not is_hashed("logos/arri.0123456789ab.png")
+        assert not is_hashed("logos/arri.png")
+
+    def test_upload_again(self, client, media_storage):
+        """
+        Uploading bytes we have should leave the file, and the ETag it's served with,
+        alone and note the reuse on its blob
+        """
+        name = media_storage.save("logos/arri.png", ContentFile(b"png"))
+        os.utime(media_storage.path(name), (0, 0))
+        etag = client.get(reverse("media", args=[name]))["ETag"]
+
+        assert media_storage.save("logos/red.png", ContentFile(b"png")) == name
+
+        assert os.path.getmtime(media_storage.path(name)) == 0
+        assert client.get(reverse("media", args=[name]))["ETag"] == etag
+        assert Blob.objects.get(name=name).reused_at is not None
+
+    def test_compressed_copy(self, media_storage):
+        """
+        Text files should get a gzipped copy that is deleted along with them
+        """
+        svg = b"<svg>" + b"<rect/>" * 200 + b"</svg>"
+        name = media_storage.save("logos/red.svg", ContentFile(svg))
+        compressed = f"{media_storage.path(name)}.gz"
+
+        with open(compressed, "rb") as f:
+            assert gzip.decompress(f.read()) == svg
+        assert not os.path.exists(
+            f"{media_storage.path(media_storage.save('a.png', ContentFile(svg)))}.gz"
+        )
+
+        media_storage.delete(name)
+        assert not os.path.exists(compressed)
+
+
+@pytest.mark.django_db
+class TestServeMedia:
+    """
+    Tests for the media view
+    """
+
+    def test_serve_hashed(self, client, media_storage):
+        """
+        Hashed files should be cached for good and revalidate with their ETag
+        """
+        name = media_storage.save("camera_images/alexa.png", ContentFile(b"png" * 100))
+
+        res = client.get(reverse("media", args=[name]))
+
+        assert res.status_code == 200
+        assert b"".join(res.streaming_content) == b"png" * 100
+        assert res["Content-Type"] == "image/png"
+        assert "immutable" in res["Cache-Control"]
+        assert res["Accept-Ranges"] == "bytes"
+
+        res = client.get(
+            reverse("media", args=[name]), headers={"If-None-Match": res["ETag"]}
+        )
+        assert res.status_code == 304
+        assert res.content == b""
+
+        res = client.get(
+            reverse("media", args=[name]),
+            headers={"If-Modified-Since": res["Last-Modified"]},
+        )
+        assert res.status_code == 304
+
+    def test_serve_unhashed(self, client, settings, temp_media_dir):
+        """
+        Files saved before names were hashed can change, they have to be revalidated
+        """
+        settings.MEDIA_ROOT = temp_media_dir
+        with open(os.path.join(temp_media_dir, "old.png"), "wb") as f:
+            f.write(b"old")
+
+        res = client.get(reverse("media", args=["old.png"]))
+
+        assert res.status_code == 200
+        assert res["Cache-Control"] == f"public, max-age={settings.MEDIA_MAX_AGE}"
+
+    def test_serve_range(self, client, media_storage):
+        """
+        Byte ranges should be answered with the part of the file that was asked for
+        """
+        name = media_storage.save("clip.png", ContentFile(b"0123456789"))
+        url = reverse("media", args=[name])
+
+        res = client.get(url, headers={"Range": "bytes=2-5"})
+        assert res.status_code == 206
+        assert b"".join(res.streaming_content) == b"2345"
+        assert res["Content-Range"] == "bytes 2-5/10"
+
+        res = client.get(url, headers={"Range": "bytes=-3"})
+        assert b"".join(res.streaming_content) == b"789"
+
+        res = client.get(url, headers={"Range": "bytes=20-"})
+        assert res.status_code == 416
+        assert res["Content-Range"] == "bytes */10"
+
+        # An outdated copy needs the whole file
+        res = client.get(url, headers={"Range": "bytes=2-5", "If-Range": '"nope"'})
+        assert res.status_code == 200
+
+    def test_serve_compressed(self, client, media_storage):
+        """
+        Clients that take gzip should get the gzipped copy with its own ETag
+        """
+        svg = b"<svg>" + b"<rect/>" * 200 + b"</svg>"
+        name = media_storage.save("logos/red.svg", ContentFile(svg))
+        url = reverse("media", args=[name])
+
+        res = client.get(url, headers={"Accept-Encoding": "gzip, br"})
+        assert res["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in res["Vary"]
+        assert gzip.decompress(b"".join(res.streaming_content)) == svg
+
+        plain = client.get(url)
+        assert "Content-Encoding" not in plain
+        assert b"".join(plain.streaming_content) == svg
+        assert plain["ETag"] != res["ETag"]
+
+        res = client.get(url, headers={"If-None-Match": res["ETag"]})
+        assert res.status_code == 304
+
+    @pytest.mark.parametrize(
+        "accept_encoding, compressed",
+        [
+            ("gzip;q=0, br", False),
+            ("br, *;q=0", False),
+            ("GZIP;q=0.5", True),
+            ("br, *", True),
+            ("gzip;q=0, *", False),
+        ],
+    )
+    def test_serve_compressed_quality(
+        self, client, media_storage, accept_encoding, compressed
+    ):
+        """
+        The gzipped copy should only go to clients whose Accept-Encoding gives gzip a
+        quality above zero
+        """
+        svg = b"<svg>" + b"<rect/>" * 200 + b"</svg>"
+        name = media_storage.save("logos/red.svg", ContentFile(svg))
+
+        res = client.get(
+            reverse("media", args=[name]), headers={"Accept-Encoding": accept_encoding}
+        )
+
+        assert ("Content-Encoding" in res) is compressed
+
+    def test_offload(self, client, settings, media_storage):
+        """
+        With an offload header the web server should be told to send the file
+        """
+        name = media_storage.save("logos/arri.png", ContentFile(b"png"))
+        url = reverse("media", args=[name])
+
+        settings.MEDIA_OFFLOAD_HEADER = "X-Accel-Redirect"
+        res = client.get(url)
+        assert res.status_code == 200
+        assert res.content == b""
+        assert res["X-Accel-Redirect"] == f"{settings.MEDIA_OFFLOAD_PREFIX}{name}"
+        assert "immutable" in res["Cache-Control"]
+
+        settings.MEDIA_OFFLOAD_HEADER = "X-Sendfile"
+        res = client.get(url)
+        assert res["X-Sendfile"] == media_storage.path(name)
+
+    def test_not_found(self, client, media_storage):
+        """
+        Missing files, directories and paths outside the media root should 404
+        """
+        media_storage.save("logos/arri.png", ContentFile(b"png"))
+
+        assert client.get(reverse("media", args=["missing.png"])).status_code == 404
+        assert client.get(reverse("media", args=["logos"])).status_code == 404
+        assert client.get(reverse("media", args=["../etc/passwd"])).status_code == 404
+
+    def test_post_not_allowed(self, client, media_storage):
+        """
+        Media is read only
+        """
+        name = media_storage.save("logos/arri.png", ContentFile(b"png"))
+
+        assert client.post(reverse("media", args=[name])).status_code == 405
+
+
+@pytest.fixture
+def camera_png(media_storage):
+    """
+    A 600x300 PNG in the media storage
+    """
+    image = Image.new("RGBA", (600, 300), color=(255, 0, 0, 128))
+    data = BytesIO()
+    image.save(data, format="PNG")
+
+    return media_storage.save("camera_images/alexa.png", ContentFile(data.getvalue()))
+
+
+@pytest.mark.django_db
+class TestImageVariants:
+    """
+    Tests for the resized copies of camera images and make logos
+    """
+
+    def test_variants_in_as_dict(self, single_camera, camera_png, settings):
+        """
+        Cameras should list the URL of every variant, by format and width
+        """
+        settings.IMAGE_VARIANT_WIDTHS = [480, 160]
+        settings.IMAGE_VARIANT_FORMATS = ["webp", "avif"]
+        single_camera.image.name = camera_png
+
+        variants = single_camera.as_dict()["image_variants"]
+
+        assert variants["webp"] == {
+            "160w": f"{settings.MEDIA_URL}variants/{camera_png}.160w.webp",
+            "480w": f"{settings.MEDIA_URL}variants/{camera_png}.480w.webp",
+        }
+        assert variants["thumbnail"] == variants["webp"]["160w"]
+        assert is_hashed(f"variants/{camera_png}.160w.webp")
+
+    def test_variant_made_on_request(self, client, camera_png, settings):
+        """
+        A variant should be made the first time it's asked for and kept on disk
+        """
+        settings.IMAGE_VARIANT_WIDTHS = [160]
+        name = f"variants/{camera_png}.160w.webp"
+
+        res = client.get(reverse("media", args=[name]))
+
+        assert res.status_code == 200
+        assert res["Content-Type"] == "image/webp"
+        assert "immutable" in res["Cache-Control"]
+        with Image.open(BytesIO(b"".join(res.streaming_content))) as image:
+            assert image.size == (160, 80)
+            assert image.mode == "RGBA"
+        assert os.path.exists(os.path.join(settings.MEDIA_ROOT, name))
+
+        # Images are never made bigger
+        settings.IMAGE_VARIANT_WIDTHS = [1000]
+        res = client.get(reverse("media", args=[f"variants/{camera_png}.1000w.webp"]))
+        with Image.open(BytesIO(b"".join(res.streaming_content))) as image:
+            assert image.size == (600, 300)
+
+    def test_unknown_variants(self, client, camera_png, settings):
+        """
+        Only the configured variants of existing images should be made
+        """
+        settings.IMAGE_VARIANT_WIDTHS = [160]
+
+        for name in [
+            f"variants/{camera_png}.333w.webp",
+            f"variants/{camera_png}.160w.gif",
+            "variants/camera_images/missing.png.160w.webp",
+            "variants/../../etc/passwd.160w.webp",
+        ]:
+            assert client.get(reverse("media", args=[name])).status_code == 404
+
+    def test_no_variants_for_vector_images(self, client, media_storage, settings):
+        """
+        Pillow can't read SVGs, we should not offer variants we can't make
+        """
+        settings.IMAGE_VARIANT_WIDTHS = [160]
+        svg = media_storage.save("make_logos/vite.svg", ContentFile(b"<svg></svg>"))
+        make = Make.objects.create(name="Vite", logo=svg)
+
+        assert make.as_dict()["logo_variants"] is None
+        res = client.get(reverse("media", args=[f"variants/{svg}.160w.webp"]))
+        assert res.status_code == 404
+
+    def test_variants_deleted_with_image(
+        self, client, media_storage, camera_png, settings
+    ):
+        """
+        Deleting an image should delete its variants
+        """
+        settings.IMAGE_VARIANT_WIDTHS = [160]
+        name = f"variants/{camera_png}.160w.webp"
+        client.get(reverse("media", args=[name]))
+
+        media_storage.delete(camera_png)
+
+        assert not os.path.exists(os.path.join(settings.MEDIA_ROOT, name))
@@ -0,0 +1,166 @@
+import jwt
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+
+from grumpytracker.middleware import JWTAuthMiddleware, UserCache, user_cache
+
+
+def make_token(user) -> str:
+    """
+    Build a token the same way the login view does
+    """
+    now = timezone.now()
+    payload = {"user_id": user.id, "exp": now + timedelta(days=1), "iat": now}
+    return jwt.encode(payload, settings.JWT_SECRET, algorithm="HS256")
+
+
+def run_middleware(token: str, view=lambda request: HttpResponse()):
+    """
+    Send a request with a bearer token through the middleware
+    :returns: The request so we can look at the user
+    """
+    request = RequestFactory().get("/", headers={"Authorization": f"Bearer {token}"})
+    request.user = AnonymousUser()
+    JWTAuthMiddleware(view)(request)
+
+    return request
+
+
+class TestJWTAuthMiddleware:
+    """
+    Tests for the JWT middleware and its user cache
+    """
+
+    @pytest.mark.django_db
+    def test_user_is_cached(self, single_user, django_assert_num_queries):
+        """
+        We should only look the user up once
+        """
+        token = make_token(single_user)
+
+        with django_assert_num_queries(1):
+            assert run_middleware(token).user == single_user
+
+        with django_assert_num_queries(0):
+            request = run_middleware(token)
+            assert request.user == single_user
+            assert request.user.is_authenticated
+
+    @pytest.mark.django_db
+    def test_user_lookup_is_lazy(self, single_user, django_assert_num_queries):
+        """
+        Views that never look at request.user should not query the user
+        """
+        with django_assert_num_queries(0):
+            run_middleware(make_token(single_user))
+
+    @pytest.mark.django_db
+    def test_deleted_user(self, single_user):
+        """
+        A token for a user that no longer exists should leave us anonymous
+        """
+        token = make_token(single_user)
+        assert run_middleware(token).user == single_user
+
+        single_user.delete()
+
+        assert not run_middleware(token).user.is_authenticated
+
+    @pytest.mark.django_db
+    def test_user_deactivated(self, single_user, multiple_users):
+        """
+        Saving a user should only drop that user from the cache, a deactivated user is
+        not authenticated anymore
+        """
+        token = make_token(single_user)
+        other = make_token(multiple_users[0])
+        assert run_middleware(token).user == single_user
+        assert run_middleware(other).user == multiple_users[0]
+
+        single_user.is_active = False
+        single_user.save()
+
+        assert single_user.id not in user_cache._users
+        assert multiple_users[0].id in user_cache._users
+        assert not run_middleware(token).user.is_authenticated
+
+    @pytest.mark.django_db
+    def test_user_updated_through_view(self, client, single_user):
+        """
+        Updating a user should drop them from the cache
+        """
+        token = make_token(single_user)
+        headers = {"Authorization": f"Bearer {token}"}
+        client.force_login(single_user)
+
+        assert run_middleware(token).user.first_name == ""
+
+        res = client.patch(
+            reverse("user", args=[single_user.id]),
+            {"first_name": "Grumpy"},
+            content_type="application/json",
+            headers=headers,
+        )
+        assert res.status_code == 200
+
+        assert run_middleware(token).user.first_name == "Grumpy"
+
+    @pytest.mark.django_db
+    def test_invalid_token(self, django_assert_num_queries):
+        """
+        A bad token should leave us anonymous
+        """
+        with django_assert_num_queries(0):
+            request = run_middleware("not-a-token")
+
+        assert not request.user.is_authenticated
+        assert len(user_cache._users) == 0
+
+
+class TestUserCache:
+    """
+    Tests for the user cache
+    """
+
+    @pytest.mark.django_db
+    def test_lru_eviction(self, multiple_users):
+        """
+        Going over the max size should drop the least recently used user
+        """
+        cache = UserCache(max_size=2, ttl=60)
+        cache.set(multiple_users[0])
+        cache.set(multiple_users[1])
+        cache.get(multiple_users[0].id)
+        cache.set(multiple_users[2])
+
+        assert cache.get(multiple_users[0].id) == multiple_users[0]
+        assert cache.get(multiple_users[1].id) is None
+        assert cache.get(multiple_users[2].id) == multiple_users[2]
+
+    @pytest.mark.django_db
+    def test_ttl(self, single_user):
+        """
+        Expired users should not be returned
+        """
+        cache = UserCache(max_size=2, ttl=-1)
+        cache.set(single_user)
+
+        assert cache.get(single_user.id) is None
+
+    @pytest.mark.django_db
+    def test_get_returns_a_copy(self, single_user):
+        """
+        Changing a user we got from the cache should not change the cached user
+        """
+        cache = UserCache(max_size=2, ttl=60)
+        cache.set(single_user)
+
+        cache.get(single_user.id).first_name = "Changed"
+
+        assert cache.get(single_user.id).first_name == single_user.first_name
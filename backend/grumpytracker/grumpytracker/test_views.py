@@ -0,0 +1,124 @@
+import pytest
+from django.urls import reverse
+
+
+class TestSearchView:
+    """
+    Tests for the unified search view
+    """
+
+    @pytest.mark.django_db
+    def test_search_all_types(self, client, multiple_formats, multiple_projects):
+        """
+        A single search should return typed hits for every kind of record
+        """
+        res = client.get(reverse("search", query={"q": "Alexa"}))
+
+        assert res.status_code == 200
+        data = res.json()
+        assert data["query"] == "Alexa"
+        assert set(data["results"].keys()) == {
+            "makes",
+            "cameras",
+            "formats",
+            "sources",
+            "projects",
+        }
+
+        cameras = data["results"]["cameras"]
+        assert [hit["label"] for hit in cameras] == [
+            "Arri Alexa 35",
+            "Arri Alexa Mini LF",
+        ]
+        for hit in cameras:
+            assert set(hit.keys()) == {"id", "type", "label", "rank"}
+            assert hit["type"] == "cameras"
+
+        assert data["results"]["makes"] == []
+        assert data["results"]["projects"] == []
+
+        res = client.get(reverse("search", query={"q": "Open Gate"}))
+
+        formats = res.json()["results"]["formats"]
+        assert len(formats) == 2
+        assert all(hit["label"].startswith("Alexa 35") for hit in formats)
+
+    @pytest.mark.django_db
+    def test_search_single_query(
+        self, client, multiple_formats, multiple_projects, django_assert_num_queries
+    ):
+        """
+        Searching every type should only hit the database once
+        """
+        with django_assert_num_queries(1):
+            res = client.get(reverse("search", query={"q": "Arri"}))
+
+        assert res.status_code == 200
+        data = res.json()
+        assert [hit["label"] for hit in data["results"]["makes"]] == ["Arri"]
+
+    @pytest.mark.django_db
+    def test_search_ranked(self, client, multiple_cameras):
+        """
+        The closest match should come first
+        """
+        res = client.get(reverse("search", query={"q": "KOMODO-X"}))
+
+        assert res.status_code == 200
+        cameras = res.json()["results"]["cameras"]
+        assert cameras[0]["label"] == "RED KOMODO-X"
+
+    @pytest.mark.django_db
+    def test_search_limit(self, client, multiple_cameras):
+        """
+        We should never get more hits than the limit for each type
+        """
+        res = client.get(reverse("search", query={"q": "Super 35", "limit": 1}))
+
+        assert res.status_code == 200
+        assert len(res.json()["results"]["cameras"]) == 1
+
+    @pytest.mark.django_db
+    def test_search_types(self, client, multiple_projects):
+        """
+        We can ask for only some of the types
+        """
+        res = client.get(
+            reverse("search", query={"q": "Daredevil", "types": "projects,makes"})
+        )
+
+        assert res.status_code == 200
+        results = res.json()["results"]
+        assert set(results.keys()) == {"projects", "makes"}
+        assert [hit["label"] for hit in results["projects"]] == ["Daredevil"]
+
+    @pytest.mark.django_db
+    def test_search_unknown_type(self, client):
+        """
+        Asking for a type we don't have should return an error
+        """
+        res = client.get(reverse("search", query={"q": "Arri", "types": "lenses"}))
+
+        assert res.status_code == 400
+        assert res.json()["error"] == "Unknown type lenses"
+
+    @pytest.mark.django_db
+    def test_search_bad_limit(self, client):
+        """
+        Limit has to be a positive number
+        """
+        res = client.get(reverse("search", query={"q": "Arri", "limit": "many"}))
+        assert res.status_code == 400
+
+        res = client.get(reverse("search", query={"q": "Arri", "limit": 0}))
+        assert res.status_code == 400
+
+    @pytest.mark.django_db
+    def test_search_no_query(self, client):
+        """
+        No query should return an error
+        """
+        res = client.get(reverse("search"))
+
+        assert res.status_code == 200
+        assert res.json()["error"] == "No query provided"
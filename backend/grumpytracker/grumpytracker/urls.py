@@ -19,8 +19,8 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.static import serve
-from .views import StatsView
+from .media import serve_media
+from .views import SearchView, StatsView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -30,10 +30,11 @@ urlpatterns = [
     path("api/v1/sources/", include("sources.urls")),
     path("api/v1/projects/", include("projects.urls")),
     path("api/v1/users/", include("users.urls")),
+    path("api/v1/jobs/", include("jobs.urls")),
     path("api/v1/stats/", StatsView.as_view(), name="stats"),
-    re_path(
-        r"^media/(?P<path>.*)$", serve, {"document_root": settings.MEDIA_ROOT}
-    ),  # this replaces the commented code below
+    path("api/v1/search", SearchView.as_view(), name="search"),
+    # Media gets caching headers and can be handed to the web server, see media.py
+    re_path(r"^media/(?P<path>.*)$", serve_media, name="media"),
 ]
 
 # media_patterns = static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,3 +1,6 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat
 from django.http import JsonResponse
 from django.views import View
 from django.utils.decorators import method_decorator
@@ -7,6 +10,12 @@ from projects.models import Project
 from makes.models import Make
 from cameras.models import Camera
 from formats.models import Format
+from sources.models import Source
+from grumpytracker.search import rank_search
+
+# Number of hits we return for each type unless the caller asks for more (up to the max)
+SEARCH_DEFAULT_LIMIT = 5
+SEARCH_MAX_LIMIT = 25
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -35,3 +44,127 @@ class StatsView(View):
             },
             safe=False,
         )
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class SearchView(View):
+    """
+    Handle search endpoint
+    GET - Search makes, cameras, formats, sources and projects in a single query
+    """
+
+    def get(self, request) -> JsonResponse:
+        """
+        Return the best matches for each type, ranked by relevance. Pass limit to get more
+        hits per type and types (comma separated) to only search some of them
+        """
+        query = request.GET.get("q", "").strip()
+        if not query:
+            return JsonResponse({"error": "No query provided"})
+
+        try:
+            limit = min(
+                int(request.GET.get("limit", SEARCH_DEFAULT_LIMIT)), SEARCH_MAX_LIMIT
+            )
+        except ValueError:
+            return JsonResponse({"error": "limit must be a number"}, status=400)
+        if limit < 1:
+            return JsonResponse({"error": "limit must be greater than 0"}, status=400)
+
+        searches = {
+            "makes": self.search_makes,
+            "cameras": self.search_cameras,
+            "formats": self.search_formats,
+            "sources": self.search_sources,
+            "projects": self.search_projects,
+        }
+        types = request.GET.get("types")
+        if types:
+            types = [t.strip() for t in types.split(",")]
+            unknown = [t for t in types if t not in searches]
+            if unknown:
+                return JsonResponse(
+                    {"error": f"Unknown type {unknown[0]}"}, status=400
+                )
+        else:
+            types = list(searches.keys())
+
+        # Every type gets its own ranked and limited query and we UNION them together
+        # so the database only gets a single round trip
+        hits = [
+            searches[search_type](query)
+            .annotate(type=Value(search_type), label=self.label_for(search_type))
+            .values("id", "rank", "type", "label")[:limit]
+            for search_type in types
+        ]
+        combined = hits[0].union(*hits[1:], all=True)
+
+        results = {search_type: [] for search_type in types}
+        for hit in combined:
+            results[hit["type"]].append(hit)
+
+        for search_type in types:
+            results[search_type].sort(key=lambda hit: (-hit["rank"], hit["id"]))
+
+        return JsonResponse({"query": query, "results": results})
+
+    @staticmethod
+    def label_for(search_type: str):
+        """
+        The text the front end shows for each hit
+        """
+        labels = {
+            "makes": F("name"),
+            "cameras": Concat("make__name", Value(" "), "model"),
+            "formats": Concat("camera__model", Value(" "), "format_search"),
+            "sources": F("name"),
+            "projects": F("name"),
+        }
+        return labels[search_type]
+
+    @staticmethod
+    def search_makes(query: str):
+        return (
+            Make.objects.filter(name__icontains=query)
+            .annotate(rank=TrigramSimilarity("name", query))
+            .order_by("-rank", "id")
+        )
+
+    @staticmethod
+    def search_cameras(query: str):
+        match = Q()
+        for term in query.split():
+            match &= (
+                Q(make__name__icontains=term)
+                | Q(model__icontains=term)
+                | Q(sensor_type__icontains=term)
+            )
+        return rank_search(Camera.objects.all(), query, match, fuzzy_field="model")
+
+    @staticmethod
+    def search_formats(query: str):
+        return rank_search(
+            Format.objects.all(), query, Q(format_search__icontains=query)
+        )
+
+    @staticmethod
+    def search_sources(query: str):
+        match = Q()
+        for term in query.split():
+            match &= (
+                Q(name__icontains=term)
+                | Q(url__icontains=term)
+                | Q(file_name__icontains=term)
+                | Q(note__icontains=term)
+            )
+        return rank_search(Source.objects.all(), query, match)
+
+    @staticmethod
+    def search_projects(query: str):
+        return (
+            Project.objects.filter(name__icontains=query)
+            .annotate(
+                rank=TrigramSimilarity("name", query),
+            )
+            .order_by("-rank", "id")
+        )
@@ -0,0 +1,41 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the queued background jobs (TMDB restores, imports...). Start as many "
+        "workers as you need, they share the queue through the database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            help="Number of jobs this worker runs at the same time",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            help="Seconds to wait before looking again when the queue is empty",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Stop once the queue is empty instead of waiting for more jobs",
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options["concurrency"], poll_interval=options["poll_interval"]
+        )
+
+        # Let the running jobs finish when we are asked to stop (deploys, scaling down)
+        signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+
+        self.stdout.write(f"Starting worker {worker.name}")
+        worker.run(burst=options["burst"])
+        self.stdout.write("Worker stopped")
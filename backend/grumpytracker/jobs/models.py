@@ -0,0 +1,244 @@
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import registry
+
+
+class JobQuerySet(models.QuerySet):
+    def enqueue(
+        self,
+        name: str,
+        payload: Optional[Dict[str, Any]] = None,
+        user=None,
+        delay: float = 0,
+    ) -> "Job":
+        """
+        Queue a task for the workers
+        :param name: Name the task was registered with
+        :param payload: Keyword arguments for the task, has to be JSON serializable
+        :param user: Who asked for it, they can follow the job's progress
+        :param delay: Seconds to wait before the job can run
+        """
+        task = registry.get_task(name)
+        if task is None:
+            raise ValueError(f"Unknown task {name}")
+
+        return self.create(
+            name=name,
+            payload=payload or {},
+            max_attempts=task.max_attempts,
+            created_by=user if user and user.is_authenticated else None,
+            run_after=timezone.now() + timedelta(seconds=delay),
+        )
+
+    def claim(self, worker: str) -> Optional["Job"]:
+        """
+        Lock the next job that is ready and mark it as running. Workers skip the rows other
+        workers have locked so they never wait on each other or get the same job
+        :param worker: Name of the worker claiming the job
+        :returns: The job or None if there is nothing to do
+        """
+        limits = registry.get_limits()
+        # Tasks that are already running as many jobs as they are allowed
+        full = set()
+
+        while True:
+            with transaction.atomic():
+                job = (
+                    self.select_for_update(skip_locked=True)
+                    .filter(status=Job.QUEUED, run_after__lte=timezone.now())
+                    .exclude(name__in=full)
+                    .order_by("run_after", "id")
+                    .first()
+                )
+                if job is None:
+                    return None
+
+                limit = limits.get(job.name)
+                if limit and not self._has_slot(job.name, limit):
+                    # Every slot is taken, look for a job of another task
+                    full.add(job.name)
+                    continue
+
+                job.status = Job.RUNNING
+                job.attempts += 1
+                job.locked_by = worker
+                job.locked_at = job.started_at = timezone.now()
+                job.save(
+                    update_fields=[
+                        "status",
+                        "attempts",
+                        "locked_by",
+                        "locked_at",
+                        "started_at",
+                    ]
+                )
+
+                return job
+
+    def _has_slot(self, name: str, limit: int) -> bool:
+        """
+        Check there is room for another job of this task, has to run in the claiming
+        transaction. The advisory lock makes workers claiming the same task take turns
+        until the one before them commits, so the count is never out of date
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext(%s))", [f"jobs:{name}"]
+            )
+
+        return self.filter(status=Job.RUNNING, name=name).count() < limit
+
+    def requeue_stale(self) -> int:
+        """
+        Give back the jobs of workers that stopped without finishing them, a running job that
+        has not reported in for JOB_LOCK_TIMEOUT seconds is considered lost
+        :returns: The number of jobs we released
+        """
+        cutoff = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+        stale = self.filter(status=Job.RUNNING, locked_at__lt=cutoff)
+        error = "The worker stopped while running the job"
+
+        failed = stale.filter(attempts__gte=models.F("max_attempts")).update(
+            status=Job.FAILED, error=error, finished_at=timezone.now(), locked_by=""
+        )
+        requeued = stale.update(status=Job.QUEUED, error=error, locked_by="")
+
+        return failed + requeued
+
+
+class Job(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    result = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default="")
+    # Whatever the task reports, usually done and total
+    progress = models.JSONField(default=dict, blank=True)
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    run_after = models.DateTimeField(default=timezone.now)
+
+    # The worker running the job and when we last heard from it
+    locked_by = models.CharField(max_length=100, blank=True, default="")
+    locked_at = models.DateTimeField(blank=True, null=True)
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Workers only ever look at queued jobs, keep the index to those
+            models.Index(
+                fields=["run_after", "id"],
+                condition=Q(status="queued"),
+                name="jobs_job_queued_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def owned(self) -> models.QuerySet:
+        """
+        The job's row while we still hold it, once a job was given to another worker the
+        one that lost it can't change it anymore
+        """
+        return Job.objects.filter(id=self.id, status=Job.RUNNING, locked_by=self.locked_by)
+
+    def heartbeat(self) -> bool:
+        """
+        Tell the other workers we are still running the job
+        :returns: False if the job is not ours anymore
+        """
+        self.locked_at = timezone.now()
+        return bool(self.owned().update(locked_at=self.locked_at))
+
+    def set_progress(self, **progress: Any) -> None:
+        """
+        Save the task's progress, this also tells the other workers we are still alive
+        """
+        self.progress = progress
+        self.locked_at = timezone.now()
+        self.owned().update(progress=self.progress, locked_at=self.locked_at)
+
+    def finish(self, result: Any = None) -> bool:
+        """
+        Save the task's result
+        :returns: False if the job was given to another worker, we leave it to them
+        """
+        return self._save_outcome(
+            status=Job.DONE, result=result, error="", finished_at=timezone.now()
+        )
+
+    def fail(self, error: str) -> bool:
+        """
+        Queue the job again with an exponential backoff, or mark it as failed if it is out
+        of attempts
+        :returns: False if the job was given to another worker, we leave it to them
+        """
+        if self.attempts < self.max_attempts:
+            delay = settings.JOB_RETRY_DELAY * 2 ** (self.attempts - 1)
+            changes = {
+                "status": Job.QUEUED,
+                "run_after": timezone.now() + timedelta(seconds=delay),
+            }
+        else:
+            changes = {"status": Job.FAILED, "finished_at": timezone.now()}
+
+        return self._save_outcome(error=error, **changes)
+
+    def _save_outcome(self, **changes: Any) -> bool:
+        """
+        Save how the job went and release it, if it's still ours
+        """
+        changes["locked_by"] = ""
+        if not self.owned().update(**changes):
+            return False
+
+        for field, value in changes.items():
+            setattr(self, field, value)
+        return True
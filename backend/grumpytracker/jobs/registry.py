@@ -0,0 +1,56 @@
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+
+
+class Task:
+    """
+    A function the workers know how to run. It is called with the job and the job's payload
+    as keyword arguments, what it returns is saved as the job's result
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        max_attempts: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+        # How many jobs of this task can run at the same time across every worker
+        self.concurrency = concurrency
+
+
+_tasks: Dict[str, Task] = {}
+
+
+def task(
+    name: str, max_attempts: Optional[int] = None, concurrency: Optional[int] = None
+) -> Callable:
+    """
+    Register a function as a background task
+    :param name: Name used to queue the task (projects.restore)
+    :param max_attempts: How many times we try before giving up, defaults to JOB_MAX_ATTEMPTS
+    :param concurrency: Max number of jobs of this task running at once, None for no limit
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        _tasks[name] = Task(
+            name, func, max_attempts=max_attempts, concurrency=concurrency
+        )
+        return func
+
+    return decorator
+
+
+def get_task(name: str) -> Optional[Task]:
+    return _tasks.get(name)
+
+
+def get_limits() -> Dict[str, int]:
+    """
+    The concurrency limit of every task that has one
+    """
+    return {name: t.concurrency for name, t in _tasks.items() if t.concurrency}
@@ -0,0 +1,24 @@
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from jobs.models import Job
+
+
+@pytest.mark.django_db(transaction=True)
+class TestRunWorkerCommand:
+    """
+    Tests for the run_worker management command
+    """
+
+    def test_run_worker_burst(self, test_tasks):
+        """
+        A burst worker runs everything that is queued, on its threads, and stops
+        """
+        jobs = [Job.objects.enqueue("tests.echo", {"n": n}) for n in range(5)]
+
+        out = StringIO()
+        call_command("run_worker", concurrency=2, burst=True, stdout=out)
+
+        assert "Worker stopped" in out.getvalue()
+        assert set(Job.objects.values_list("status", flat=True)) == {Job.DONE}
+        assert sorted(call["n"] for call in test_tasks) == list(range(len(jobs)))
@@ -0,0 +1,186 @@
+import pytest
+from datetime import timedelta
+from django.utils import timezone
+from jobs.models import Job
+from jobs.worker import Worker
+
+
+@pytest.mark.django_db
+class TestJobQueue:
+    """
+    Tests for queuing, claiming and running jobs
+    """
+
+    def test_enqueue(self, test_tasks, regular_user):
+        """
+        A queued job should wait for a worker with the task's settings
+        """
+        job = Job.objects.enqueue("tests.flaky", user=regular_user)
+
+        assert job.status == Job.QUEUED
+        assert job.max_attempts == 2
+        assert job.created_by == regular_user
+
+    def test_enqueue_unknown_task(self):
+        """
+        We can't queue a task nobody registered
+        """
+        with pytest.raises(ValueError):
+            Job.objects.enqueue("tests.nope")
+
+    def test_run_job(self, test_tasks):
+        """
+        Running a job calls the task with the payload and saves its result
+        """
+        job = Job.objects.enqueue("tests.echo", {"name": "Alexa 35"})
+
+        assert Worker().run_once().id == job.id
+
+        job.refresh_from_db()
+        assert job.status == Job.DONE
+        assert job.result == {"name": "Alexa 35"}
+        assert job.attempts == 1
+        assert job.finished_at is not None
+        assert test_tasks == [{"name": "Alexa 35"}]
+
+        # Nothing left to do
+        assert Worker().run_once() is None
+
+    def test_claim_order(self, test_tasks):
+        """
+        Jobs run in the order they were queued, delayed jobs wait their turn
+        """
+        later = Job.objects.enqueue("tests.echo", {"order": 0}, delay=60)
+        first = Job.objects.enqueue("tests.echo", {"order": 1})
+        second = Job.objects.enqueue("tests.echo", {"order": 2})
+
+        assert Job.objects.claim("test").id == first.id
+        assert Job.objects.claim("test").id == second.id
+        assert Job.objects.claim("test") is None
+
+        later.refresh_from_db()
+        assert later.status == Job.QUEUED
+
+    def test_retry(self, test_tasks):
+        """
+        Failed jobs are retried later until they run out of attempts
+        """
+        job = Job.objects.enqueue("tests.flaky")
+
+        Worker().run_once()
+        job.refresh_from_db()
+        assert job.status == Job.QUEUED
+        assert job.error == "TMDB is down"
+        assert job.run_after > timezone.now()
+
+        # The retry waits for its backoff
+        assert Worker().run_once() is None
+
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        Worker().run_once()
+        job.refresh_from_db()
+        assert job.status == Job.FAILED
+        assert job.attempts == 2
+        assert job.finished_at is not None
+
+    def test_concurrency_limit(self, test_tasks):
+        """
+        A task with a concurrency limit never runs more jobs than it is allowed, other tasks
+        still get their turn
+        """
+        first = Job.objects.enqueue("tests.limited")
+        Job.objects.enqueue("tests.limited")
+        echo = Job.objects.enqueue("tests.echo")
+
+        running = Job.objects.claim("test")
+        assert running.id == first.id
+        # The second limited job has to wait for the first one
+        assert Job.objects.claim("test").id == echo.id
+        assert Job.objects.claim("test") is None
+
+        running.finish()
+        assert Job.objects.claim("test").name == "tests.limited"
+
+    def test_requeue_stale(self, test_tasks, settings):
+        """
+        Jobs of workers that stopped are given back, or failed if they are out of attempts
+        """
+        settings.JOB_LOCK_TIMEOUT = 60
+        retry = Job.objects.enqueue("tests.echo")
+        last_try = Job.objects.enqueue("tests.flaky")
+        alive = Job.objects.enqueue("tests.echo")
+
+        Job.objects.all().update(status=Job.RUNNING, attempts=1)
+        Job.objects.filter(id=last_try.id).update(attempts=2)
+        Job.objects.exclude(id=alive.id).update(
+            locked_at=timezone.now() - timedelta(minutes=5)
+        )
+        Job.objects.filter(id=alive.id).update(locked_at=timezone.now())
+
+        assert Job.objects.requeue_stale() == 2
+
+        statuses = dict(Job.objects.values_list("id", "status"))
+        assert statuses == {
+            retry.id: Job.QUEUED,
+            last_try.id: Job.FAILED,
+            alive.id: Job.RUNNING,
+        }
+
+    def test_progress(self, test_tasks):
+        """
+        Reporting progress saves it and keeps the job's lock fresh
+        """
+        job = Job.objects.enqueue("tests.echo")
+        job = Job.objects.claim("test")
+        locked_at = job.locked_at
+
+        job.set_progress(done=5, total=10)
+
+        job.refresh_from_db()
+        assert job.progress == {"done": 5, "total": 10}
+        assert job.locked_at > locked_at
+
+    def test_finish_lost_job(self, test_tasks, settings):
+        """
+        A worker whose job was given to another worker should leave it alone when it
+        finishes or fails
+        """
+        settings.JOB_LOCK_TIMEOUT = 60
+        Job.objects.enqueue("tests.echo")
+        lost = Job.objects.claim("a")
+        Job.objects.filter(id=lost.id).update(
+            locked_at=timezone.now() - timedelta(minutes=5)
+        )
+        Job.objects.requeue_stale()
+        Job.objects.claim("b")
+
+        assert lost.finish("late") is False
+        assert lost.fail("late") is False
+        assert lost.heartbeat() is False
+
+        job = Job.objects.get(id=lost.id)
+        assert (job.status, job.locked_by, job.result) == (Job.RUNNING, "b", None)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestWorkerHeartbeat:
+    """
+    Tests for keeping the lock of a long job fresh, the heartbeat runs on its own
+    connection so these need committed rows
+    """
+
+    def test_long_job_is_not_requeued(self, test_tasks, settings):
+        """
+        A job that runs past JOB_LOCK_TIMEOUT without reporting progress should stay
+        with its worker and run once
+        """
+        settings.JOB_LOCK_TIMEOUT = 0.3
+        settings.JOB_HEARTBEAT_INTERVAL = 0.05
+        job = Job.objects.enqueue("tests.slow", {"seconds": 0.8})
+
+        Worker().run_once()
+
+        job.refresh_from_db()
+        assert job.status == Job.DONE
+        assert job.result == 0
+        assert job.attempts == 1
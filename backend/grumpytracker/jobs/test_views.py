@@ -0,0 +1,85 @@
+import pytest
+from django.urls import reverse
+from jobs.models import Job
+
+
+@pytest.mark.django_db
+class TestJobViews:
+    """
+    Tests for the job status endpoints
+    """
+
+    def test_get_job(self, client, regular_user, test_tasks):
+        """
+        Users can follow the jobs they started
+        """
+        job = Job.objects.enqueue("tests.echo", {"a": 1}, user=regular_user)
+        client.force_login(regular_user)
+
+        res = client.get(reverse("job", args=[job.id]))
+
+        assert res.status_code == 200
+        data = res.json()
+        assert data["id"] == job.id
+        assert data["status"] == "queued"
+        assert data["name"] == "tests.echo"
+
+    def test_get_job_other_user(self, client, regular_user, admin_user, test_tasks):
+        """
+        Users can't see other users' jobs, admins can
+        """
+        job = Job.objects.enqueue("tests.echo", user=admin_user)
+
+        client.force_login(regular_user)
+        res = client.get(reverse("job", args=[job.id]))
+        assert res.status_code == 403
+
+        client.force_login(admin_user)
+        res = client.get(reverse("job", args=[job.id]))
+        assert res.status_code == 200
+
+    def test_get_job_not_found(self, admin_client):
+        """
+        Unknown jobs return a 404
+        """
+        res = admin_client.get(reverse("job", args=[999]))
+
+        assert res.status_code == 404
+
+    def test_get_job_not_authenticated(self, client, test_tasks):
+        """
+        We need to log in to see a job
+        """
+        job = Job.objects.enqueue("tests.echo")
+
+        res = client.get(reverse("job", args=[job.id]))
+
+        assert res.status_code == 401
+
+    def test_list_jobs(self, admin_client, test_tasks):
+        """
+        Admins can list the jobs and filter them by status and name
+        """
+        Job.objects.enqueue("tests.echo")
+        Job.objects.enqueue("tests.flaky")
+        Job.objects.filter(name="tests.flaky").update(status=Job.FAILED)
+
+        res = admin_client.get(reverse("jobs"))
+        assert res.status_code == 200
+        assert len(res.json()) == 2
+
+        res = admin_client.get(reverse("jobs", query={"status": "failed"}))
+        assert [job["name"] for job in res.json()] == ["tests.flaky"]
+
+        res = admin_client.get(reverse("jobs", query={"name": "tests.echo"}))
+        assert [job["name"] for job in res.json()] == ["tests.echo"]
+
+    def test_list_jobs_not_admin(self, client, regular_user):
+        """
+        Only admins can list the jobs
+        """
+        client.force_login(regular_user)
+
+        res = client.get(reverse("jobs"))
+
+        assert res.status_code == 403
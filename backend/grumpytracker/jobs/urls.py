@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path("", views.JobsListView.as_view(), name="jobs"),
+    path("<int:job_id>", views.JobDetailsView.as_view(), name="job"),
+]
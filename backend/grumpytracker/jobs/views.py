@@ -0,0 +1,48 @@
+from django.views import View
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from django.shortcuts import get_object_or_404
+from django.http import JsonResponse
+from grumpytracker.utils import login_required, require_admin
+from grumpytracker.pagination import paginate
+from .models import Job
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class JobsListView(View):
+    """
+    Handle jobs/ endpoint
+    GET - Returns the background jobs, filter them with status and name
+    """
+
+    @method_decorator(require_admin)
+    def get(self, request):
+        jobs = Job.objects.all()
+
+        status = request.GET.get("status")
+        if status:
+            jobs = jobs.filter(status=status)
+
+        name = request.GET.get("name")
+        if name:
+            jobs = jobs.filter(name=name)
+
+        return paginate(request, jobs)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class JobDetailsView(View):
+    """
+    Handle jobs/<int:job_id> endpoint
+    GET - Returns the status, progress and result of a job
+    """
+
+    @method_decorator(login_required)
+    def get(self, request, job_id):
+        job = get_object_or_404(Job, id=job_id)
+
+        # Users can follow the jobs they started, admins can follow all of them
+        if job.created_by_id != request.user.id and not request.user.is_superuser:
+            return JsonResponse({"error": "Permission denied!"}, status=403)
+
+        return JsonResponse(job.as_dict())
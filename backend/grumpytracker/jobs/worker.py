@@ -0,0 +1,136 @@
+import os
+import socket
+import threading
+import time
+from typing import Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from loguru import logger
+
+from . import registry
+from .models import Job
+
+
+class Worker:
+    """
+    Runs queued jobs on a few threads. Start as many workers as you like (on as many machines
+    as you like), the database makes sure every job is only run once
+    """
+
+    def __init__(
+        self, concurrency: Optional[int] = None, poll_interval: Optional[float] = None
+    ) -> None:
+        self.concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self.poll_interval = poll_interval or settings.JOB_POLL_INTERVAL
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._stopping = threading.Event()
+
+    def run_job(self, job: Job) -> None:
+        """
+        Run a claimed job and save how it went, exceptions are caught and the job is retried
+        """
+        task = registry.get_task(job.name)
+        if task is None:
+            # Most likely queued by a newer version of the code, give another worker a go
+            job.fail(f"Unknown task {job.name}")
+            return
+
+        logger.info(f"Running job {job.id} ({job.name}), attempt {job.attempts}")
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self.heartbeat, args=(job, done), name=f"heartbeat-{job.id}"
+        )
+        heartbeat.start()
+        try:
+            result = task.func(job, **job.payload)
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.name}) failed: {e}")
+            saved = job.fail(str(e))
+        else:
+            saved = job.finish(result)
+        finally:
+            done.set()
+            heartbeat.join()
+
+        if not saved:
+            logger.warning(
+                f"Job {job.id} ({job.name}) was given to another worker while it ran"
+            )
+
+    def heartbeat(self, job: Job, done: threading.Event) -> None:
+        """
+        Keep a running job's lock fresh so tasks that don't report progress for a while
+        aren't taken for lost and run a second time
+        """
+        try:
+            while not done.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                if not job.heartbeat():
+                    return
+        finally:
+            # The thread has its own connection
+            connections.close_all()
+
+    def run_once(self) -> Optional[Job]:
+        """
+        Claim and run a single job
+        :returns: The job we ran or None if the queue was empty
+        """
+        job = Job.objects.claim(self.name)
+        if job is not None:
+            self.run_job(job)
+
+        return job
+
+    def work(self, burst: bool = False) -> None:
+        """
+        Keep running jobs until we are stopped, or until the queue is empty with burst
+        """
+        try:
+            while not self._stopping.is_set():
+                # Like after a request, drop connections that broke or got too old
+                close_old_connections()
+                if self.run_once() is None:
+                    if burst:
+                        return
+                    self._stopping.wait(self.poll_interval)
+        finally:
+            connections.close_all()
+
+    def run(self, burst: bool = False) -> None:
+        """
+        Start the threads and wait for them, jobs that were left behind by workers that
+        died are released every JOB_LOCK_TIMEOUT seconds
+        """
+        logger.info(f"Worker {self.name} started with {self.concurrency} threads")
+        Job.objects.requeue_stale()
+
+        threads = [
+            threading.Thread(target=self.work, args=(burst,), name=f"worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+
+        last_check = time.monotonic()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(self.poll_interval)
+                if time.monotonic() - last_check < settings.JOB_LOCK_TIMEOUT:
+                    continue
+
+                last_check = time.monotonic()
+                released = Job.objects.requeue_stale()
+                if released:
+                    logger.warning(f"Released {released} jobs from stopped workers")
+        except KeyboardInterrupt:
+            logger.info("Stopping, waiting for the running jobs to finish")
+            self.stop()
+        finally:
+            for thread in threads:
+                thread.join()
+            connections.close_all()
+
+    def stop(self) -> None:
+        self._stopping.set()
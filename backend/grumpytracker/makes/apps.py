@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class MakesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'makes'
+
+    def ready(self):
+        from blobs.references import track_files
+        from grumpytracker.cache import track_changes
+
+        # Edits to makes invalidate the cached catalogue responses
+        track_changes(self.get_model('Make'))
+
+        # The logos are shared files, gc_media removes them once nobody uses them
+        track_files(self.get_model('Make'))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:29
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('makes', '0002_make_logo'),
+    ]
+
+    operations = [
+        # The trigram indexes on every searchable model need pg_trgm
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='make',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='make_name_upper_trgm'),
+        ),
+    ]
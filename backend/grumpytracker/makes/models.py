@@ -1,10 +1,29 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models import Count
+from django.db.models.functions import Upper
 from django.core.files import File
 from django.conf import settings
+from grumpytracker.images import image_variants
 import os
 
 
+class MakeQuerySet(models.QuerySet):
+    """
+    Shared queries for makes
+    """
+
+    def with_cameras_count(self) -> "MakeQuerySet":
+        """
+        Count each make's cameras in the same query, as_dict will use this instead of
+        running a COUNT per make
+        """
+        return self.annotate(cameras_count=Count('cameras'))
+
+
 class Make(models.Model):
+    objects = MakeQuerySet.as_manager()
+
     name = models.CharField(max_length=100)
     website = models.URLField(blank=True)
     logo = models.ImageField(upload_to='make_logos', blank=True, null=True)
@@ -13,9 +32,28 @@ class Make(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # icontains compiles to UPPER(field) LIKE UPPER(term), this index matches that
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='make_name_upper_trgm'),
+        ]
+
     def __str__(self):
         return str(self.name)
 
+    def save(self, *args, **kwargs):
+        """
+        Overrides the model's save function. The make's name is part of its cameras search
+        documents so we rebuild them as well
+        """
+        super().save(*args, **kwargs)
+
+        # The cameras come back with this make as their make, so no query per camera
+        cameras = list(self.cameras.all())
+        for camera in cameras:
+            camera.search_vector = camera.build_search_vector()
+        self.cameras.model.objects.bulk_update(cameras, ['search_vector'], batch_size=500)
+
     @classmethod
     def create_with_logo(cls, name, website, logo_file=None, logo_path=None):
         """
@@ -43,12 +81,18 @@ class Make(models.Model):
         self.logo.save(logo_file.name, logo_file, save=True)
 
     def as_dict(self):
+        # Use the annotated count when we were loaded through with_cameras_count
+        cameras_count = getattr(self, 'cameras_count', None)
+        if cameras_count is None:
+            cameras_count = self.cameras.count()
+
         return {
             'id': self.id,
             'name': self.name,
             'website': self.website,
             'logo': self.logo.url if self.logo else None,
-            'cameras_count': self.cameras.count(),
+            'logo_variants': image_variants(self.logo),
+            'cameras_count': cameras_count,
         }
 
     def with_cameras(self):
@@ -1,4 +1,7 @@
 import pytest
+from blobs.models import Blob
+from cameras.models import Camera
+from django.contrib.postgres.search import SearchQuery
 from django.core.files.uploadedfile import SimpleUploadedFile
 from makes.models import Make
 
@@ -41,7 +44,8 @@ class TestMakeModel:
         assert make.website == "https://www.cannon.com"
         assert make.logo is not None
         assert make.logo.name is not None
-        assert "image_on_disk" in make.logo.name
+        with open(sample_image_file, "rb") as f:
+            assert make.logo.read() == f.read()
 
         # Finally check that we actually created a file
         assert make.logo.file is not None
@@ -76,7 +80,8 @@ class TestMakeModel:
         assert make.website == "https://www.cannon.com"
         assert make.logo is not None
         assert make.logo.name is not None
-        assert "test_uploaded_image" in make.logo.name
+        sample_uploaded_file.seek(0)
+        assert make.logo.read() == sample_uploaded_file.read()
 
     def test_update_logo(self, sample_uploaded_file, temp_media_dir):
         """
@@ -98,7 +103,8 @@ class TestMakeModel:
         # Confirm that the logo has been updated
         assert make.logo is not None
         assert make.logo.name is not None
-        assert "test_uploaded_image" in make.logo.name
+        sample_uploaded_file.seek(0)
+        assert make.logo.read() == sample_uploaded_file.read()
 
     def test_update_and_replace_logo(self, sample_uploaded_file, temp_media_dir):
         """
@@ -122,7 +128,12 @@ class TestMakeModel:
 
         # Confirm that the logo has been updated
         assert make.logo.name != initial_logo_name
-        assert "test_uploaded_image" in make.logo.name
+        sample_uploaded_file.seek(0)
+        assert make.logo.read() == sample_uploaded_file.read()
+
+        # The old file lost its only reference, gc_media can remove it
+        assert Blob.objects.get(name=initial_logo_name).refcount == 0
+        assert Blob.objects.get(name=make.logo.name).refcount == 1
 
     def test_make_str(self):
         """
@@ -156,15 +167,48 @@ class TestMakeModel:
         )
         result = make.as_dict()
 
-        expected_keys = {"id", "name", "website", "logo", "cameras_count"}
+        expected_keys = {
+            "id",
+            "name",
+            "website",
+            "logo",
+            "logo_variants",
+            "cameras_count",
+        }
 
         assert set(result.keys()) == expected_keys
         assert result["id"] == make.id
         assert result["name"] == make.name
         assert result["website"] == make.website
         assert result["logo"] is None
+        assert result["logo_variants"] is None
         assert result["cameras_count"] == 0
 
+    def test_as_dict_with_cameras_count(self, multiple_cameras, django_assert_num_queries):
+        """
+        Makes loaded with their cameras count should not run another query to count them
+        """
+        makes = list(Make.objects.with_cameras_count().order_by("id"))
+
+        with django_assert_num_queries(0):
+            results = [make.as_dict() for make in makes]
+
+        assert [result["cameras_count"] for result in results] == [2, 2]
+
+    def test_rename_rebuilds_search_vectors(self, multiple_cameras, django_assert_num_queries):
+        """
+        Renaming a make rebuilds its cameras search documents with one update, however
+        many cameras it has
+        """
+        make = Make.objects.get(name="Arri")
+        make.name = "Grumpy"
+        with django_assert_num_queries(5):
+            make.save()
+
+        grumpy = SearchQuery("grumpy", config="simple")
+        found = Camera.objects.filter(search_vector=grumpy).order_by("model")
+        assert [camera.model for camera in found] == ["Alexa 35", "Alexa Mini LF"]
+
     def test_with_cameras(self):
         """
         A make should return cameras that are attached to it (or an empty list in this case)
@@ -172,6 +216,14 @@ class TestMakeModel:
         make = Make.objects.create(name="Fujifilm", website="https://www.fujifilm.com")
         result = make.with_cameras()
 
-        expected_keys = {"id", "name", "website", "logo", "cameras_count", "cameras"}
+        expected_keys = {
+            "id",
+            "name",
+            "website",
+            "logo",
+            "logo_variants",
+            "cameras_count",
+            "cameras",
+        }
         assert set(result.keys()) == expected_keys
         assert result["cameras"] == []
@@ -48,10 +48,69 @@ class TestMakeListView:
                 "name",
                 "website",
                 "logo",
+                "logo_variants",
                 "cameras_count",
             }
             assert set(make_data.keys()) == expected_keys
 
+    @pytest.mark.django_db
+    def test_get_all_makes_query_count(
+        self, client, multiple_cameras, django_assert_num_queries
+    ):
+        """
+        Listing makes and their cameras count should take a single query, plus one for the
+        model versions
+        """
+
+        with django_assert_num_queries(2):
+            res = client.get(reverse("makes"))
+
+        assert res.status_code == 200
+        data = res.json()
+        assert [make["cameras_count"] for make in data] == [2, 2]
+
+    @pytest.mark.django_db
+    def test_get_makes_paginated(self, client, multiple_makes):
+        """
+        We should be able to walk through all makes one page at a time
+        """
+
+        names = []
+        params = {"limit": 2}
+        while True:
+            res = client.get(reverse("makes"), params)
+            assert res.status_code == 200
+
+            data = res.json()
+            names.extend(make["name"] for make in data["results"])
+            if not data["next"]:
+                break
+            params["after"] = data["next"]
+
+        assert names == ["Canon", "Sony", "Panasonic"]
+
+    @pytest.mark.django_db
+    def test_get_all_makes_cached(
+        self, client, admin_client, multiple_makes, django_assert_num_queries
+    ):
+        """
+        A second read should come from the cache until an admin adds a make
+        """
+        res = client.get(reverse("makes"))
+        assert len(res.json()) == 3
+
+        # Only the model versions
+        with django_assert_num_queries(1):
+            res = client.get(reverse("makes"))
+        assert len(res.json()) == 3
+
+        admin_client.post(
+            reverse("makes"), {"name": "Arri", "website": "https://www.arri.com"}
+        )
+
+        res = client.get(reverse("makes"))
+        assert len(res.json()) == 4
+
     @pytest.mark.django_db
     def test_create_make_no_logo(self, admin_client):
         """
@@ -89,7 +148,8 @@ class TestMakeListView:
         # Check the database to make sure the record was created
         make = Make.objects.get(name="Arri With Logo")
         assert make.logo is not None
-        assert "test_uploaded_image" in make.logo.name
+        sample_uploaded_file.seek(0)
+        assert make.logo.read() == sample_uploaded_file.read()
 
     @pytest.mark.django_db
     def test_create_make_with_missing_fields(self, admin_client):
@@ -158,11 +218,37 @@ class TestMakeDetailsView:
         assert res.status_code == 200
 
         data = res.json()
-        expected_keys = {"id", "name", "website", "logo", "cameras_count", "cameras"}
+        expected_keys = {
+            "id",
+            "name",
+            "website",
+            "logo",
+            "logo_variants",
+            "cameras_count",
+            "cameras",
+        }
         assert set(data.keys()) == expected_keys
         assert data["name"] == "Sample Make"
         assert data["cameras"] == []
 
+    @pytest.mark.django_db
+    def test_get_make_details_query_count(
+        self, client, multiple_cameras, django_assert_num_queries
+    ):
+        """
+        Make details should take two queries (make and cameras) no matter how many cameras it has,
+        plus one for the model versions
+        """
+        make = multiple_cameras[0].make
+
+        with django_assert_num_queries(3):
+            res = client.get(reverse("make", args=[make.id]))
+
+        assert res.status_code == 200
+        data = res.json()
+        assert data["cameras_count"] == 2
+        assert len(data["cameras"]) == 2
+
     @pytest.mark.django_db
     def test_get_make_details_not_found(self, client):
         """
@@ -229,7 +315,8 @@ class TestMakeDetailsView:
         assert single_make.name == "Updated Make"
         assert single_make.website == "https://www.updated-make.com"
         assert single_make.logo is not None
-        assert "test_uploaded_image" in single_make.logo.name
+        sample_uploaded_file.seek(0)
+        assert single_make.logo.read() == sample_uploaded_file.read()
 
     @pytest.mark.django_db
     def test_patch_make_details_not_authenticated(self, client, single_make):
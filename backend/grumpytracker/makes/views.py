@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import TrigramSimilarity
 from django.http import JsonResponse
 from django.views import View
 from django.utils.decorators import method_decorator
@@ -5,6 +6,8 @@ from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import get_object_or_404
 from django.http.multipartparser import MultiPartParser
 from grumpytracker.utils import validate_required_fields, require_admin
+from grumpytracker.pagination import paginate
+from grumpytracker.cache import cache_response, conditional_response
 import json
 from loguru import logger
 
@@ -19,18 +22,14 @@ class MakesListView(View):
     POST - Creates a new manufacturer
     """
 
+    @method_decorator(conditional_response("makes.Make", "cameras.Camera"))
+    @method_decorator(cache_response("makes.Make", "cameras.Camera"))
     def get(self, request) -> JsonResponse:
         """
-        Return all existing manufacturers
+        Return all existing manufacturers, pass limit and after to page through them
         """
 
-        makes = Make.objects.all()
-        data = []
-
-        for make in makes:
-            data.append(make.as_dict())
-
-        return JsonResponse(data, safe=False)
+        return paginate(request, Make.objects.with_cameras_count())
 
     @method_decorator(require_admin)
     def post(self, request) -> JsonResponse:
@@ -73,12 +72,14 @@ class MakeDetailsView(View):
     DELETE - Delete a manufacturer
     """
 
+    @method_decorator(conditional_response("makes.Make", "cameras.Camera"))
+    @method_decorator(cache_response("makes.Make", "cameras.Camera"))
     def get(self, request, make_id: int) -> JsonResponse:
         """
         Get a manufacturer by its interanl ID
         :param make_id: ID of camera maker in the database
         """
-        make = get_object_or_404(Make, id=make_id)
+        make = get_object_or_404(Make.objects.with_cameras_count(), id=make_id)
         return JsonResponse(make.with_cameras(), safe=False)
 
     @method_decorator(require_admin)
@@ -134,13 +135,20 @@ class MakesSearchView(View):
     GET - Returns the a list of makes based on a search query
     """
 
+    @method_decorator(conditional_response("makes.Make"))
+    @method_decorator(cache_response("makes.Make"))
     def get(self, request) -> JsonResponse:
         """
         Search the database for a make based on its name
         """
         query = request.GET.get("q", "")
         if query:
-            makes = Make.objects.filter(name__icontains=query)
+            # Closest names first
+            makes = (
+                Make.objects.filter(name__icontains=query)
+                .annotate(similarity=TrigramSimilarity("name", query))
+                .order_by("-similarity", "id")
+            )
             found_makes = []
             for make in makes:
                 found_makes.append(
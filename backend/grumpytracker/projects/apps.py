@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'projects'
+
+    def ready(self):
+        from grumpytracker.cache import track_changes
+
+        # Edits to projects, their formats and votes change the projects ETags
+        track_changes(self.get_model('Project'))
+        track_changes(self.get_model('ProjectFormat'))
+        track_changes(self.get_model('Vote'))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_alter_project_description_alter_project_genres_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TMDBCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('path', models.CharField(max_length=255)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('data', models.JSONField()),
+                ('fetched_at', models.DateTimeField()),
+                ('last_used_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_tmdbcacheentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='project',
+            name='tmdb_id',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:10
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cameras', '0004_camera_search_vector_camera_camera_search_vector_gin_and_more'),
+        ('formats', '0005_format_format_anamorphic_image_idx_and_more'),
+        ('projects', '0004_alter_project_tmdb_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='project_name_upper_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['project', 'fmt', 'vote_type'], name='vote_project_fmt_type_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 03:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_project_project_name_upper_trgm_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TMDBCacheCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=50)),
+                ('name', models.CharField(max_length=20)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('endpoint', 'name')},
+            },
+        ),
+    ]
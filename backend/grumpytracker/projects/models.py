@@ -1,4 +1,9 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from typing import Dict, Tuple
+
+from django.db import connection, models
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Upper
 from formats.models import Format
 from users.models import User
 
@@ -18,7 +23,7 @@ class Project(models.Model):
     adult = models.BooleanField(default=False)
 
     # Data cache from TMDB
-    tmdb_id = models.IntegerField(blank=True, null=True)
+    tmdb_id = models.IntegerField(blank=True, null=True, db_index=True)
     tmdb_original_name = models.CharField(max_length=100, blank=True, null=True)
     genres = models.JSONField(default=list, blank=True, null=True)
     rating = models.JSONField(default=list, blank=True, null=True)
@@ -37,6 +42,15 @@ class Project(models.Model):
         related_name="used_in_projects",  # The backref name
     )
 
+    class Meta:
+        indexes = [
+            # icontains compiles to UPPER(field) LIKE UPPER(term), this index matches that
+            GinIndex(
+                OpClass(Upper("name"), name="gin_trgm_ops"),
+                name="project_name_upper_trgm",
+            ),
+        ]
+
     def as_dict(self):
         return {
             "id": self.id,
@@ -52,40 +66,56 @@ class Project(models.Model):
             "rating": self.rating,
         }
 
+    def voted_formats(self, user=None):
+        """
+        The project's formats annotated with their up and down votes, and how the user voted
+        if we have one. The votes are aggregated by the database in the same query
+        """
+        # The same format can be voted on in other projects so we only count this project's votes
+        project_votes = Q(vote__project=self)
+        formats = self.formats.for_serialization().annotate(
+            up_votes=Count("vote", filter=project_votes & Q(vote__vote_type="up")),
+            down_votes=Count("vote", filter=project_votes & Q(vote__vote_type="down")),
+        )
+
+        # If we have a user check how they voted, this is a subquery so it runs with the
+        # rest of the aggregation
+        if user is not None:
+            user_votes = Vote.objects.filter(project=self, fmt=OuterRef("pk"), user=user)
+            formats = formats.annotate(
+                user_vote=Subquery(user_votes.values("vote_type")[:1])
+            )
+        else:
+            formats = formats.annotate(
+                user_vote=Value(None, output_field=models.CharField())
+            )
+
+        return formats
+
     def with_formats(self, user=None):
         """
-        Returns the project with its cameras and formats AND the votes on each format
+        Returns the project with its cameras and formats AND the votes on each format.
+        The number of queries stays the same no matter how many formats are attached
+        to the project
         """
         formats_with_votes = []
-
-        for fmt in self.formats.all():
-            # Get vote counts for each format
-            votes = Vote.objects.filter(project=self, fmt=fmt)
-            up_votes = votes.filter(vote_type="up").count()
-            down_votes = votes.filter(vote_type="down").count()
-
-            # If we have a user check how they voted
-            user_vote = None
-            if user is not None:
-                try:
-                    user_vote_obj = Vote.objects.get(project=self, fmt=fmt, user=user)
-                    user_vote = user_vote_obj.vote_type
-                except Vote.DoesNotExist:
-                    user_vote = None
+        for fmt in self.voted_formats(user=user):
             format_data = {
                 **fmt.as_dict(),
-                "up_votes": up_votes,
-                "down_votes": down_votes,
-                "total_votes": up_votes + down_votes,
-                "score": up_votes - down_votes,
-                "user_vote": user_vote,
+                "up_votes": fmt.up_votes,
+                "down_votes": fmt.down_votes,
+                "total_votes": fmt.up_votes + fmt.down_votes,
+                "score": fmt.up_votes - fmt.down_votes,
+                "user_vote": fmt.user_vote,
             }
 
             formats_with_votes.append(format_data)
 
         return {
             **self.as_dict(),
-            "cameras": [cam.as_dict() for cam in self.cameras.all()],
+            "cameras": [
+                cam.as_dict() for cam in self.cameras.select_related("make")
+            ],
             "formats": formats_with_votes,
         }
 
@@ -123,7 +153,80 @@ class Vote(models.Model):
 
     class Meta:
         unique_together = ["project", "fmt", "user"]
+        indexes = [
+            # Counting a project's up and down votes per format only needs the index
+            models.Index(
+                fields=["project", "fmt", "vote_type"], name="vote_project_fmt_type_idx"
+            ),
+        ]
 
     def __str__(self):
         # TODO: This was set up like __repr__ which is technically wrong
         return f"<Vote Project: {self.project} Format: {self.fmt} User: {self.user} Vote: {self.vote_type}>"
+
+
+class TMDBCacheEntry(models.Model):
+    """
+    A TMDB response we already fetched, keyed by the endpoint and its params
+    """
+
+    key = models.CharField(max_length=64, unique=True)
+    path = models.CharField(max_length=255)
+    params = models.JSONField(default=dict, blank=True)
+    data = models.JSONField()
+
+    # When we got the data from TMDB, this is what the TTL is checked against
+    fetched_at = models.DateTimeField()
+    # When the entry was last read, we evict the least recently used entries first
+    last_used_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"<TMDBCacheEntry {self.path} {self.params}>"
+
+
+class TMDBCacheCounterQuerySet(models.QuerySet):
+    def add(self, counts: Dict[Tuple[str, str], int]) -> None:
+        """
+        Add to the counters in a single statement, every worker adds to the same rows
+        :param counts: How much to add, by endpoint and counter name
+        """
+        counts = {key: amount for key, amount in counts.items() if amount}
+        if not counts:
+            return
+
+        table = self.model._meta.db_table
+        rows = ", ".join(["(%s, %s, %s)"] * len(counts))
+        params = [
+            value
+            for (endpoint, name), amount in counts.items()
+            for value in (endpoint, name, amount)
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (endpoint, name, count)
+                VALUES {rows}
+                ON CONFLICT (endpoint, name) DO UPDATE
+                SET count = {table}.count + EXCLUDED.count
+                """,
+                params,
+            )
+
+
+class TMDBCacheCounter(models.Model):
+    """
+    How often the TMDB cache answered (hits, stale_hits) or had to ask TMDB (misses) for
+    an endpoint. They are in the database so they add up across workers and restarts
+    """
+
+    endpoint = models.CharField(max_length=50)
+    name = models.CharField(max_length=20)
+    count = models.PositiveBigIntegerField(default=0)
+
+    objects = TMDBCacheCounterQuerySet.as_manager()
+
+    class Meta:
+        unique_together = [("endpoint", "name")]
+
+    def __str__(self):
+        return f"<TMDBCacheCounter {self.endpoint} {self.name}: {self.count}>"
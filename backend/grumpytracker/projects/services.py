@@ -1,12 +1,15 @@
-import requests
-from decouple import config
+from django.conf import settings
+from grumpytracker.cache import bump_label
 from .models import Project
-from typing import Any, Dict, Optional, Tuple, List, TypedDict
+from .tmdb import get_client
+from typing import Any, Callable, Dict, Optional, Tuple, List, TypedDict
 
 
-BASE_URL = "https://api.themoviedb.org/3"
 TMDB_POSTER_BASE = "https://image.tmdb.org/t/p/w500"
 
+# Bulk restores fetch and save projects in batches of this size
+RESTORE_BATCH_SIZE = 100
+
 
 class NormalizedTMDBData(TypedDict):
     name: str
@@ -68,7 +71,10 @@ def refresh_project_from_tmdb(project: Project) -> Optional[Project]:
     :param project: Project object
     """
 
-    tmdb_data = get_tmdb_project_data(project.tmdb_id, project.project_type)
+    # We are restoring the project so we want what TMDB has now, not what we cached
+    tmdb_data = get_tmdb_project_data(
+        project.tmdb_id, project.project_type, fresh=True
+    )
     if tmdb_data:
         normalized = normalize_tmdb_data(tmdb_data, project.project_type)
 
@@ -82,27 +88,118 @@ def refresh_project_from_tmdb(project: Project) -> Optional[Project]:
     return None
 
 
-def get_tmdb_project_data(tmdb_id: int, project_type: str) -> Optional[Dict]:
+def restore_projects(
+    project_ids: List[int], on_progress: Optional[Callable[[int, int], None]] = None
+) -> List[Dict[str, Any]]:
     """
-    Fetch data from TMDB based on an id and project type
-    :param tmdb_id: The id of the project on the TMDB API
-    :param project_type: Episodic or Feature
-    :returns: JSON object with project data or None if nothing is found
+    Overwrite several projects with their TMDB data. The projects are loaded in a single
+    query, TMDB is called concurrently and every batch is saved with one bulk_update
+    :param project_ids: Internal ids of the projects
+    :param on_progress: Called with the number of projects done and the total after each batch
+    :returns: The result for every id, in the same order
+    """
+    projects = Project.objects.in_bulk(project_ids)
+
+    results = {}
+    attached = {}
+    for pid in project_ids:
+        project = projects.get(pid)
+        if project is None:
+            results[pid] = {"id": pid, "status": "error", "error": "Project not found"}
+        elif not project.tmdb_id:
+            results[pid] = {"id": pid, "status": "Not attached to TMDB project"}
+        else:
+            attached[pid] = project
+
+    attached = list(attached.values())
+    total = len(results) + len(attached)
+    done = len(results)
+    restored_count = 0
+    fields = list(NormalizedTMDBData.__annotations__)
+
+    for start in range(0, len(attached), RESTORE_BATCH_SIZE):
+        batch = attached[start : start + RESTORE_BATCH_SIZE]
+
+        # We are restoring so we want what TMDB has now, not what we cached
+        tmdb_data = get_client().get_projects(
+            [(project.tmdb_id, project.project_type) for project in batch], fresh=True
+        )
+
+        restored = []
+        for project, data in zip(batch, tmdb_data):
+            if not data:
+                results[project.id] = {
+                    "id": project.id,
+                    "status": "error",
+                    "error": "Failed to update project",
+                }
+                continue
+
+            normalized = normalize_tmdb_data(data, project.project_type)
+            for field, value in normalized.items():
+                setattr(project, field, value)
+
+            restored.append(project)
+            results[project.id] = {"id": project.id, "status": "restored"}
+
+        Project.objects.bulk_update(restored, fields)
+        restored_count += len(restored)
+
+        done += len(batch)
+        if on_progress:
+            on_progress(done, total)
+
+    if restored_count:
+        # bulk_update does not send post_save, let the response cache know
+        bump_label(Project._meta.label)
+
+    return [results[pid] for pid in project_ids]
+
+
+def search_tmdb_projects(query: str) -> List[NormalizedTMDBData]:
     """
+    Search TMDB for movies and tv shows we don't have yet
+    :param query: What the user typed
+    :returns: The normalized projects, empty for queries shorter than TMDB_SEARCH_MIN_LENGTH
+    """
+    if len(query.strip()) < settings.TMDB_SEARCH_MIN_LENGTH:
+        # A couple of letters matches half of TMDB, wait for the user to type more
+        return []
 
-    if project_type == "episodic":
-        url = f"{BASE_URL}/tv/{tmdb_id}?append_to_response=content_ratings"
-    else:
-        url = f"{BASE_URL}/movie/{tmdb_id}?append_to_response=release_dates"
+    # We only care about tv shows and movies
+    results = [
+        project
+        for project in get_client().search_multi(query)
+        if project.get("media_type") in ["movie", "tv"]
+    ]
+
+    # Only look up the ids TMDB gave us, not every project we have
+    existing_tmdb_ids = set(
+        Project.objects.filter(
+            tmdb_id__in=[project.get("id") for project in results]
+        ).values_list("tmdb_id", flat=True)
+    )
 
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {config('TMDB_API_READ_KEY')}",
-    }
+    return [
+        normalize_tmdb_data(
+            project, "episodic" if project.get("media_type") == "tv" else "feature"
+        )
+        for project in results
+        if project.get("id") not in existing_tmdb_ids
+    ]
 
-    response = requests.get(url, headers=headers)
 
-    return response.json() if response.status_code == 200 else None
+def get_tmdb_project_data(
+    tmdb_id: int, project_type: str, fresh: bool = False
+) -> Optional[Dict]:
+    """
+    Fetch data from TMDB based on an id and project type
+    :param tmdb_id: The id of the project on the TMDB API
+    :param project_type: Episodic or Feature
+    :param fresh: Skip the TMDB cache
+    :returns: JSON object with project data or None if nothing is found
+    """
+    return get_client().get_project(tmdb_id, project_type, fresh=fresh)
 
 
 def process_rating(data: Dict) -> List[Dict[str, Any]]:
@@ -0,0 +1,29 @@
+from jobs.registry import task
+from .services import get_or_create_project_from_tmdb, restore_projects
+
+
+# Every worker shares the TMDB rate limit, a couple of restores at a time is plenty
+@task("projects.restore", concurrency=2)
+def restore(job, project_ids):
+    """
+    Restore projects from TMDB, reporting the progress after every batch
+    """
+    job.set_progress(done=0, total=len(project_ids))
+
+    return restore_projects(
+        project_ids,
+        on_progress=lambda done, total: job.set_progress(done=done, total=total),
+    )
+
+
+@task("projects.create_from_tmdb")
+def create_from_tmdb(job, tmdb_id, project_type):
+    """
+    Create a project from its TMDB data
+    """
+    project, created = get_or_create_project_from_tmdb(tmdb_id, project_type)
+    if not project:
+        # TMDB could be down, raising gives the job another try
+        raise ValueError("Failed to get or create a project")
+
+    return {"created": created, "project": project.as_dict()}
@@ -1,6 +1,7 @@
 import pytest
 from datetime import date
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
 from projects.models import Project, ProjectFormat, Vote
 
 
@@ -215,6 +216,42 @@ class TestProjectModel:
         format_data_no_user = result_no_user["formats"][0]
         assert format_data_no_user["user_vote"] is None
 
+    def test_with_formats_query_count_is_constant(
+        self, multiple_formats, single_user, multiple_users
+    ):
+        """
+        Adding formats to a project should not add queries to with_formats
+        """
+        project = Project.objects.create(name="Query Count Project")
+
+        def attach_and_vote(fmt):
+            ProjectFormat.objects.create(project=project, fmt=fmt, added_by=single_user)
+            project.cameras.add(fmt.camera)
+            Vote.objects.create(
+                project=project, fmt=fmt, user=single_user, vote_type="up"
+            )
+            Vote.objects.create(
+                project=project, fmt=fmt, user=multiple_users[0], vote_type="down"
+            )
+
+        attach_and_vote(multiple_formats[0])
+        with CaptureQueriesContext(connection) as one_format:
+            project.with_formats(user=single_user)
+
+        for fmt in multiple_formats[1:]:
+            attach_and_vote(fmt)
+        with CaptureQueriesContext(connection) as all_formats:
+            result = project.with_formats(user=single_user)
+
+        assert len(result["formats"]) == 4
+        assert len(all_formats.captured_queries) == len(one_format.captured_queries)
+
+        for format_data in result["formats"]:
+            assert format_data["up_votes"] == 1
+            assert format_data["down_votes"] == 1
+            assert format_data["score"] == 0
+            assert format_data["user_vote"] == "up"
+
 
 @pytest.mark.django_db
 class TestProjectFormatModel:
@@ -0,0 +1,306 @@
+import asyncio
+import time
+import pytest
+from datetime import timedelta
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from grumpytracker import background
+from projects import tmdb_cache
+from projects.models import TMDBCacheCounter, TMDBCacheEntry
+from projects.tmdb import TMDBClient
+
+
+@pytest.mark.django_db
+class TestTMDBClient:
+    """
+    Tests for the TMDB client, these run against the stand-in server
+    """
+
+    def test_get_project(self, tmdb_server):
+        """
+        Features are fetched from movie/ with their release dates
+        """
+        tmdb_server.add("/movie/803796", {"id": 803796, "title": "KPop Demon Hunters"})
+
+        data = TMDBClient().get_project(803796, "feature")
+
+        assert data["title"] == "KPop Demon Hunters"
+        request = tmdb_server.requests[0]
+        assert request["query"] == "append_to_response=release_dates"
+        assert request["authorization"] == "Bearer test-read-key"
+
+    def test_get_episodic_project(self, tmdb_server):
+        """
+        Episodic projects are fetched from tv/ with their content ratings
+        """
+        tmdb_server.add("/tv/61889", {"id": 61889, "name": "Daredevil"})
+
+        data = TMDBClient().get_project(61889, "episodic")
+
+        assert data["name"] == "Daredevil"
+        assert tmdb_server.requests[0]["query"] == "append_to_response=content_ratings"
+
+    def test_not_found(self, tmdb_server):
+        """
+        Projects TMDB does not have return None
+        """
+        assert TMDBClient().get_project(1, "feature") is None
+
+    def test_timeout(self, tmdb_server, settings):
+        """
+        A slow TMDB should not hold us for longer than the read timeout
+        """
+        settings.TMDB_READ_TIMEOUT = 0.2
+        settings.TMDB_RETRIES = 0
+        tmdb_server.add("/movie/1", {"id": 1}, delay=1)
+
+        start = time.perf_counter()
+        assert TMDBClient().get_project(1, "feature") is None
+        assert time.perf_counter() - start < 0.9
+
+    def test_unreachable(self, settings):
+        """
+        If we can't reach TMDB we get None instead of an exception
+        """
+        settings.TMDB_BASE_URL = "http://127.0.0.1:1/3"
+        settings.TMDB_RETRIES = 0
+
+        assert TMDBClient().get_project(1, "feature") is None
+        assert TMDBClient().search_multi("Daredevil") == []
+
+    def test_retries_server_errors(self, tmdb_server):
+        """
+        Server errors are retried before we give up
+        """
+        tmdb_server.add("/movie/1", {"status_message": "Unavailable"}, status=503)
+
+        assert TMDBClient().get_project(1, "feature") is None
+        assert len(tmdb_server.requests) == 3
+
+    def test_connection_reused(self, tmdb_server):
+        """
+        Calls should go over the same keep-alive connection
+        """
+        tmdb_server.add("/movie/1", {"id": 1})
+        client = TMDBClient()
+
+        for _ in range(5):
+            assert client.get_project(1, "feature", fresh=True) == {"id": 1}
+
+        assert len({request["client"] for request in tmdb_server.requests}) == 1
+
+    def test_get_projects_concurrently(self, tmdb_server):
+        """
+        Fetching many projects should run the calls at the same time and keep their order
+        """
+        for tmdb_id in range(1, 6):
+            tmdb_server.add(f"/movie/{tmdb_id}", {"id": tmdb_id}, delay=0.3)
+
+        start = time.perf_counter()
+        results = TMDBClient().get_projects(
+            [(tmdb_id, "feature") for tmdb_id in range(1, 7)]
+        )
+        elapsed = time.perf_counter() - start
+
+        assert results == [{"id": tmdb_id} for tmdb_id in range(1, 6)] + [None]
+        assert elapsed < 1
+
+    def test_get_many_in_event_loop(self, tmdb_server, settings):
+        """
+        get_many should work while an event loop is running and reuse the pooled
+        connections across calls
+        """
+        for tmdb_id in range(1, 5):
+            tmdb_server.add(f"/movie/{tmdb_id}", {"id": tmdb_id})
+        client = TMDBClient()
+        calls = [(f"movie/{tmdb_id}", {}) for tmdb_id in range(1, 5)]
+
+        async def fetch():
+            return client.get_many(calls)
+
+        assert asyncio.run(fetch()) == [{"id": tmdb_id} for tmdb_id in range(1, 5)]
+        client.get_many(calls)
+
+        clients = {request["client"] for request in tmdb_server.requests}
+        assert len(clients) <= settings.TMDB_MAX_CONNECTIONS
+
+    def test_search_multi(self, tmdb_server):
+        """
+        Search returns the first page of results
+        """
+        tmdb_server.add(
+            "/search/multi", {"page": 1, "results": [{"id": 1, "media_type": "tv"}]}
+        )
+
+        assert TMDBClient().search_multi("Daredevil") == [{"id": 1, "media_type": "tv"}]
+        assert "query=daredevil" in tmdb_server.requests[0]["query"]
+
+
+def age_entries(seconds: int) -> None:
+    """
+    Pretend every cached response was fetched this many seconds ago
+    """
+    TMDBCacheEntry.objects.update(
+        fetched_at=timezone.now() - timedelta(seconds=seconds)
+    )
+
+
+@pytest.mark.django_db
+class TestTMDBCache:
+    """
+    Tests for the TMDB response cache
+    """
+
+    @pytest.fixture(autouse=True)
+    def refresh_inline(self, monkeypatch):
+        """
+        Run background refreshes right away so we can check what they did
+        """
+        monkeypatch.setattr(background, "run_in_background", lambda func: func())
+
+    def test_cache_hit(self, tmdb_server):
+        """
+        The second call should not reach TMDB
+        """
+        tmdb_server.add("/movie/1", {"id": 1})
+        client = TMDBClient()
+
+        assert client.get_project(1, "feature") == {"id": 1}
+        assert client.get_project(1, "feature") == {"id": 1}
+
+        assert len(tmdb_server.requests) == 1
+        assert tmdb_cache.get_stats() == {
+            "hits": 1,
+            "stale_hits": 0,
+            "misses": 1,
+            "entries": 1,
+            "endpoints": {"movie": {"hits": 1, "stale_hits": 0, "misses": 1}},
+        }
+
+    def test_counters_shared(self, tmdb_server):
+        """
+        The counters are kept in the database, every worker adds to the same ones and
+        they survive the process cache being cleared
+        """
+        tmdb_server.add("/movie/1", {"id": 1})
+        tmdb_server.add("/search/multi", {"results": []})
+        client = TMDBClient()
+        client.get_project(1, "feature")
+        client.search_multi("Daredevil")
+        client.search_multi("Daredevil")
+
+        cache.clear()
+
+        stats = tmdb_cache.get_stats()
+        assert (stats["hits"], stats["misses"]) == (1, 2)
+        assert stats["endpoints"]["search"] == {"hits": 1, "stale_hits": 0, "misses": 1}
+        assert set(
+            TMDBCacheCounter.objects.values_list("endpoint", "name", "count")
+        ) == {("movie", "misses", 1), ("search", "hits", 1), ("search", "misses", 1)}
+
+    def test_search_ignores_case(self, tmdb_server):
+        """
+        Searches that only differ by case share an entry
+        """
+        tmdb_server.add("/search/multi", {"results": [{"id": 1}]})
+        client = TMDBClient()
+
+        client.search_multi("Daredevil")
+        client.search_multi("daredevil ")
+
+        assert len(tmdb_server.requests) == 1
+
+    def test_stale_while_revalidate(self, tmdb_server, settings):
+        """
+        A stale entry is returned right away and refreshed in the background
+        """
+        tmdb_server.add("/movie/1", {"id": 1, "title": "Old"})
+        client = TMDBClient()
+        client.get_project(1, "feature")
+
+        tmdb_server.add("/movie/1", {"id": 1, "title": "New"})
+        age_entries(settings.TMDB_CACHE_TTLS["movie"] + 1)
+
+        assert client.get_project(1, "feature")["title"] == "Old"
+        assert client.get_project(1, "feature")["title"] == "New"
+        assert tmdb_cache.get_stats()["stale_hits"] == 1
+
+    def test_expired(self, tmdb_server, settings):
+        """
+        Entries past the stale window are fetched before we answer
+        """
+        tmdb_server.add("/movie/1", {"id": 1, "title": "Old"})
+        client = TMDBClient()
+        client.get_project(1, "feature")
+
+        tmdb_server.add("/movie/1", {"id": 1, "title": "New"})
+        age_entries(settings.TMDB_CACHE_TTLS["movie"] + settings.TMDB_CACHE_STALE_TTL)
+
+        assert client.get_project(1, "feature")["title"] == "New"
+
+    def test_expired_tmdb_down(self, tmdb_server, settings):
+        """
+        If TMDB fails we still return the expired entry
+        """
+        tmdb_server.add("/movie/1", {"id": 1, "title": "Old"})
+        client = TMDBClient()
+        client.get_project(1, "feature")
+
+        tmdb_server.add("/movie/1", {"status_message": "Not found"}, status=404)
+        age_entries(settings.TMDB_CACHE_TTLS["movie"] + settings.TMDB_CACHE_STALE_TTL)
+
+        assert client.get_project(1, "feature")["title"] == "Old"
+
+    def test_fresh_skips_cache(self, tmdb_server):
+        """
+        Asking for fresh data goes to TMDB and updates the cache
+        """
+        tmdb_server.add("/movie/1", {"id": 1, "title": "Old"})
+        client = TMDBClient()
+        client.get_project(1, "feature")
+
+        tmdb_server.add("/movie/1", {"id": 1, "title": "New"})
+
+        assert client.get_project(1, "feature", fresh=True)["title"] == "New"
+        assert client.get_project(1, "feature")["title"] == "New"
+
+    def test_lru_eviction(self, tmdb_server, settings):
+        """
+        Going over the max size drops the least recently used entries
+        """
+        settings.TMDB_CACHE_MAX_ENTRIES = 2
+        for tmdb_id in range(1, 4):
+            tmdb_server.add(f"/movie/{tmdb_id}", {"id": tmdb_id})
+        client = TMDBClient()
+
+        client.get_projects([(1, "feature"), (2, "feature")])
+        TMDBCacheEntry.objects.filter(path="movie/2").update(
+            last_used_at=timezone.now() - timedelta(minutes=1)
+        )
+        client.get_project(3, "feature")
+
+        assert set(TMDBCacheEntry.objects.values_list("path", flat=True)) == {
+            "movie/1",
+            "movie/3",
+        }
+
+    def test_cache_view(self, admin_client, client, tmdb_server):
+        """
+        Admins can see the counters and clear the cache
+        """
+        tmdb_server.add("/movie/1", {"id": 1})
+        TMDBClient().get_project(1, "feature")
+
+        res = client.get(reverse("tmdb_cache"))
+        assert res.status_code == 401
+
+        res = admin_client.get(reverse("tmdb_cache"))
+        assert res.status_code == 200
+        assert res.json()["misses"] == 1
+        assert res.json()["entries"] == 1
+
+        res = admin_client.delete(reverse("tmdb_cache"))
+        assert res.status_code == 200
+        assert not TMDBCacheEntry.objects.exists()
+        assert not TMDBCacheCounter.objects.exists()
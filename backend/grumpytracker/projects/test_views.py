@@ -1,7 +1,8 @@
+import json
 import pytest
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from projects.models import Project
+from projects.models import Project, ProjectFormat, Vote
 
 User = get_user_model()
 
@@ -146,6 +147,41 @@ class TestProjectsListView:
         assert project.name == "The Naked Gun: From the Files of Police Squad!"
         assert "bumbling Lieutenant Frank Drebin" in project.description
 
+    @pytest.mark.django_db
+    def test_create_project_in_background(self, regular_user, client, tmdb_server):
+        """
+        Asking for a background create returns a job that ends with the new project
+        """
+        from jobs.worker import Worker
+
+        tmdb_server.add(
+            "/movie/37136",
+            {
+                "id": 37136,
+                "title": "The Naked Gun",
+                "overview": "Drebin",
+                "adult": False,
+            },
+        )
+        client.force_login(regular_user)
+
+        data = {"tmdb_id": 37136, "project_type": "feature", "background": True}
+        res = client.post(reverse("projects"), data, content_type="application/json")
+
+        assert res.status_code == 202
+        status_url = res.json()["status_url"]
+        # Nothing was fetched while the caller waited
+        assert tmdb_server.requests == []
+        assert not Project.objects.filter(tmdb_id=37136).exists()
+
+        Worker().run_once()
+
+        job = client.get(status_url).json()
+        assert job["status"] == "done"
+        assert job["result"]["created"] is True
+        project = Project.objects.get(id=job["result"]["project"]["id"])
+        assert project.name == "The Naked Gun"
+
 
 class TestProjectDetailsView:
     """
@@ -180,6 +216,89 @@ class TestProjectDetailsView:
         assert set(data.keys()) == expected_keys
         assert data["name"] == "Edge of Tomorrow"
 
+    @pytest.mark.django_db
+    def test_get_project_details_query_count(
+        self, client, single_project, multiple_formats, django_assert_num_queries
+    ):
+        """
+        Project details should take three queries (project, formats and cameras) no matter how
+        many formats are attached, plus one for the model versions
+        """
+        for fmt in multiple_formats:
+            ProjectFormat.objects.create(project=single_project, fmt=fmt)
+            single_project.cameras.add(fmt.camera)
+
+        with django_assert_num_queries(4):
+            res = client.get(reverse("project", args=[single_project.id]))
+
+        assert res.status_code == 200
+        data = res.json()
+        assert len(data["formats"]) == 4
+        assert len(data["cameras"]) == 2
+
+    @pytest.mark.django_db
+    def test_get_project_details_etag(
+        self, single_project, single_format, single_user, regular_user, client
+    ):
+        """
+        The project details include the user's votes, so the ETag has to change with the user
+        and with every vote
+        """
+        ProjectFormat.objects.create(
+            project=single_project, fmt=single_format, added_by=single_user
+        )
+        url = reverse("project", args=[single_project.id])
+
+        client.force_login(single_user)
+        res = client.get(url)
+        etag = res.headers["ETag"]
+        assert "Authorization" in res.headers["Vary"]
+
+        res = client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == 304
+
+        client.force_login(regular_user)
+        res = client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == 200
+
+        client.force_login(single_user)
+        Vote.objects.create(
+            project=single_project, fmt=single_format, user=single_user, vote_type="up"
+        )
+        res = client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == 200
+        assert res.json()["formats"][0]["user_vote"] == "up"
+
+    @pytest.mark.django_db
+    def test_get_project_etags_change_with_source(
+        self, single_project, single_format, single_user, client
+    ):
+        """
+        The project's formats carry their source, editing or deleting a source has to
+        change the ETags of the project details and of its formats
+        """
+        ProjectFormat.objects.create(
+            project=single_project, fmt=single_format, added_by=single_user
+        )
+        urls = [
+            reverse("project", args=[single_project.id]),
+            reverse("format_votes", args=[single_project.id]),
+        ]
+        etags = [client.get(url).headers["ETag"] for url in urls]
+
+        source = single_format.source
+        source.name = "Renamed Source"
+        source.save()
+
+        for url, etag in zip(urls, etags):
+            res = client.get(url, headers={"If-None-Match": etag})
+            assert res.status_code == 200
+
+        source.delete()
+
+        res = client.get(urls[0])
+        assert res.json()["formats"][0]["source"] is None
+
     @pytest.mark.django_db
     def test_get_project_details_not_found(self, client):
         """
@@ -304,6 +423,141 @@ class TestProjectDetailsView:
         assert data["error"] == "Permission denied!"
 
 
+class TestProjectsRestoreView:
+    """
+    Tests for restoring projects from TMDB
+    """
+
+    @pytest.fixture
+    def tmdb_projects(self, tmdb_server, multiple_projects):
+        """
+        Make the stand-in TMDB know about our projects, with updated names
+        """
+        tmdb_server.add(
+            "/tv/123456",
+            {
+                "id": 123456,
+                "name": "One Piece (Restored)",
+                "overview": "Pirates",
+                "adult": False,
+            },
+        )
+        tmdb_server.add(
+            "/movie/654321",
+            {
+                "id": 654321,
+                "title": "Daredevil (Restored)",
+                "overview": "Lawyer",
+                "adult": False,
+            },
+        )
+
+        return multiple_projects
+
+    @pytest.mark.django_db
+    def test_restore_projects(self, admin_client, tmdb_projects, tmdb_server):
+        """
+        We should get a result for every id, in the order we sent them
+        """
+        not_attached = Project.objects.create(name="Local Only")
+        missing_on_tmdb = Project.objects.create(name="Gone", tmdb_id=1)
+        project_ids = [
+            tmdb_projects[0].id,
+            not_attached.id,
+            9999,
+            missing_on_tmdb.id,
+            tmdb_projects[1].id,
+        ]
+
+        res = admin_client.patch(
+            reverse("restore_projects"),
+            {"project_ids": project_ids},
+            content_type="application/json",
+        )
+
+        assert res.status_code == 200
+        results = res.json()["results"]
+        assert [result["id"] for result in results] == project_ids
+        assert [result["status"] for result in results] == [
+            "restored",
+            "Not attached to TMDB project",
+            "error",
+            "error",
+            "restored",
+        ]
+
+        tmdb_projects[0].refresh_from_db()
+        assert tmdb_projects[0].name == "One Piece (Restored)"
+        assert tmdb_projects[0].description == "Pirates"
+        tmdb_projects[1].refresh_from_db()
+        assert tmdb_projects[1].name == "Daredevil (Restored)"
+
+    @pytest.mark.django_db
+    def test_restore_projects_query_count(
+        self, admin_client, tmdb_projects, django_assert_max_num_queries
+    ):
+        """
+        Restoring should not run queries for every project
+        """
+        project_ids = [project.id for project in tmdb_projects]
+
+        # Session and user, the projects, the TMDB cache upsert and eviction and the update
+        with django_assert_max_num_queries(8):
+            res = admin_client.patch(
+                reverse("restore_projects"),
+                {"project_ids": project_ids},
+                content_type="application/json",
+            )
+
+        assert res.status_code == 200
+
+    @pytest.mark.django_db
+    def test_restore_projects_in_background(
+        self, admin_client, tmdb_projects, settings
+    ):
+        """
+        Big batches are queued as a job we can follow
+        """
+        from jobs.worker import Worker
+
+        settings.PROJECT_RESTORE_INLINE_LIMIT = 1
+
+        res = admin_client.patch(
+            reverse("restore_projects"),
+            {"project_ids": [project.id for project in tmdb_projects]},
+            content_type="application/json",
+        )
+
+        assert res.status_code == 202
+        data = res.json()
+        assert data["job"]["name"] == "projects.restore"
+        assert data["job"]["status"] == "queued"
+
+        Worker().run_once()
+
+        res = admin_client.get(data["status_url"])
+        assert res.status_code == 200
+        job = res.json()
+        assert job["status"] == "done"
+        assert job["progress"] == {"done": 2, "total": 2}
+        assert [result["status"] for result in job["result"]] == ["restored"] * 2
+
+    @pytest.mark.django_db
+    def test_restore_projects_not_admin(self, client, regular_user):
+        """
+        Only admins can restore projects
+        """
+        client.force_login(regular_user)
+
+        res = client.patch(
+            reverse("restore_projects"),
+            {"project_ids": [1]},
+            content_type="application/json",
+        )
+
+        assert res.status_code == 403
+
+
 class TestProjectsSearchView:
     @pytest.mark.django_db
     def test_search_projects(self, client, multiple_projects):
@@ -345,6 +599,121 @@ class TestProjectsSearchView:
         assert len(data["projects"]["local"]) > 0
         assert "daredevil" in data["projects"]["remote"][0]["name"].lower()
 
+    @pytest.mark.django_db
+    def test_search_projects_remote(self, client, multiple_projects, tmdb_server):
+        """
+        Remote results should skip projects we already have and anything that is not
+        a movie or a tv show
+        """
+        tmdb_server.add(
+            "/search/multi",
+            {
+                "results": [
+                    {"id": 654321, "media_type": "movie", "title": "Daredevil"},
+                    {"id": 61889, "media_type": "tv", "name": "Marvel's Daredevil"},
+                    {"id": 17051, "media_type": "person", "name": "Charlie Cox"},
+                ]
+            },
+        )
+
+        res = client.get(reverse("search_projects", query={"q": "Daredevil"}))
+
+        assert res.status_code == 200
+        remote = res.json()["projects"]["remote"]
+        assert len(remote) == 1
+        assert remote[0]["tmdb_id"] == 61889
+        assert remote[0]["project_type"] == "episodic"
+
+    @pytest.mark.django_db
+    def test_search_projects_local_only(self, client, multiple_projects, tmdb_server):
+        """
+        Asking for local results should not wait for TMDB
+        """
+        res = client.get(
+            reverse("search_projects", query={"q": "Daredevil", "source": "local"})
+        )
+
+        assert res.status_code == 200
+        projects = res.json()["projects"]
+        assert list(projects.keys()) == ["local"]
+        assert projects["local"][0]["name"] == "Daredevil"
+        assert tmdb_server.requests == []
+
+    @pytest.mark.django_db
+    def test_search_projects_remote_only(
+        self, client, multiple_projects, tmdb_server, django_assert_num_queries
+    ):
+        """
+        Remote results only look up the TMDB ids we got back to skip the ones we have
+        """
+        tmdb_server.add(
+            "/search/multi",
+            {
+                "results": [
+                    {"id": 654321, "media_type": "movie", "title": "Daredevil"},
+                    {"id": 61889, "media_type": "tv", "name": "Marvel's Daredevil"},
+                ]
+            },
+        )
+
+        # Reading the TMDB cache, counting the miss, saving and trimming the cache, then
+        # a single tmdb_id lookup
+        with django_assert_num_queries(5):
+            res = client.get(
+                reverse("search_projects", query={"q": "Daredevil", "source": "remote"})
+            )
+
+        assert res.status_code == 200
+        projects = res.json()["projects"]
+        assert list(projects.keys()) == ["remote"]
+        assert [project["tmdb_id"] for project in projects["remote"]] == [61889]
+
+    @pytest.mark.django_db
+    def test_search_projects_stream(self, client, multiple_projects, tmdb_server):
+        """
+        Streamed searches send the local results first and the remote ones after
+        """
+        tmdb_server.add(
+            "/search/multi",
+            {"results": [{"id": 61889, "media_type": "tv", "name": "Daredevil"}]},
+        )
+
+        res = client.get(
+            reverse("search_projects", query={"q": "Daredevil", "stream": "true"})
+        )
+
+        assert res.status_code == 200
+        assert res["Content-Type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in res.getvalue().decode().splitlines()]
+        assert [list(line.keys()) for line in lines] == [["local"], ["remote"]]
+        assert lines[0]["local"][0]["name"] == "Daredevil"
+        assert lines[1]["remote"][0]["tmdb_id"] == 61889
+
+    @pytest.mark.django_db
+    def test_search_projects_short_query(self, client, multiple_projects, tmdb_server):
+        """
+        Short queries don't go to TMDB
+        """
+        res = client.get(reverse("search_projects", query={"q": "On"}))
+
+        assert res.status_code == 200
+        projects = res.json()["projects"]
+        assert [project["name"] for project in projects["local"]] == ["One Piece"]
+        assert projects["remote"] == []
+        assert tmdb_server.requests == []
+
+    @pytest.mark.django_db
+    def test_search_projects_unknown_source(self, client):
+        """
+        Asking for a source we don't have should return an error
+        """
+        res = client.get(
+            reverse("search_projects", query={"q": "Daredevil", "source": "imdb"})
+        )
+
+        assert res.status_code == 400
+        assert res.json()["error"] == "Unknown source imdb"
+
     @pytest.mark.django_db
     def test_search_projects_case_insensitive(self, client, multiple_projects):
         """
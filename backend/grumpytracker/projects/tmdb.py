@@ -0,0 +1,199 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import requests
+from django.conf import settings
+from loguru import logger
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .tmdb_cache import cached_get_many
+
+# A TMDB call is a path relative to the API root and its query params
+TMDBRequest = Tuple[str, Dict[str, Any]]
+
+# TMDB asks clients to back off on these
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RateLimiter:
+    """
+    Spaces calls out so we never go over a number of requests per second, shared by every
+    thread using the client
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate if rate else 0
+        self._next_slot = 0.0
+        self._lock = Lock()
+
+    def reserve(self) -> float:
+        """
+        Take the next free slot
+        :returns: How many seconds the caller has to wait before sending its request
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+
+        return slot - now
+
+    def wait(self) -> None:
+        time.sleep(self.reserve())
+
+
+def project_request(tmdb_id: int, project_type: str) -> TMDBRequest:
+    """
+    Build the request for a project's details, with its ratings appended
+    :param tmdb_id: The id of the project on the TMDB API
+    :param project_type: Episodic or Feature
+    """
+    if project_type == "episodic":
+        return f"tv/{tmdb_id}", {"append_to_response": "content_ratings"}
+
+    return f"movie/{tmdb_id}", {"append_to_response": "release_dates"}
+
+
+class TMDBClient:
+    """
+    Talks to the TMDB API over a pooled keep-alive session with strict timeouts. Base url and
+    key default to the settings and are read on every call so tests can point us at a stand-in
+    """
+
+    def __init__(
+        self, base_url: Optional[str] = None, api_key: Optional[str] = None
+    ) -> None:
+        self._base_url = base_url
+        self._api_key = api_key
+        self.max_connections = settings.TMDB_MAX_CONNECTIONS
+        self.retries = settings.TMDB_RETRIES
+        self.rate_limiter = RateLimiter(settings.TMDB_RATE_LIMIT)
+
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=["GET"],
+            # We look at the status ourselves once we run out of retries
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.max_connections, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # get_many fans out over the session's pool, one thread per connection
+        self.pool = ThreadPoolExecutor(
+            max_workers=self.max_connections, thread_name_prefix="tmdb"
+        )
+
+    @property
+    def base_url(self) -> str:
+        return (self._base_url or settings.TMDB_BASE_URL).rstrip("/")
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            "accept": "application/json",
+            "Authorization": f"Bearer {self._api_key or settings.TMDB_API_READ_KEY}",
+        }
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return settings.TMDB_CONNECT_TIMEOUT, settings.TMDB_READ_TIMEOUT
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict]:
+        """
+        GET a TMDB endpoint
+        :param path: Path relative to the API root (movie/123)
+        :param params: Query params
+        :returns: The JSON response or None if TMDB failed or did not find anything
+        """
+        self.rate_limiter.wait()
+        try:
+            response = self.session.get(
+                f"{self.base_url}/{path}",
+                params=params,
+                headers=self.headers,
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            logger.warning(f"TMDB request to {path} failed: {e}")
+            return None
+
+        if response.status_code != 200:
+            logger.warning(f"TMDB returned {response.status_code} for {path}")
+            return None
+
+        return response.json()
+
+    def get_many(self, calls: Sequence[TMDBRequest]) -> List[Optional[Dict]]:
+        """
+        Run several TMDB requests at the same time over the pooled session, never more
+        than max_connections at once. Safe to call from async code through
+        sync_to_async, there is no event loop of our own
+        :returns: The responses in the same order as the requests
+        """
+        if len(calls) <= 1:
+            return [self.get(*call) for call in calls]
+
+        return list(self.pool.map(lambda call: self.get(*call), calls))
+
+    def get_project(
+        self, tmdb_id: int, project_type: str, fresh: bool = False
+    ) -> Optional[Dict]:
+        """
+        Get a project's details, from the cache if we fetched them recently
+        :param tmdb_id: The id of the project on the TMDB API
+        :param project_type: Episodic or Feature
+        :param fresh: Skip the cache and ask TMDB
+        """
+        return self.get_projects([(tmdb_id, project_type)], fresh=fresh)[0]
+
+    def get_projects(
+        self, projects: Sequence[Tuple[int, str]], fresh: bool = False
+    ) -> List[Optional[Dict]]:
+        """
+        Get the details of several projects, the ones we don't have cached are
+        fetched concurrently
+        :param projects: tmdb_id and project type pairs
+        :param fresh: Skip the cache and ask TMDB
+        """
+        calls = [
+            project_request(tmdb_id, project_type) for tmdb_id, project_type in projects
+        ]
+        return cached_get_many(self, calls, fresh=fresh)
+
+    def search_multi(self, query: str) -> List[Dict]:
+        """
+        Search movies, tv shows and people
+        :returns: The first page of results, empty if TMDB failed
+        """
+        params = {
+            # TMDB search ignores case, this way "daredevil" and "Daredevil" share a cache entry
+            "query": query.strip().lower(),
+            "include_adult": "false",
+            "language": "en-US",
+            "page": 1,
+        }
+        data = cached_get_many(self, [("search/multi", params)])[0]
+
+        return data.get("results", []) if data else []
+
+
+_client: Optional[TMDBClient] = None
+
+
+def get_client() -> TMDBClient:
+    """
+    The client shared by the whole process, so every request reuses the same connections
+    """
+    global _client
+    if _client is None:
+        _client = TMDBClient()
+
+    return _client
@@ -0,0 +1,213 @@
+import hashlib
+import json
+from collections import Counter
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.utils import timezone
+from loguru import logger
+
+from grumpytracker import background
+from .models import TMDBCacheCounter, TMDBCacheEntry
+
+if TYPE_CHECKING:
+    from .tmdb import TMDBClient, TMDBRequest
+
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+COUNTERS = ("hits", "stale_hits", "misses")
+
+# Keys of the stale entries we are refreshing in the background
+_refreshing = set()
+_refreshing_lock = Lock()
+
+
+def cache_key(path: str, params: Optional[Dict[str, Any]]) -> str:
+    """
+    Hash the endpoint and its params, the params are sorted so their order doesn't matter
+    """
+    raw = json.dumps([path, params or {}], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def get_endpoint(path: str) -> str:
+    """
+    The kind of request (search, movie, tv), TTLs and counters are per endpoint
+    """
+    return path.split("/")[0]
+
+
+def get_ttl(path: str) -> int:
+    """
+    How long (in seconds) a response is fresh for, based on the endpoint
+    """
+    return settings.TMDB_CACHE_TTLS.get(
+        get_endpoint(path), settings.TMDB_CACHE_DEFAULT_TTL
+    )
+
+
+def freshness(entry: TMDBCacheEntry) -> str:
+    """
+    Fresh entries are returned as is, stale ones are returned and refreshed in the background
+    and expired ones are fetched again before we answer
+    """
+    age = (timezone.now() - entry.fetched_at).total_seconds()
+    ttl = get_ttl(entry.path)
+    if age < ttl:
+        return FRESH
+    if age < ttl + settings.TMDB_CACHE_STALE_TTL:
+        return STALE
+
+    return EXPIRED
+
+
+def get_stats() -> Dict[str, Any]:
+    """
+    The hit/miss counters, in total and per endpoint, and the number of cached responses
+    """
+    stats = dict.fromkeys(COUNTERS, 0)
+    endpoints = {}
+    for endpoint, name, amount in TMDBCacheCounter.objects.values_list(
+        "endpoint", "name", "count"
+    ).order_by("endpoint"):
+        stats[name] += amount
+        endpoints.setdefault(endpoint, dict.fromkeys(COUNTERS, 0))[name] = amount
+
+    stats["entries"] = TMDBCacheEntry.objects.count()
+    stats["endpoints"] = endpoints
+
+    return stats
+
+
+def clear() -> None:
+    """
+    Drop every cached response and reset the counters
+    """
+    TMDBCacheEntry.objects.all().delete()
+    TMDBCacheCounter.objects.all().delete()
+
+
+def store(calls: Sequence["TMDBRequest"], responses: Sequence[Dict]) -> None:
+    """
+    Save responses we got from TMDB, replacing older versions, and evict the least recently
+    used entries if we went over TMDB_CACHE_MAX_ENTRIES
+    """
+    now = timezone.now()
+    entries = {}
+    for (path, params), data in zip(calls, responses):
+        key = cache_key(path, params)
+        entries[key] = TMDBCacheEntry(
+            key=key,
+            path=path,
+            params=params or {},
+            data=data,
+            fetched_at=now,
+            last_used_at=now,
+        )
+
+    if not entries:
+        return
+
+    TMDBCacheEntry.objects.bulk_create(
+        entries.values(),
+        update_conflicts=True,
+        unique_fields=["key"],
+        update_fields=["data", "fetched_at", "last_used_at"],
+    )
+
+    evicted = TMDBCacheEntry.objects.order_by("-last_used_at").values_list(
+        "id", flat=True
+    )[settings.TMDB_CACHE_MAX_ENTRIES :]
+    TMDBCacheEntry.objects.filter(id__in=evicted).delete()
+
+
+def refresh_in_background(client: "TMDBClient", call: "TMDBRequest") -> None:
+    """
+    Fetch a stale response again without making the caller wait, only one refresh of the
+    same response runs at a time
+    """
+    key = cache_key(*call)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def refresh():
+        try:
+            data = client.get(*call)
+            if data is not None:
+                store([call], [data])
+        except Exception as e:
+            logger.warning(f"Failed to refresh TMDB cache for {call[0]}: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    # The request that found the stale entry does not wait for TMDB
+    background.run_in_background(refresh)
+
+
+def cached_get_many(
+    client: "TMDBClient", calls: Sequence["TMDBRequest"], fresh: bool = False
+) -> List[Optional[Dict]]:
+    """
+    Answer TMDB requests from the cache, everything we don't have (or is too old) is
+    fetched concurrently in one go
+    :param client: The client we use to reach TMDB
+    :param calls: path and params pairs
+    :param fresh: Skip the cache and get the data from TMDB, we still save what we get
+    :returns: The responses in the same order as the calls
+    """
+    keys = [cache_key(*call) for call in calls]
+
+    entries = {}
+    if not fresh:
+        entries = TMDBCacheEntry.objects.in_bulk(keys, field_name="key")
+        if entries:
+            TMDBCacheEntry.objects.filter(key__in=entries.keys()).update(
+                last_used_at=timezone.now()
+            )
+
+    results = [None] * len(calls)
+    missing = []
+    counts = Counter()
+    for index, key in enumerate(keys):
+        entry = entries.get(key)
+        state = freshness(entry) if entry else EXPIRED
+        endpoint = get_endpoint(calls[index][0])
+        if state == FRESH:
+            counts[endpoint, "hits"] += 1
+            results[index] = entry.data
+        elif state == STALE:
+            counts[endpoint, "stale_hits"] += 1
+            results[index] = entry.data
+            refresh_in_background(client, calls[index])
+        else:
+            counts[endpoint, "misses"] += 1
+            missing.append(index)
+
+    if not fresh:
+        TMDBCacheCounter.objects.add(counts)
+
+    if missing:
+        fetched = client.get_many([calls[index] for index in missing])
+
+        found_calls = []
+        found_data = []
+        for index, data in zip(missing, fetched):
+            if data is None:
+                # TMDB failed or has nothing, old data is better than no data
+                entry = entries.get(keys[index])
+                results[index] = entry.data if entry else None
+                continue
+
+            results[index] = data
+            found_calls.append(calls[index])
+            found_data.append(data)
+
+        store(found_calls, found_data)
+
+    return results
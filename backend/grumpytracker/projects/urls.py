@@ -6,6 +6,7 @@ urlpatterns = [
     path("<int:project_id>", views.ProjectDetailsView.as_view(), name="project"),
     path("search/", views.search, name="search_projects"),
     path("restore/", views.ProjectsRestoreView.as_view(), name="restore_projects"),
+    path("tmdb/cache/", views.TMDBCacheView.as_view(), name="tmdb_cache"),
     path(
         "<int:project_id>/formats/",
         views.ProjectFormatsListView.as_view(),
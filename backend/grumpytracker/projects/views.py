@@ -1,20 +1,22 @@
 from pprint import pprint
 from loguru import logger
 from django.db.models import F, Q, Count
-import requests
 import json
-from decouple import config
 from django.views import View
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
+from django.conf import settings
+from django.urls import reverse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import IntegrityError
 from .models import Project, ProjectFormat, Vote
+from . import tmdb_cache
 from .services import (
     get_or_create_project_from_tmdb,
-    refresh_project_from_tmdb,
-    normalize_tmdb_data,
+    restore_projects,
+    search_tmdb_projects,
 )
 from grumpytracker.utils import (
     login_required,
@@ -22,9 +24,11 @@ from grumpytracker.utils import (
     require_admin,
     require_owner_or_admin,
 )
+from grumpytracker.pagination import paginate
+from grumpytracker.cache import conditional_response
+from grumpytracker.streaming import ndjson, wants_stream
 from formats.models import Format
-
-BASE_URL = "https://api.themoviedb.org/3"
+from jobs.models import Job
 
 
 # We need to disable csrf at the class level
@@ -33,21 +37,17 @@ class ProjectsListView(View):
     """
     Handle projects/ endpoint
     GET - Returns all of the projects in the DB
-    POST - Creates a new project (or returns the id of an existing one)
+    POST - Creates a new project (or returns the id of an existing one), pass background
+           to create it in a job instead of waiting for TMDB
     """
 
+    @method_decorator(conditional_response("projects.Project"))
     def get(self, request):
         """
-        Handle GET and return all existing projects
+        Handle GET and return all existing projects, pass limit and after to page through them
         """
 
-        projects = Project.objects.all()
-        data = []
-
-        for project in projects:
-            data.append(project.as_dict())
-
-        return JsonResponse(data, safe=False)
+        return paginate(request, Project.objects.all())
 
     @method_decorator(login_required)
     def post(self, request) -> JsonResponse:
@@ -63,6 +63,21 @@ class ProjectsListView(View):
             if not project_type:
                 return JsonResponse({"error": "project_type is required"}, status=400)
 
+            if data.get("background"):
+                # Don't wait for TMDB, the caller follows the job to get the project
+                job = Job.objects.enqueue(
+                    "projects.create_from_tmdb",
+                    {"tmdb_id": tmdb_id, "project_type": project_type},
+                    user=request.user,
+                )
+                return JsonResponse(
+                    {
+                        "job": job.as_dict(),
+                        "status_url": reverse("job", args=[job.id]),
+                    },
+                    status=202,
+                )
+
             project, created = get_or_create_project_from_tmdb(tmdb_id, project_type)
             if not project:
                 # Something went wrong while trying to get the project
@@ -84,6 +99,18 @@ class ProjectDetailsView(View):
     DELETE - Delete a project
     """
 
+    @method_decorator(
+        conditional_response(
+            "projects.Project",
+            "projects.ProjectFormat",
+            "projects.Vote",
+            "formats.Format",
+            "cameras.Camera",
+            "makes.Make",
+            "sources.Source",
+            per_user=True,
+        )
+    )
     def get(self, request, project_id):
         """
         Get a project by its interanl ID
@@ -126,56 +153,47 @@ class ProjectDetailsView(View):
         return JsonResponse({"success": "Project deleted"})
 
 
+# Where project searches can look, the default is both
+SEARCH_SOURCES = ("local", "remote")
+
+
 def search(request):
+    """
+    Search our projects and TMDB. Local results come back quickly while TMDB can take a
+    while, so callers can ask for one source at a time (?source=local then ?source=remote)
+    or stream both (?stream=true) and show the local hits while TMDB is answering
+    """
     query = request.GET.get("q", "")
-    if query:
-        # We first get all of the TMDB ID's in the database so we can filter results. Notice that
-        # we are getting a list of values instead of objects and using a set for performence
-        existing_tmdb_ids = set(
-            Project.objects.filter(tmdb_id__isnull=False).values_list(
-                "tmdb_id", flat=True
-            )
+    if not query:
+        return JsonResponse({"error": "No query provided"}, safe=False)
+
+    source = request.GET.get("source")
+    if source and source not in SEARCH_SOURCES:
+        return JsonResponse({"error": f"Unknown source {source}"}, status=400)
+    sources = [source] if source else SEARCH_SOURCES
+
+    def local():
+        return [
+            project.as_dict()
+            for project in Project.objects.filter(name__icontains=query)
+        ]
+
+    def remote():
+        return search_tmdb_projects(query)
+
+    searches = {"local": local, "remote": remote}
+
+    if wants_stream(request):
+        # One line per source, the local one is sent before we call TMDB
+        rows = (
+            json.dumps({name: searches[name]()}, cls=DjangoJSONEncoder)
+            for name in sources
         )
+        return StreamingHttpResponse(ndjson(rows), content_type="application/x-ndjson")
 
-        # Search local db first
-        local_projects = Project.objects.filter(name__icontains=query)
-        found_local_projects = []
-        for project in local_projects:
-            found_local_projects.append(project.as_dict())
-
-        # Search TMDB second
-        url = f"{BASE_URL}/search/multi?query={query}&include_adult=false&language=en-US&page=1"
-
-        headers = {
-            "accept": "application/json",
-            "Authorization": f"Bearer {config('TMDB_API_READ_KEY')}",
-        }
-
-        response = requests.get(url, headers=headers)
-        found_remote_projects = []
-        results = response.json().get("results", None)
-        if results:
-            for project in results:
-                if project.get("media_type") in ["movie", "tv"]:
-                    # We only care about tv shows and movies
-                    tmdb_id = project.get("id")
-                    if tmdb_id not in existing_tmdb_ids:
-                        # We only care about projects we don't already have
-                        project_type = (
-                            "episodic"
-                            if project.get("media_type") == "tv"
-                            else "feature"
-                        )
-                        found_remote_projects.append(
-                            normalize_tmdb_data(project, project_type)
-                        )
-        full_result = {
-            "projects": {"local": found_local_projects, "remote": found_remote_projects}
-        }
-        return JsonResponse(full_result, safe=False)
-
-    else:
-        return JsonResponse({"error": "No query provided"}, safe=False)
+    return JsonResponse(
+        {"projects": {name: searches[name]() for name in sources}}, safe=False
+    )
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -188,40 +206,27 @@ class ProjectsRestoreView(View):
     @method_decorator(require_admin)
     def patch(self, request):
         """
-        Restore multiple projects from TMDB
+        Restore multiple projects from TMDB. Large batches run in the background, we return
+        the job and where to follow its progress
         """
 
         try:
             data = json.loads(request.body)
-            project_ids = data.get("project_ids", [])
-
-            results = []
-            for pid in project_ids:
-                try:
-                    # Find the project based on its internal ID
-                    project = get_object_or_404(Project, id=pid)
-
-                    if project.tmdb_id:
-                        # This project is attached to a TMDB record
-                        updated_project = refresh_project_from_tmdb(project)
-                        if updated_project:
-                            results.append({"id": pid, "status": "restored"})
-                        else:
-                            results.append(
-                                {
-                                    "id": pid,
-                                    "status": "error",
-                                    "error": "Failed to update project",
-                                }
-                            )
-                    else:
-                        request.append(
-                            {"id": pid, "status": "Not attached to TMDB project"}
-                        )
-                except Exception as e:
-                    results.append({"id": pid, "status": "error", "error": str(e)})
-
-            return JsonResponse({"results": results})
+            project_ids = [int(pid) for pid in data.get("project_ids", [])]
+
+            if len(project_ids) > settings.PROJECT_RESTORE_INLINE_LIMIT:
+                job = Job.objects.enqueue(
+                    "projects.restore", {"project_ids": project_ids}, user=request.user
+                )
+                return JsonResponse(
+                    {
+                        "job": job.as_dict(),
+                        "status_url": reverse("job", args=[job.id]),
+                    },
+                    status=202,
+                )
+
+            return JsonResponse({"results": restore_projects(project_ids)})
 
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=400)
@@ -235,6 +240,17 @@ class ProjectFormatsListView(View):
     POST - Add a format to the project
     """
 
+    @method_decorator(
+        conditional_response(
+            "projects.ProjectFormat",
+            "projects.Vote",
+            "formats.Format",
+            "cameras.Camera",
+            "makes.Make",
+            "sources.Source",
+            "users.User",
+        )
+    )
     def get(self, request, project_id):
         """
         Handle GET and return all project's formats
@@ -247,7 +263,7 @@ class ProjectFormatsListView(View):
         # We sort it by decending order
         project_formats = (
             ProjectFormat.objects.filter(project=project)
-            .select_related("fmt__camera__make")
+            .select_related("fmt__camera__make", "added_by")
             .annotate(
                 upvotes=Count(
                     "fmt__vote", filter=Q(fmt__vote__vote_type="upVote")
@@ -404,3 +420,21 @@ class ProjectFormatDetailsView(View):
 
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=400)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class TMDBCacheView(View):
+    """
+    Handle projects/tmdb/cache endpoint
+    GET - Returns the TMDB cache hit and miss counters
+    DELETE - Empty the TMDB cache
+    """
+
+    @method_decorator(require_admin)
+    def get(self, request) -> JsonResponse:
+        return JsonResponse(tmdb_cache.get_stats())
+
+    @method_decorator(require_admin)
+    def delete(self, request) -> JsonResponse:
+        tmdb_cache.clear()
+        return JsonResponse({"success": "TMDB cache cleared"})
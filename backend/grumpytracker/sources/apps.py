@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class SourcesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sources'
+
+    def ready(self):
+        from grumpytracker.cache import track_changes
+
+        # Edits to sources invalidate the cached catalogue responses
+        track_changes(self.get_model('Source'))
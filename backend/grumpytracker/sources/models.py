@@ -1,5 +1,9 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
 from typing import Dict, Any
+from grumpytracker.search import search_document
 
 
 class Source(models.Model):
@@ -8,13 +12,49 @@ class Source(models.Model):
     file_name = models.CharField(max_length=100, blank=True)
     note = models.CharField(max_length=500, blank=True, null=True)
 
+    # Full text search document, this is rebuilt every time the source is saved
+    search_vector = SearchVectorField(null=True, editable=False)
+
     # Audit fields
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="source_search_vector_gin"),
+            # Plain trigram index for fuzzy matching the name
+            GinIndex(fields=["name"], opclasses=["gin_trgm_ops"], name="source_name_trgm"),
+            # icontains compiles to UPPER(field) LIKE UPPER(term), these indexes match that
+            GinIndex(OpClass(Upper("name"), name="gin_trgm_ops"), name="source_name_upper_trgm"),
+            GinIndex(OpClass(Upper("url"), name="gin_trgm_ops"), name="source_url_upper_trgm"),
+            GinIndex(
+                OpClass(Upper("file_name"), name="gin_trgm_ops"),
+                name="source_file_upper_trgm",
+            ),
+            GinIndex(OpClass(Upper("note"), name="gin_trgm_ops"), name="source_note_upper_trgm"),
+        ]
+
     def __str__(self):
         return str(self.name)
 
+    def build_search_vector(self):
+        """
+        Build the search document for this source
+        """
+        return search_document(
+            (self.name, "A"),
+            (self.file_name, "B"),
+            (self.url, "C"),
+            (self.note, "C"),
+        )
+
+    def save(self, *args, **kwargs):
+        """
+        Overrides the model's save function to keep the search document up to date
+        """
+        self.search_vector = self.build_search_vector()
+        super().save(*args, **kwargs)
+
     def as_dict(self) -> Dict[str, Any]:
         return {
             "id": self.id,
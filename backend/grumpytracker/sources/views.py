@@ -6,6 +6,9 @@ from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import get_object_or_404
 from grumpytracker.utils import validate_required_fields, require_admin
+from grumpytracker.pagination import paginate
+from grumpytracker.cache import cache_response, conditional_response
+from grumpytracker.search import rank_search
 import json
 from loguru import logger
 
@@ -20,18 +23,14 @@ class SourcesListView(View):
     POST - Creates a new source
     """
 
+    @method_decorator(conditional_response("sources.Source"))
+    @method_decorator(cache_response("sources.Source"))
     def get(self, request) -> JsonResponse:
         """
-        Return all existing sources
+        Return all existing sources, pass limit and after to page through them
         """
 
-        sources = Source.objects.all()
-        data = []
-
-        for source in sources:
-            data.append(source.as_dict())
-
-        return JsonResponse(data, safe=False)
+        return paginate(request, Source.objects.all())
 
     @method_decorator(require_admin)
     def post(self, request) -> JsonResponse:
@@ -83,6 +82,8 @@ class SourceDetailsView(View):
     DELETE - Delete a source
     """
 
+    @method_decorator(conditional_response("sources.Source"))
+    @method_decorator(cache_response("sources.Source"))
     def get(self, request, source_id: int) -> JsonResponse:
         """
         Get a format by its interanl ID
@@ -132,6 +133,8 @@ class SourcesSearchView(View):
     GET - Returns the a list of sources based on a search query
     """
 
+    @method_decorator(conditional_response("sources.Source"))
+    @method_decorator(cache_response("sources.Source"))
     def get(self, request) -> JsonResponse:
         """
         Search the database for a source based on name, url, filename and note
@@ -142,18 +145,20 @@ class SourcesSearchView(View):
 
         terms = query.split()
 
-        # Start building the query by getting all cameras with JOIN on makes
-        sources = Source.objects.all()
-
-        # Build the WHERE clause for each term
+        # Every term has to match the name, url, file name or note
+        match = Q()
         for term in terms:
-            sources = sources.filter(
+            match &= (
                 Q(name__icontains=term)
                 | Q(url__icontains=term)
                 | Q(file_name__icontains=term)
                 | Q(note__icontains=term)
             )
 
+        # Add full text matches and order them by relevance. Source names are too close
+        # to each other for fuzzy matching
+        sources = rank_search(Source.objects.all(), query, match)
+
         # Execute the query
         found_sources = [source.as_dict() for source in sources]
 
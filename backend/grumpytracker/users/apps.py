@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from grumpytracker.cache import track_changes
+        from grumpytracker.middleware import forget_user
+
+        # Usernames show up on the project formats so edits change their ETags
+        track_changes(self.get_model('User'))
+
+        # Updated or deleted users should not be served from the JWT user cache
+        post_save.connect(forget_user, sender=self.get_model('User'))
+        post_delete.connect(forget_user, sender=self.get_model('User'))
@@ -15,6 +15,7 @@ from grumpytracker.utils import (
     require_owner_or_admin,
     require_admin,
 )
+from grumpytracker.pagination import paginate
 from loguru import logger
 
 from .models import User
@@ -98,16 +99,15 @@ class UsersListView(View):
     @method_decorator(require_admin)
     def get(self, request) -> JsonResponse:
         """
-        Return all existing users. This is a protected route only availabe for admin
+        Return all existing users, pass limit and after to page through them.
+        This is a protected route only availabe for admin
         """
 
-        users = User.objects.all()
-        data = []
-
-        for user in users:
-            data.append({"id": user.id, "name": user.username})
-
-        return JsonResponse(data, safe=False)
+        return paginate(
+            request,
+            User.objects.all(),
+            lambda user: {"id": user.id, "name": user.username},
+        )
 
     def post(self, request) -> JsonResponse:
         """
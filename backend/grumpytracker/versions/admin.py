@@ -0,0 +1,7 @@
+from django.contrib import admin
+from .models import TableVersion
+
+
+@admin.register(TableVersion)
+class TableVersionAdmin(admin.ModelAdmin):
+    list_display = ["label", "version", "changed_at"]
@@ -0,0 +1,31 @@
+from django.apps import AppConfig, apps as global_apps
+from django.db.models.signals import post_migrate
+from django.utils import timezone
+
+
+def create_versions(sender, using, apps=global_apps, **kwargs):
+    """
+    Signal handler for post_migrate, gives every tracked model a version so the first
+    requests don't have to
+    """
+    from grumpytracker.cache import TRACKED_LABELS
+
+    try:
+        TableVersion = apps.get_model('versions', 'TableVersion')
+    except LookupError:
+        # Migrating another app before this one
+        return
+
+    now = timezone.now()
+    TableVersion.objects.using(using).bulk_create(
+        [TableVersion(label=label, changed_at=now) for label in TRACKED_LABELS],
+        ignore_conflicts=True,
+    )
+
+
+class VersionsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'versions'
+
+    def ready(self):
+        post_migrate.connect(create_versions, sender=self)
@@ -0,0 +1,66 @@
+from typing import Dict, Iterable
+
+from django.db import connection, models
+from django.utils import timezone
+
+
+class TableVersionQuerySet(models.QuerySet):
+    def current(self, labels: Iterable[str]) -> Dict[str, "TableVersion"]:
+        """
+        The versions of the models in a single query. migrate creates the versions of
+        the models we track, one added since gets its version from the first worker that
+        asks so every worker agrees on it
+        """
+        labels = list(labels)
+        versions = {version.label: version for version in self.filter(label__in=labels)}
+
+        missing = [label for label in labels if label not in versions]
+        if missing:
+            self.create_missing(missing)
+            versions.update(
+                (version.label, version) for version in self.filter(label__in=missing)
+            )
+
+        return versions
+
+    def create_missing(self, labels: Iterable[str]) -> None:
+        now = timezone.now()
+        self.bulk_create(
+            [TableVersion(label=label, changed_at=now) for label in labels],
+            ignore_conflicts=True,
+        )
+
+    def bump(self, label: str) -> None:
+        """
+        Move a model's version forward in a single statement. Inside a transaction other
+        workers only see it once the change is committed
+        """
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            # CLOCK_TIMESTAMP is when the statement runs, NOW() is when the transaction
+            # started and a long transaction would move Last-Modified back
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (label, version, changed_at)
+                VALUES (%s, 1, CLOCK_TIMESTAMP())
+                ON CONFLICT (label) DO UPDATE
+                SET version = {table}.version + 1, changed_at = CLOCK_TIMESTAMP()
+                """,
+                [label],
+            )
+
+
+class TableVersion(models.Model):
+    """
+    How often a model's table changed and when it last did. Responses and their ETags are
+    built from these, they are in the database so every worker sees the same versions
+    """
+
+    label = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField()
+
+    objects = TableVersionQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.label} v{self.version}"
@@ -0,0 +1,40 @@
+import pytest
+from makes.models import Make
+from versions.models import TableVersion
+
+
+@pytest.mark.django_db
+class TestTableVersion:
+    """
+    Tests for the model versions the response cache and ETags are built from
+    """
+
+    def test_tracked_models_have_a_version(self):
+        """
+        migrate should give every tracked model a version
+        """
+        labels = set(TableVersion.objects.values_list("label", flat=True))
+        assert {"makes.Make", "cameras.Camera", "formats.Format"} <= labels
+
+    def test_bump(self):
+        """
+        Saving a record should move its model's version and change time forward
+        """
+        before = TableVersion.objects.current(["makes.Make"])["makes.Make"]
+
+        Make.objects.create(name="Arri", website="https://www.arri.com")
+
+        after = TableVersion.objects.current(["makes.Make"])["makes.Make"]
+        assert after.version == before.version + 1
+        assert after.changed_at > before.changed_at
+
+    def test_unknown_label(self):
+        """
+        A model without a version gets one the first time it's asked for, bumping one
+        creates it
+        """
+        versions = TableVersion.objects.current(["tests.Unknown"])
+        assert versions["tests.Unknown"].version == 0
+
+        TableVersion.objects.bump("tests.Other")
+        assert TableVersion.objects.get(label="tests.Other").version == 1